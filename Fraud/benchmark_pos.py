@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Unified Web POS Benchmark
+
+Drives the web POS API with concurrent synthetic terminals and reports
+latency percentiles, latency histograms and throughput per endpoint, then
+compares the results with PERFORMANCE_CONFIG['performance_targets'].
+
+By default the Flask app runs in-process through its test client, so only
+the two Redis stores (6379/6380) need to be up; --start-redis launches
+throwaway redis-server instances if they are not. Use --url to benchmark a
+running server instead (Flask or the asyncio mode).
+
+Checkouts are committed to both stores like real ones, under BENCH_*
+customer IDs, so point it at demo data only.
+
+Examples:
+    python benchmark_pos.py --terminals 16 --duration 10
+    python benchmark_pos.py --url http://localhost:5001 --ramp
+    python benchmark_pos.py --mix process_transaction=1 --json results.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlparse
+
+import redis
+
+from config import PERFORMANCE_CONFIG
+
+STORE_PORTS = [6379, 6380]
+
+ENDPOINTS = {
+    "process_transaction": ("POST", "/api/process_transaction"),
+    "dashboard_data": ("GET", "/api/dashboard_data"),
+    "replication_status": ("GET", "/api/replication_status"),
+}
+
+DEFAULT_MIX = "process_transaction=8,dashboard_data=1,replication_status=1"
+
+# Histogram bucket upper bounds in ms; the open last bucket is reported as None (JSON null)
+HISTOGRAM_BUCKETS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, float("inf")]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class LatencyRecorder:
+    def __init__(self):
+        """Collect per-endpoint latencies and errors from many terminals"""
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, int] = {name: 0 for name in ENDPOINTS}
+
+    def record(self, endpoint: str, latency_ms: float, ok: bool):
+        with self.lock:
+            if ok:
+                self.latencies[endpoint].append(latency_ms)
+            else:
+                self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """Percentiles, throughput and histogram per endpoint"""
+        results = {}
+        for endpoint, values in self.latencies.items():
+            values = sorted(values)
+            if not values and not self.errors[endpoint]:
+                continue
+
+            histogram = []
+            remaining = iter(values)
+            value = next(remaining, None)
+            for upper in HISTOGRAM_BUCKETS:
+                count = 0
+                while value is not None and value <= upper:
+                    count += 1
+                    value = next(remaining, None)
+                histogram.append((upper if upper != float("inf") else None, count))
+
+            results[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "throughput_rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+                "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+                "p50_ms": round(percentile(values, 50), 2),
+                "p90_ms": round(percentile(values, 90), 2),
+                "p99_ms": round(percentile(values, 99), 2),
+                "max_ms": round(values[-1], 2) if values else 0.0,
+                "histogram": histogram
+            }
+        return results
+
+
+class HttpTransport:
+    def __init__(self, base_url: str):
+        """Keep-alive HTTP connection to a running POS server, one per terminal"""
+        parsed = urlparse(base_url)
+        self.connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+
+    def request(self, method: str, path: str, body: Optional[dict], headers: Dict[str, str]):
+        payload = json.dumps(body) if body is not None else None
+        if payload is not None:
+            headers = dict(headers, **{"Content-Type": "application/json"})
+        try:
+            self.connection.request(method, path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            self.connection.close()
+            raise
+        return response.status, json.loads(data) if data else None
+
+    def close(self):
+        self.connection.close()
+
+
+class InProcessTransport:
+    def __init__(self, app):
+        """Flask test client: exercises the app and Redis without a socket"""
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, body: Optional[dict], headers: Dict[str, str]):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+    def close(self):
+        pass
+
+
+class POSBenchmark:
+    def __init__(self, url: Optional[str], mix: Dict[str, int], page_limit: int = 10):
+        """Benchmark runner for either a running server or the in-process app"""
+        self.url = url
+        self.app = None
+        if not url:
+            from unified_pos_web import app
+            self.app = app
+
+        self.mix = [(endpoint, weight) for endpoint, weight in mix.items() if weight > 0]
+        self.page_limit = page_limit
+        self.products = list(self.new_transport().request("GET", "/api/products", None, {})[1])
+
+    def new_transport(self):
+        return HttpTransport(self.url) if self.url else InProcessTransport(self.app)
+
+    def pick_endpoint(self, rng: random.Random) -> str:
+        return rng.choices([e for e, _ in self.mix], weights=[w for _, w in self.mix])[0]
+
+    def request_for(self, endpoint: str, terminal: int, sequence: int, rng: random.Random):
+        """Method, path and body for one synthetic request"""
+        method, path = ENDPOINTS[endpoint]
+        if endpoint == "process_transaction":
+            return method, path, {
+                "customer_id": f"BENCH_{terminal:03d}_{sequence}",
+                "product_sku": rng.choice(self.products),
+                "store_id": rng.choice(["STORE_A", "STORE_B"]),
+                "transaction_type": "PURCHASE"
+            }
+        if endpoint == "dashboard_data":
+            return method, f"{path}?limit={self.page_limit}", None
+        return method, path, None
+
+    def run_terminal(self, terminal: int, deadline: float, measure_from: float,
+                     recorder: LatencyRecorder):
+        """Closed loop: one outstanding request per terminal until the deadline"""
+        rng = random.Random(terminal)
+        transport = self.new_transport()
+        headers = {"X-Terminal-ID": f"bench-{terminal}"}
+        sequence = 0
+        try:
+            while time.perf_counter() < deadline:
+                endpoint = self.pick_endpoint(rng)
+                method, path, body = self.request_for(endpoint, terminal, sequence, rng)
+                sequence += 1
+
+                start = time.perf_counter()
+                try:
+                    status, data = transport.request(method, path, body, headers)
+                    ok = status == 200 and isinstance(data, dict) and data.get("success", True)
+                except Exception:
+                    ok = False
+                latency_ms = (time.perf_counter() - start) * 1000
+
+                if start >= measure_from:
+                    recorder.record(endpoint, latency_ms, ok)
+        finally:
+            transport.close()
+
+    def run(self, terminals: int, duration: float, warmup: float) -> Dict[str, Any]:
+        """Run one load level and return its summary"""
+        recorder = LatencyRecorder()
+        measure_from = time.perf_counter() + warmup
+        deadline = measure_from + duration
+
+        threads = [threading.Thread(target=self.run_terminal,
+                                    args=(terminal, deadline, measure_from, recorder), daemon=True)
+                   for terminal in range(terminals)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        endpoints = recorder.summary(duration)
+        return {
+            "terminals": terminals,
+            "duration_s": duration,
+            "total_rps": round(sum(e["throughput_rps"] for e in endpoints.values()), 1),
+            "endpoints": endpoints
+        }
+
+
+def compare_to_targets(result: Dict[str, Any], targets: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Check process_transaction latency and throughput against the configured targets"""
+    checkout = result["endpoints"].get("process_transaction")
+    if not checkout:
+        return []
+
+    return [
+        {
+            "metric": "processing_time_ms (p50)",
+            "target": targets["processing_time_ms"],
+            "actual": checkout["p50_ms"],
+            "passed": checkout["p50_ms"] <= targets["processing_time_ms"]
+        },
+        {
+            "metric": "throughput_tps",
+            "target": targets["throughput_tps"],
+            "actual": checkout["throughput_rps"],
+            "passed": checkout["throughput_rps"] >= targets["throughput_tps"]
+        }
+    ]
+
+
+def print_result(result: Dict[str, Any]):
+    """Print percentiles, histograms and throughput for one load level"""
+    print(f"\n📊 BENCHMARK - {result['terminals']} terminals, {result['duration_s']}s")
+    print("=" * 60)
+    for endpoint, stats in result["endpoints"].items():
+        print(f"\n🔗 {endpoint}")
+        print(f"   Requests: {stats['requests']}  Errors: {stats['errors']}  "
+              f"Throughput: {stats['throughput_rps']} req/s")
+        print(f"   ⏱️  mean {stats['mean_ms']}ms  p50 {stats['p50_ms']}ms  p90 {stats['p90_ms']}ms  "
+              f"p99 {stats['p99_ms']}ms  max {stats['max_ms']}ms")
+
+        peak = max((count for _, count in stats["histogram"]), default=0)
+        for upper, count in stats["histogram"]:
+            if not count:
+                continue
+            label = f"≤{upper:g}ms" if upper is not None else f">{HISTOGRAM_BUCKETS[-2]:g}ms"
+            bar = "█" * max(1, int(40 * count / peak)) if peak else ""
+            print(f"   {label:>9} {bar} {count}")
+    print(f"\n🚀 Total throughput: {result['total_rps']} req/s")
+
+
+def print_targets(checks: List[Dict[str, Any]]):
+    """Print the comparison with PERFORMANCE_CONFIG targets"""
+    if not checks:
+        return
+    print("\n🎯 PERFORMANCE TARGETS")
+    print("=" * 60)
+    for check in checks:
+        status = "✅" if check["passed"] else "❌"
+        print(f"{status} {check['metric']}: {check['actual']} (target {check['target']})")
+
+
+def ensure_redis(start: bool) -> List[subprocess.Popen]:
+    """Check both stores are up, optionally starting missing ones"""
+    started = []
+    for port in STORE_PORTS:
+        try:
+            redis.Redis(port=port).ping()
+            print(f"✅ Redis store on port {port} is running")
+            continue
+        except redis.ConnectionError:
+            if not start:
+                raise SystemExit(f"❌ No Redis on port {port} (use --start-redis)")
+
+        process = subprocess.Popen(["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+                                   stdout=subprocess.DEVNULL)
+        started.append(process)
+        for _ in range(50):
+            try:
+                redis.Redis(port=port).ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.1)
+        print(f"🚀 Started redis-server on port {port}")
+    return started
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse 'endpoint=weight,...' into weights"""
+    mix = {}
+    for item in value.split(","):
+        endpoint, _, weight = item.partition("=")
+        endpoint = endpoint.strip()
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{endpoint}'")
+        mix[endpoint] = int(weight or 1)
+    return mix
+
+
+def main():
+    """Run the benchmark and report against the performance targets"""
+    parser = argparse.ArgumentParser(description="Unified Web POS load test")
+    parser.add_argument("--url", help="Benchmark a running server (default: in-process Flask app)")
+    parser.add_argument("--terminals", type=int, default=8, help="Concurrent synthetic terminals")
+    parser.add_argument("--duration", type=float, default=10, help="Measured seconds per load level")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured seconds before each level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Endpoint weights (default {DEFAULT_MIX})")
+    parser.add_argument("--ramp", action="store_true",
+                        help="Double terminals from 1 up to --terminals to find max sustainable TPS")
+    parser.add_argument("--p99-limit-ms", type=float, default=100,
+                        help="Checkout p99 a load level must meet to count as sustainable")
+    parser.add_argument("--start-redis", action="store_true", help="Start missing redis-server instances")
+    parser.add_argument("--json", help="Write all results to this file")
+    args = parser.parse_args()
+
+    started = [] if args.url else ensure_redis(args.start_redis)
+    targets = PERFORMANCE_CONFIG["performance_targets"]
+
+    try:
+        benchmark = POSBenchmark(args.url, args.mix)
+
+        levels = [args.terminals]
+        if args.ramp:
+            levels, terminals = [], 1
+            while terminals < args.terminals:
+                levels.append(terminals)
+                terminals *= 2
+            levels.append(args.terminals)
+
+        results = []
+        for terminals in levels:
+            result = benchmark.run(terminals, args.duration, args.warmup)
+            result["targets"] = compare_to_targets(result, targets)
+            print_result(result)
+            print_targets(result["targets"])
+            results.append(result)
+
+        # Highest checkout throughput whose p99 stays within the limit and without errors
+        sustainable = [r for r in results
+                       if "process_transaction" in r["endpoints"]
+                       and r["endpoints"]["process_transaction"]["p99_ms"] <= args.p99_limit_ms
+                       and not r["endpoints"]["process_transaction"]["errors"]]
+        max_tps = max((r["endpoints"]["process_transaction"]["throughput_rps"] for r in sustainable), default=0.0)
+        if args.ramp:
+            print(f"\n🏁 Max sustainable checkout TPS (p99 ≤ {args.p99_limit_ms}ms): {max_tps}")
+
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"targets": targets, "max_sustainable_tps": max_tps, "results": results},
+                          f, indent=2, default=str)
+            print(f"💾 Results written to {args.json}")
+    finally:
+        for process in started:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
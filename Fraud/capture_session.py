@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Capture Sessions - per-terminal photo capture state
+
+A photo captured at a terminal waits in Redis under that terminal's ID
+until the checkout that uses it, instead of in process memory. Any web
+worker can then serve any step of a terminal's checkout, and terminals
+never see each other's photos. Abandoned captures expire on their own.
+
+A checkout takes its photo with GETDEL, so two concurrent checkouts from
+one terminal cannot both use the same capture; a checkout that fails puts
+its photo back unless a newer one was captured meanwhile.
+
+Each helper returns the client call, so ``redis.asyncio`` callers simply
+await the result. Clients must not decode responses (see
+``photo_store.binary_client``) since the photo is stored as raw JPEG bytes.
+"""
+
+import re
+from typing import Optional
+
+CAPTURE_SESSION_PREFIX = "capture_session:"
+CAPTURE_SESSION_TTL = 300  # seconds a captured photo waits for its checkout
+
+# Terminals that do not identify themselves share this slot
+DEFAULT_TERMINAL_ID = "default"
+
+_TERMINAL_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def capture_session_key(terminal_id: str) -> str:
+    """Key holding a terminal's pending photo"""
+    return f"{CAPTURE_SESSION_PREFIX}{terminal_id}"
+
+
+def normalize_terminal_id(terminal_id: Optional[str]) -> str:
+    """Accept short alphanumeric terminal IDs, falling back to the shared slot"""
+    if terminal_id and _TERMINAL_ID_PATTERN.match(terminal_id):
+        return terminal_id
+    return DEFAULT_TERMINAL_ID
+
+
+def save_capture(redis_client, terminal_id: str, photo_jpeg: bytes,
+                 ttl: int = CAPTURE_SESSION_TTL):
+    """Store (or replace) a terminal's pending photo"""
+    return redis_client.set(capture_session_key(terminal_id), photo_jpeg, ex=ttl)
+
+
+def take_capture(redis_client, terminal_id: str):
+    """Atomically read and remove a terminal's pending photo for a checkout"""
+    return redis_client.getdel(capture_session_key(terminal_id))
+
+
+def restore_capture(redis_client, terminal_id: str, photo_jpeg: bytes,
+                    ttl: int = CAPTURE_SESSION_TTL):
+    """Put back a photo whose checkout failed, unless a newer one was captured"""
+    return redis_client.set(capture_session_key(terminal_id), photo_jpeg, ex=ttl, nx=True)
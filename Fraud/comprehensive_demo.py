@@ -8,13 +8,16 @@ This creates a complete fraud detection scenario with:
 3. Fraud pattern detection
 4. Face verification simulation
 5. Multiple fraud scenarios
+
+Run with --compress to replicate transaction records dictionary-compressed
+and report the compression ratio and CPU cost alongside replication time.
 """
 
+import argparse
 import redis
 import json
 import time
 import uuid
-import base64
 import threading
 import random
 from datetime import datetime, timedelta
@@ -22,13 +25,22 @@ from typing import Dict, List, Any
 import cv2
 import numpy as np
 
+from transaction_store import (
+    transaction_key, commit_transaction, should_replicate, tag_origin, parse_transaction
+)
+from payload_codec import CompressionStats, format_compression
+from photo_store import photo_digest, photo_blob_key
+
 class ComprehensiveFraudDemo:
-    def __init__(self):
+    def __init__(self, compress: bool = False):
         """Initialize the comprehensive demo"""
         # Redis connections
         self.redis_a = redis.Redis(host='localhost', port=6379, db=0, decode_responses=False)
         self.redis_b = redis.Redis(host='localhost', port=6380, db=0, decode_responses=False)
         
+        # Replicate records dictionary-compressed
+        self.compression = CompressionStats() if compress else None
+        
         # Demo state
         self.running = False
         self.transaction_counter = 0
@@ -81,7 +93,7 @@ class ComprehensiveFraudDemo:
             print(f"❌ Store B connection failed: {e}")
             raise
     
-    def generate_fake_photo(self, customer_id: str, has_face: bool = True) -> str:
+    def generate_fake_photo(self, customer_id: str, has_face: bool = True) -> bytes:
         """Generate a fake photo for demo purposes"""
         # Create a random background
         img = np.random.randint(80, 180, (240, 320, 3), dtype=np.uint8)
@@ -126,9 +138,8 @@ class ComprehensiveFraudDemo:
         cv2.putText(img, "DEMO PHOTO", (10, 220), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
         
-        # Convert to base64
         _, buffer = cv2.imencode('.jpg', img)
-        return base64.b64encode(buffer).decode('utf-8')
+        return buffer.tobytes()
     
     def create_transaction(self, store_id: str, customer_id: str, product_sku: str, 
                           transaction_type: str = "PURCHASE", has_photo: bool = True,
@@ -192,15 +203,12 @@ class ComprehensiveFraudDemo:
         
         # Generate photo
         photo_data = self.generate_fake_photo(customer_id, has_face=True)
+        transaction["photo_ref"] = photo_digest(photo_data)
         
         # Store in Redis
         redis_client = self.redis_a if store_id == "STORE_A" else self.redis_b
         
-        redis_client.set(f"transaction:{transaction['transaction_id']}", 
-                        json.dumps(transaction))
-        redis_client.set(f"photo:{transaction['transaction_id']}", photo_data)
-        
-        # Add to stream
+        # Stream entry
         stream_data = {
             "transaction_id": transaction["transaction_id"],
             "store_id": store_id,
@@ -211,9 +219,11 @@ class ComprehensiveFraudDemo:
             "has_photo": "true",
             "face_verified": "true",
             "is_fraudulent": "false",
+            "photo_ref": transaction["photo_ref"],
             "timestamp": str(transaction["timestamp"])
         }
-        redis_client.xadd("transaction_stream", stream_data)
+        commit_transaction(redis_client, transaction["transaction_id"], json.dumps(transaction),
+                           stream_data, photo_data, transaction["photo_ref"])
         
         self.stats["legitimate_transactions"] += 1
         
@@ -239,15 +249,12 @@ class ComprehensiveFraudDemo:
         
         # Generate suspicious photo (or no photo)
         photo_data = self.generate_fake_photo(customer_id, has_face=False)
+        transaction["photo_ref"] = photo_digest(photo_data)
         
         # Store in Redis
         redis_client = self.redis_b if store_id == "STORE_B" else self.redis_a
         
-        redis_client.set(f"transaction:{transaction['transaction_id']}", 
-                        json.dumps(transaction))
-        redis_client.set(f"photo:{transaction['transaction_id']}", photo_data)
-        
-        # Add to stream
+        # Stream entry
         stream_data = {
             "transaction_id": transaction["transaction_id"],
             "store_id": store_id,
@@ -258,9 +265,11 @@ class ComprehensiveFraudDemo:
             "has_photo": "false",
             "face_verified": "false",
             "is_fraudulent": "true",
+            "photo_ref": transaction["photo_ref"],
             "timestamp": str(transaction["timestamp"])
         }
-        redis_client.xadd("transaction_stream", stream_data)
+        commit_transaction(redis_client, transaction["transaction_id"], json.dumps(transaction),
+                           stream_data, photo_data, transaction["photo_ref"])
         
         self.stats["fraudulent_attempts"] += 1
         self.stats["total_value_protected"] += abs(transaction["amount"])
@@ -285,25 +294,26 @@ class ComprehensiveFraudDemo:
 
             if stream_data:
                 for stream_id, fields in stream_data:
+                    if not should_replicate(fields, target_store):
+                        # Latest entry came from the target; don't send it back
+                        continue
+
                     # Measure replication time
                     start_time = time.perf_counter()
 
-                    # Replicate stream entry
-                    target_redis.xadd("transaction_stream", fields)
-
-                    # Replicate associated data
-                    if b"transaction_id" in fields:
-                        txn_id = fields[b"transaction_id"].decode()
+                    txn_id = fields[b"transaction_id"].decode() if b"transaction_id" in fields else None
+                    txn_data = source_redis.get(transaction_key(txn_id)) if txn_id else None
 
-                        # Replicate transaction data
-                        txn_data = source_redis.get(f"transaction:{txn_id}")
-                        if txn_data:
-                            target_redis.set(f"transaction:{txn_id}", txn_data)
-
-                        # Replicate photo data
-                        photo_data = source_redis.get(f"photo:{txn_id}")
-                        if photo_data:
-                            target_redis.set(f"photo:{txn_id}", photo_data)
+                    if txn_data:
+                        # Replicate transaction, photo reference and stream entry together
+                        photo_ref = parse_transaction(txn_data).get("photo_ref")
+                        photo_data = source_redis.get(photo_blob_key(photo_ref)) if photo_ref else None
+                        if self.compression is not None:
+                            txn_data = self.compression.encode("transaction", txn_data)
+                        commit_transaction(target_redis, txn_id, txn_data, fields,
+                                           photo_data, photo_ref)
+                    else:
+                        target_redis.xadd("transaction_stream", tag_origin(fields))
 
                     end_time = time.perf_counter()
                     replication_time = (end_time - start_time) * 1000
@@ -457,6 +467,9 @@ class ComprehensiveFraudDemo:
         print(f"   Value Protected: ${self.stats['total_value_protected']:.2f}")
         print(f"   Replication Events: {self.stats['replication_events']}")
         print(f"   Avg Replication Time: {self.stats['avg_replication_time']:.2f}ms")
+        if self.compression is not None:
+            for data_type, stats in self.compression.snapshot().items():
+                print(f"   Compression {format_compression(data_type, stats)}")
 
     def print_final_stats(self):
         """Print final comprehensive statistics"""
@@ -469,6 +482,9 @@ class ComprehensiveFraudDemo:
         print(f"💰 Total Value Protected: ${self.stats['total_value_protected']:.2f}")
         print(f"🔄 Replication Events: {self.stats['replication_events']}")
         print(f"⏱️ Avg Replication Time: {self.stats['avg_replication_time']:.2f}ms")
+        if self.compression is not None:
+            for data_type, stats in self.compression.snapshot().items():
+                print(f"🗜️ Compression {format_compression(data_type, stats)}")
 
         # Calculate effectiveness
         if self.stats['fraudulent_attempts'] > 0:
@@ -481,7 +497,12 @@ class ComprehensiveFraudDemo:
 
 def main():
     """Main demo function"""
-    demo = ComprehensiveFraudDemo()
+    parser = argparse.ArgumentParser(description="Comprehensive fraud detection demo")
+    parser.add_argument("--compress", action="store_true",
+                        help="Replicate transaction records dictionary-compressed")
+    args = parser.parse_args()
+
+    demo = ComprehensiveFraudDemo(compress=args.compress)
 
     print("\n🎬 Comprehensive Fraud Detection Demo")
     print("=" * 50)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Event Log - non-blocking output for replication events
+
+Formatting and printing several lines per replicated key inside a
+replication thread makes console I/O the bottleneck at high rates. The
+monitors instead hand each event (a small dict) to ``EventWriter.emit``,
+which only appends it to a bounded queue; a writer thread formats and
+writes events in batches. When the queue is full the event is dropped
+and counted rather than blocking replication.
+
+The writer can print every event, a sample of them, or one aggregated
+summary line per interval, and can append every event to a JSONL file
+whatever is printed.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional, Tuple
+
+OUTPUT_MODES = ["events", "summary", "quiet"]
+
+DEFAULT_QUEUE_SIZE = 10000
+
+# Events written per wakeup of the writer thread
+DRAIN_BATCH = 500
+
+
+class EventWriter:
+    def __init__(self, formatter: Optional[Callable[[Dict[str, Any]], str]] = None, mode: str = "events",
+                 sample: float = 1.0, jsonl_path: Optional[str] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, summary_interval: float = 1.0, stream=None):
+        """Bounded event queue drained by a writer thread
+
+        ``mode`` is "events" (print sampled events with ``formatter``),
+        "summary" (one line per ``summary_interval`` with entry and
+        event rates and per-event timings per direction and type) or "quiet". ``sample`` is the
+        fraction of events printed in "events" mode.
+        """
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode {mode!r}, expected one of {OUTPUT_MODES}")
+        self.formatter = formatter or json.dumps
+        self.mode = mode
+        self.sample = min(max(sample, 0.0), 1.0)
+        self.jsonl_path = jsonl_path
+        self.summary_interval = summary_interval
+        self.stream = stream or sys.stdout
+
+        self.queue = queue.Queue(maxsize=max(1, queue_size))
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.emitted = 0
+        self.dropped = 0
+
+        # Writer-thread state
+        self.sample_credit = 0.0
+        self.window: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self.window_start = time.monotonic()
+        self.reported_dropped = 0
+
+    def emit(self, event: Dict[str, Any]) -> bool:
+        """Queue an event without blocking; returns False if it was dropped"""
+        event.setdefault("ts", time.time())
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return False
+        with self.lock:
+            self.emitted += 1
+        return True
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="event-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        """Write whatever is queued and stop the writer thread"""
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def run(self):
+        jsonl = open(self.jsonl_path, "a", encoding="utf-8") if self.jsonl_path else None
+        try:
+            while not (self.stopping.is_set() and self.queue.empty()):
+                batch = self.drain()
+                lines = [line for line in (self.handle(event) for event in batch) if line]
+
+                if jsonl is not None and batch:
+                    jsonl.write("".join(json.dumps(event, default=str) + "\n" for event in batch))
+                    jsonl.flush()
+
+                if self.mode == "summary" and time.monotonic() - self.window_start >= self.summary_interval:
+                    lines.append(self.summary_line())
+
+                if lines:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+        finally:
+            if jsonl is not None:
+                jsonl.close()
+
+    def drain(self):
+        """Wait briefly for one event, then take whatever else is queued"""
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        while len(batch) < DRAIN_BATCH:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def handle(self, event: Dict[str, Any]) -> Optional[str]:
+        """Aggregate one event; returns its printed form when it is printed"""
+        if self.mode == "summary":
+            stats = self.window.setdefault((event.get("direction", "-"), event.get("type", "-")),
+                                           {"events": 0, "entries": 0, "timed": 0,
+                                            "total_ms": 0.0, "max_ms": 0.0})
+            # A batched event covers several entries but carries one duration
+            stats["events"] += 1
+            stats["entries"] += event.get("entries", 1)
+            if event.get("ms") is not None:
+                stats["timed"] += 1
+                stats["total_ms"] += event["ms"]
+                stats["max_ms"] = max(stats["max_ms"], event["ms"])
+            return None
+        if self.mode == "events":
+            self.sample_credit += self.sample
+            if self.sample_credit >= 1.0:
+                self.sample_credit -= 1.0
+                return self.formatter(event)
+        return None
+
+    def summary_line(self) -> str:
+        """One line for the events seen since the previous summary, then reset"""
+        elapsed = time.monotonic() - self.window_start
+        parts = []
+        for (direction, event_type), stats in sorted(self.window.items()):
+            avg_ms = stats["total_ms"] / stats["timed"] if stats["timed"] else 0.0
+            rate = f"{stats['entries'] / elapsed:.0f}/s"
+            if stats["entries"] != stats["events"]:
+                rate += f" in {stats['events'] / elapsed:.0f} events/s"
+            parts.append(f"{direction} {event_type} {rate} "
+                         f"avg {avg_ms:.2f}ms/event max {stats['max_ms']:.2f}ms")
+        with self.lock:
+            dropped = self.dropped - self.reported_dropped
+            self.reported_dropped = self.dropped
+        if dropped:
+            parts.append(f"⚠️ {dropped} dropped")
+
+        self.window = {}
+        self.window_start = time.monotonic()
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        return f"{timestamp} 📊 " + (" | ".join(parts) if parts else "idle")
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return {"emitted": self.emitted, "dropped": self.dropped, "queued": self.queue.qsize()}
+
+
+def add_output_arguments(parser):
+    """Output flags shared by the replication monitors"""
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="events",
+                        help="Print each event, one summary line per second, or nothing")
+    parser.add_argument("--sample", type=float, default=1.0,
+                        help="Fraction of events printed in events mode (e.g. 0.01)")
+    parser.add_argument("--jsonl", default=None, help="Append every event to this JSONL file")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Events buffered for output before new ones are dropped")
+
+
+def writer_from_args(args, formatter: Callable[[Dict[str, Any]], str]) -> EventWriter:
+    return EventWriter(formatter, mode=args.output, sample=args.sample, jsonl_path=args.jsonl,
+                       queue_size=args.queue_size)
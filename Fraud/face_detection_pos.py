@@ -16,11 +16,13 @@ import redis
 import json
 import time
 import uuid
-import base64
 from datetime import datetime
 from typing import Dict, Optional, Tuple
 import logging
 
+from transaction_store import queue_transaction_commit
+from photo_store import photo_digest
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -169,7 +171,7 @@ class FaceDetectionPOS:
         quality_score = (size_score * 0.3 + contrast_score * 0.4 + sharpness_score * 0.3)
         return min(quality_score, 1.0)
     
-    def capture_face_verified_photo(self, customer_id: str) -> Optional[str]:
+    def capture_face_verified_photo(self, customer_id: str) -> Optional[bytes]:
         """Capture photo with face verification"""
         if not self.camera or not self.camera.isOpened():
             print("⚠️ Camera not available, generating demo photo...")
@@ -269,22 +271,22 @@ class FaceDetectionPOS:
             # Process and encode the photo
             storage_photo = cv2.resize(captured_photo, (320, 240))
             _, buffer = cv2.imencode('.jpg', storage_photo)
-            photo_base64 = base64.b64encode(buffer).decode('utf-8')
+            photo_jpeg = buffer.tobytes()
             
             # Show final captured photo
             cv2.imshow('Final Captured Photo', storage_photo)
             print(f"✅ Face-verified photo captured!")
             print(f"📊 Photo quality score: {best_quality:.2f}")
-            print(f"📊 Photo size: {len(photo_base64)} characters")
+            print(f"📊 Photo size: {len(photo_jpeg)} bytes")
             print("Press any key to continue...")
             cv2.waitKey(0)
             cv2.destroyAllWindows()
             
-            return photo_base64
+            return photo_jpeg
         
         return None
     
-    def generate_demo_photo(self, customer_id: str) -> str:
+    def generate_demo_photo(self, customer_id: str) -> bytes:
         """Generate demo photo with face simulation"""
         img = np.random.randint(80, 180, (240, 320, 3), dtype=np.uint8)
         
@@ -307,7 +309,7 @@ class FaceDetectionPOS:
         cv2.destroyAllWindows()
         
         _, buffer = cv2.imencode('.jpg', img)
-        return base64.b64encode(buffer).decode('utf-8')
+        return buffer.tobytes()
     
     def process_purchase_with_face_detection(self, customer_id: str, product_sku: str) -> Dict:
         """Process purchase with face detection verification"""
@@ -331,6 +333,7 @@ class FaceDetectionPOS:
         # Process transaction
         transaction_id = f"TXN_{self.store_id}_{uuid.uuid4().hex[:8].upper()}"
         timestamp = int(time.time())
+        photo_ref = photo_digest(customer_photo)
         
         transaction = {
             "transaction_id": transaction_id,
@@ -343,17 +346,14 @@ class FaceDetectionPOS:
             "timestamp": timestamp,
             "datetime": datetime.fromtimestamp(timestamp).isoformat(),
             "has_photo": True,
+            "photo_ref": photo_ref,
             "face_verified": True,
             "verification_method": "FACE_DETECTION",
             "status": "COMPLETED"
         }
         
         try:
-            # Store in Redis
-            self.redis_client.set(f"transaction:{transaction_id}", json.dumps(transaction))
-            self.redis_client.set(f"photo:{transaction_id}", customer_photo)
-            
-            # Add to stream
+            # Stream entry
             stream_data = {
                 "transaction_id": transaction_id,
                 "store_id": self.store_id,
@@ -364,9 +364,15 @@ class FaceDetectionPOS:
                 "has_photo": "true",
                 "face_verified": "true",
                 "verification": "FACE_DETECTION",
+                "photo_ref": photo_ref,
                 "timestamp": str(timestamp)
             }
-            self.redis_client.xadd("transaction_stream", stream_data)
+            
+            # Store transaction, photo and stream entry in one MULTI/EXEC
+            pipe = self.redis_client.pipeline(transaction=True)
+            queue_transaction_commit(pipe, transaction_id, json.dumps(transaction),
+                                     stream_data, customer_photo, photo_ref)
+            pipe.execute()
             
             print(f"\n✅ Purchase Completed with Face Verification!")
             print(f"Transaction ID: {transaction_id}")
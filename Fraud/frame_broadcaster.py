@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Frame Broadcaster - one camera reader shared by every preview client
+
+A single background thread reads the camera, annotates each frame (face
+boxes) and JPEG-encodes it once. The latest encoded frame is published to a
+shared slot, and every MJPEG client just waits for the next frame number,
+so a second browser tab costs a socket write instead of a second
+detect-and-encode pipeline fighting over the same ``cv2.VideoCapture``.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Any, Optional, Tuple
+
+import cv2
+
+MJPEG_BOUNDARY = "frame"
+
+
+class FrameBroadcaster:
+    def __init__(self, camera, annotate: Optional[Callable] = None,
+                 frame_size: Tuple[int, int] = (640, 480), jpeg_quality: int = 95):
+        """Broadcast frames from an opened ``cv2.VideoCapture``
+
+        ``annotate(frame)`` may draw on the frame in place and must return
+        the frame as the first item of a tuple, like ``detect_faces``.
+        """
+        self.camera = camera
+        self.annotate = annotate
+        self.frame_size = frame_size
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+
+        self.running = False
+        self.thread = None
+
+        # Latest published frame, guarded by the condition
+        self.condition = threading.Condition()
+        self.frame_number = 0
+        self.frame_jpeg = None
+        self.raw_frame = None
+
+        # Counters
+        self.clients = 0
+        self.frames_captured = 0
+        self.fps = 0.0
+        self.last_annotate_ms = 0.0
+        self.avg_annotate_ms = 0.0
+        self.last_encode_ms = 0.0
+        self.avg_encode_ms = 0.0
+
+    def start(self):
+        """Start the capture thread"""
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the capture thread and release waiting clients"""
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+
+    def _capture_loop(self):
+        """Read, annotate and encode frames until stopped or the camera fails"""
+        window_start = time.perf_counter()
+        window_frames = 0
+
+        while self.running:
+            ret, frame = self.camera.read()
+            if not ret:
+                break
+
+            frame = cv2.resize(frame, self.frame_size)
+            raw_frame = frame.copy()
+
+            start = time.perf_counter()
+            if self.annotate:
+                frame = self.annotate(frame)[0]
+            annotate_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            _, buffer = cv2.imencode('.jpg', frame, self.encode_params)
+            encode_ms = (time.perf_counter() - start) * 1000
+
+            with self.condition:
+                self.frame_number += 1
+                self.frame_jpeg = buffer.tobytes()
+                self.raw_frame = raw_frame
+                self.condition.notify_all()
+
+            self.frames_captured += 1
+            self.last_annotate_ms = annotate_ms
+            self.last_encode_ms = encode_ms
+            # Exponential moving averages, weighted towards recent frames
+            self.avg_annotate_ms = annotate_ms if self.frames_captured == 1 else 0.9 * self.avg_annotate_ms + 0.1 * annotate_ms
+            self.avg_encode_ms = encode_ms if self.frames_captured == 1 else 0.9 * self.avg_encode_ms + 0.1 * encode_ms
+
+            window_frames += 1
+            elapsed = time.perf_counter() - window_start
+            if elapsed >= 1.0:
+                self.fps = window_frames / elapsed
+                window_start = time.perf_counter()
+                window_frames = 0
+
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait_for_frame(self, after: int, timeout: float = 1.0) -> Optional[Tuple[int, bytes]]:
+        """Block until a frame newer than ``after`` is published
+
+        Returns ``(frame_number, jpeg)``, or ``None`` on timeout or stop.
+        Slow clients simply skip to the newest frame.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_number > after or not self.running,
+                                    timeout=timeout)
+            if self.frame_number > after and self.frame_jpeg is not None:
+                return self.frame_number, self.frame_jpeg
+        return None
+
+    def latest_raw_frame(self):
+        """Copy of the newest unannotated frame, for photo capture"""
+        with self.condition:
+            return None if self.raw_frame is None else self.raw_frame.copy()
+
+    def mjpeg_stream(self):
+        """Generate a multipart MJPEG stream for one HTTP client"""
+        with self.condition:
+            self.clients += 1
+        try:
+            last_frame = 0
+            while self.running:
+                frame = self.wait_for_frame(last_frame)
+                if frame is None:
+                    continue
+                last_frame, frame_jpeg = frame
+                yield (b'--' + MJPEG_BOUNDARY.encode() + b'\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + frame_jpeg + b'\r\n')
+        finally:
+            with self.condition:
+                self.clients -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Frame rate, per-frame cost and client counters"""
+        return {
+            "running": self.running,
+            "clients": self.clients,
+            "frames_captured": self.frames_captured,
+            "fps": round(self.fps, 1),
+            "annotate_ms": {"last": round(self.last_annotate_ms, 2), "avg": round(self.avg_annotate_ms, 2)},
+            "encode_ms": {"last": round(self.last_encode_ms, 2), "avg": round(self.avg_encode_ms, 2)}
+        }
@@ -8,6 +8,25 @@ This web dashboard provides:
 3. Visual fraud detection alerts
 4. Photo verification comparison
 5. Transaction timeline and analytics
+
+Live updates are pushed rather than polled: one thread per store blocks
+in XREAD on its streams and emits only the entries that just arrived as a
+'transaction_delta', which the page merges into what it already shows. A
+full 'transaction_update' snapshot is sent only when a client asks for
+one, on (re)connect. Idle stores cost a blocked XREAD and no traffic.
+
+Transactions are hydrated with one MGET per batch and carry a photo_url
+and thumbnail_url instead of the photo itself; listings render the small
+cached thumbnail from /api/transaction/<id>/thumbnail and load the full
+photo from /api/transaction/<id>/photo only when it is clicked.
+
+Simultaneous returns are found by a SimultaneousReturnDetector fed every
+return the push threads read, primed with the last five minutes of each
+stream when monitoring starts.
+
+The snapshot (recent transactions, alerts and attempts) is built once and
+shared by /api/transactions and every socket client, until the next delta
+or SNAPSHOT_MAX_AGE; REST responses carry its ETag.
 """
 
 import redis
@@ -15,15 +34,36 @@ import json
 import time
 import base64
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_socketio import SocketIO, emit
 import threading
 import logging
 
+from photo_store import load_photo, load_photo_base64, photo_digest
+from transaction_store import parse_transaction, transaction_key, TRANSACTION_STREAM
+from return_detector import SimultaneousReturnDetector, RETURN_WINDOW_SECONDS
+from snapshot_cache import SharedSnapshot, conditional_response
+from photo_thumbnails import load_thumbnail, THUMBNAIL_FORMATS
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+FRAUD_ALERTS = "fraud_alerts"
+
+# How long one XREAD waits for new entries before re-checking for shutdown
+DELTA_BLOCK_MS = 5000
+DELTA_MAX_ENTRIES = 100
+
+# Deltas invalidate the shared snapshot; this bounds its age when none arrive
+SNAPSHOT_MAX_AGE = 5.0
+
+# Stream entries read per XRANGE while priming the return detector
+PRIME_BATCH = 1000
+
+# A transaction's photo never changes once committed
+PHOTO_CACHE_SECONDS = 86400
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'fraud_detection_demo_2024'
 socketio = SocketIO(app, cors_allowed_origins="*")
@@ -36,7 +76,10 @@ class FraudDashboard:
         self.redis_store_b = self.connect_redis("localhost", 6380, "Store B")
         
         self.monitoring = False
-        self.monitor_thread = None
+        self.monitor_threads = []
+        self.monitoring_lock = threading.Lock()
+        self.return_detector = SimultaneousReturnDetector()
+        self.snapshot = SharedSnapshot(max_age=SNAPSHOT_MAX_AGE)
         
     def connect_redis(self, host: str, port: int, store_name: str):
         """Connect to Redis instance"""
@@ -49,24 +92,27 @@ class FraudDashboard:
             logger.error(f"❌ Failed to connect to {store_name} Redis at {host}:{port}")
             return None
     
-    def get_transaction_data(self, redis_client, transaction_id: str):
-        """Get complete transaction data including photo"""
+    def photo_origins(self):
+        """Store clients by ID, for photos replicated lazily"""
+        return {"STORE_A": self.redis_store_a, "STORE_B": self.redis_store_b}
+    
+    def get_transaction_data(self, redis_client, transaction_id: str, include_photo: bool = False):
+        """Get transaction data, with the photo inlined as base64 only if asked"""
         try:
             # Get transaction details
-            transaction_key = f"transaction:{transaction_id}"
-            transaction_data = redis_client.get(transaction_key)
+            transaction_data = redis_client.get(transaction_key(transaction_id))
             
             if not transaction_data:
                 return None
             
-            transaction = json.loads(transaction_data)
-            
-            # Get photo if available
-            photo_key = f"photo:{transaction_id}"
-            photo_data = redis_client.get(photo_key)
+            transaction = add_photo_url(parse_transaction(transaction_data), transaction_id)
             
-            if photo_data:
-                transaction['photo_base64'] = photo_data.decode('utf-8')
+            # Get photo if available (content-addressed blob or legacy base64 key);
+            # photos replicated lazily are fetched from the transaction's store
+            if include_photo:
+                photo_base64 = load_photo_base64(redis_client, transaction, self.photo_origins())
+                if photo_base64:
+                    transaction['photo_base64'] = photo_base64
             
             return transaction
             
@@ -74,165 +120,249 @@ class FraudDashboard:
             logger.error(f"Error getting transaction data: {e}")
             return None
     
+    def hydrate_transactions(self, redis_client, transactions):
+        """Merge in every transaction's record with one MGET; photos stay behind photo_url"""
+        if not transactions:
+            return transactions
+        records = redis_client.mget([transaction_key(t["transaction_id"]) for t in transactions])
+        for transaction, record in zip(transactions, records):
+            if record:
+                transaction.update(parse_transaction(record))
+            add_photo_url(transaction, transaction["transaction_id"])
+        return transactions
+    
+    def find_transaction(self, transaction_id: str):
+        """``(redis_client, transaction)`` from the first store that has the record"""
+        for redis_client in (self.redis_store_a, self.redis_store_b):
+            if not redis_client:
+                continue
+            transaction_data = redis_client.get(transaction_key(transaction_id))
+            if transaction_data:
+                return redis_client, parse_transaction(transaction_data)
+        return None, None
+    
+    def get_transaction_photo(self, transaction_id: str):
+        """``(photo_jpeg, etag)`` for a transaction from whichever store has it"""
+        redis_client, transaction = self.find_transaction(transaction_id)
+        if transaction is None:
+            return None, None
+        if request.if_none_match and transaction.get("photo_ref") in request.if_none_match:
+            # The browser already holds this content-addressed photo
+            return None, transaction["photo_ref"]
+        photo_jpeg = load_photo(redis_client, transaction, self.photo_origins())
+        if photo_jpeg:
+            return photo_jpeg, transaction.get("photo_ref") or photo_digest(photo_jpeg)
+        return None, None
+    
+    def get_transaction_thumbnail(self, transaction_id: str):
+        """``(thumbnail, etag)`` for a transaction; ``thumbnail`` is None if the browser has it"""
+        redis_client, transaction = self.find_transaction(transaction_id)
+        if transaction is None:
+            return None, None
+        photo_ref = transaction.get("photo_ref")
+        if photo_ref and request.if_none_match:
+            for fmt, _, _ in THUMBNAIL_FORMATS:
+                if f"{photo_ref}-{fmt}" in request.if_none_match:
+                    return None, f"{photo_ref}-{fmt}"
+        thumbnail = load_thumbnail(redis_client, transaction, self.photo_origins())
+        return (thumbnail, thumbnail["etag"]) if thumbnail else (None, None)
+    
     def get_recent_transactions(self, redis_client, limit: int = 20):
         """Get recent transactions from Redis stream"""
         try:
             if not redis_client:
                 return []
                 
-            stream_data = redis_client.xrevrange("transaction_stream", count=limit)
+            stream_data = redis_client.xrevrange(TRANSACTION_STREAM, count=limit)
             
-            transactions = []
-            for stream_id, fields in stream_data:
-                transaction = {
-                    "stream_id": stream_id.decode(),
-                    "transaction_id": fields[b'transaction_id'].decode(),
-                    "store_id": fields[b'store_id'].decode(),
-                    "customer_id": fields[b'customer_id'].decode(),
-                    "type": fields[b'type'].decode(),
-                    "amount": fields[b'amount'].decode(),
-                    "has_photo": fields[b'has_photo'].decode() == "true",
-                    "timestamp": int(fields[b'timestamp'].decode()),
-                    "verification": fields.get(b'verification', b'').decode(),
-                    "fraud_attempt": fields.get(b'fraud_attempt', b'false').decode() == "true"
-                }
-                
-                # Get full transaction details
-                full_data = self.get_transaction_data(redis_client, transaction["transaction_id"])
-                if full_data:
-                    transaction.update(full_data)
-                
-                transactions.append(transaction)
-            
-            return transactions
+            transactions = [self.transaction_from_entry(stream_id, fields) for stream_id, fields in stream_data]
+            return self.hydrate_transactions(redis_client, transactions)
             
         except Exception as e:
             logger.error(f"Error getting recent transactions: {e}")
             return []
     
+    def transaction_from_entry(self, stream_id, fields):
+        """Dashboard view of one transaction_stream entry, before hydration"""
+        transaction = {
+            "stream_id": stream_id.decode(),
+            "transaction_id": fields[b'transaction_id'].decode(),
+            "store_id": fields[b'store_id'].decode(),
+            "customer_id": fields[b'customer_id'].decode(),
+            "type": fields[b'type'].decode(),
+            "amount": fields[b'amount'].decode(),
+            "has_photo": fields[b'has_photo'].decode() == "true",
+            "timestamp": int(fields[b'timestamp'].decode()),
+            "verification": fields.get(b'verification', b'').decode(),
+            "fraud_attempt": fields.get(b'fraud_attempt', b'false').decode() == "true"
+        }
+        if fields.get(b'original_transaction_id'):
+            transaction["original_transaction_id"] = fields[b'original_transaction_id'].decode()
+        
+        return transaction
+    
+    def alert_from_entry(self, stream_id, fields):
+        """Dashboard view of one fraud_alerts entry"""
+        return {
+            "stream_id": stream_id.decode(),
+            "alert_id": fields[b'alert_id'].decode(),
+            "fraud_transaction_id": fields[b'fraud_transaction_id'].decode(),
+            "original_transaction_id": fields[b'original_transaction_id'].decode(),
+            "fraud_type": fields[b'fraud_type'].decode(),
+            "risk_level": fields[b'risk_level'].decode(),
+            "timestamp": int(fields[b'timestamp'].decode()),
+            "store_id": fields[b'store_id'].decode(),
+            "indicators": json.loads(fields[b'indicators'].decode())
+        }
+    
     def get_fraud_alerts(self, redis_client):
         """Get recent fraud alerts"""
         try:
             if not redis_client:
                 return []
                 
-            alerts_data = redis_client.xrevrange("fraud_alerts", count=10)
-            
-            alerts = []
-            for stream_id, fields in alerts_data:
-                alert = {
-                    "alert_id": fields[b'alert_id'].decode(),
-                    "fraud_transaction_id": fields[b'fraud_transaction_id'].decode(),
-                    "original_transaction_id": fields[b'original_transaction_id'].decode(),
-                    "fraud_type": fields[b'fraud_type'].decode(),
-                    "risk_level": fields[b'risk_level'].decode(),
-                    "timestamp": int(fields[b'timestamp'].decode()),
-                    "store_id": fields[b'store_id'].decode(),
-                    "indicators": json.loads(fields[b'indicators'].decode())
-                }
-                alerts.append(alert)
+            alerts_data = redis_client.xrevrange(FRAUD_ALERTS, count=10)
             
-            return alerts
+            return [self.alert_from_entry(stream_id, fields) for stream_id, fields in alerts_data]
             
         except Exception as e:
             logger.error(f"Error getting fraud alerts: {e}")
             return []
     
     def detect_simultaneous_returns(self):
-        """Detect simultaneous return attempts on the same original transaction"""
-        try:
-            # Get recent returns from both stores
-            store_a_transactions = self.get_recent_transactions(self.redis_store_a, 50)
-            store_b_transactions = self.get_recent_transactions(self.redis_store_b, 50)
-            
-            # Filter for returns only
-            store_a_returns = [t for t in store_a_transactions if t.get('type') == 'RETURN']
-            store_b_returns = [t for t in store_b_transactions if t.get('type') == 'RETURN']
-            
-            simultaneous_attempts = []
-            
-            # Check for returns on the same original transaction
-            for a_return in store_a_returns:
-                original_id_a = a_return.get('original_transaction_id')
-                if not original_id_a:
-                    continue
-                    
-                for b_return in store_b_returns:
-                    original_id_b = b_return.get('original_transaction_id')
-                    
-                    if (original_id_a == original_id_b and 
-                        abs(a_return['timestamp'] - b_return['timestamp']) < 300):  # Within 5 minutes
-                        
-                        fraud_detected = {
-                            "original_transaction_id": original_id_a,
-                            "legitimate_return": a_return,
-                            "fraudulent_return": b_return,
-                            "time_difference": abs(a_return['timestamp'] - b_return['timestamp']),
-                            "fraud_indicators": {
-                                "simultaneous_attempts": True,
-                                "photo_verification_mismatch": a_return.get('has_photo', False) != b_return.get('has_photo', False),
-                                "different_stores": a_return['store_id'] != b_return['store_id'],
-                                "no_photo_verification": not b_return.get('has_photo', False)
-                            }
-                        }
-                        simultaneous_attempts.append(fraud_detected)
-            
-            return simultaneous_attempts
-            
-        except Exception as e:
-            logger.error(f"Error detecting simultaneous returns: {e}")
-            return []
+        """Simultaneous return attempts on the same original transaction, within the window"""
+        return self.return_detector.snapshot()
+    
+    def prime_return_detector(self, redis_client):
+        """Index the returns of the last window; returns the stream ID to read on from"""
+        last_id = stream_position(redis_client, TRANSACTION_STREAM)
+        if last_id == "0-0":
+            return last_id
+        
+        start = f"{int((time.time() - RETURN_WINDOW_SECONDS) * 1000)}-0"
+        while True:
+            entries = redis_client.xrange(TRANSACTION_STREAM, min=start, max=last_id, count=PRIME_BATCH)
+            for stream_id, fields in entries:
+                if fields.get(b'type') == b'RETURN':
+                    try:
+                        self.return_detector.add(self.transaction_from_entry(stream_id, fields))
+                    except (KeyError, ValueError) as e:
+                        logger.warning(f"Skipping malformed {TRANSACTION_STREAM} entry {stream_id}: {e}")
+            if len(entries) < PRIME_BATCH:
+                return last_id
+            start = b"(" + entries[-1][0]
+    
+    def build_snapshot(self):
+        """Recent transactions of both stores, fraud alerts and simultaneous returns"""
+        return {
+            'store_a_transactions': self.get_recent_transactions(self.redis_store_a, 20),
+            'store_b_transactions': self.get_recent_transactions(self.redis_store_b, 20),
+            'fraud_alerts': self.get_fraud_alerts(self.redis_store_b),
+            'simultaneous_attempts': self.detect_simultaneous_returns(),
+            'timestamp': time.time()
+        }
+    
+    def get_snapshot(self):
+        """The shared snapshot, rebuilt at most once per change or SNAPSHOT_MAX_AGE
+
+        Monitoring starts with the first snapshot, so REST clients see
+        simultaneous returns without a Socket.IO client connected.
+        """
+        self.start_monitoring()
+        return self.snapshot.get(self.build_snapshot)
     
     def start_monitoring(self):
-        """Start real-time monitoring thread"""
-        if not self.monitoring:
+        """Start one push thread per store; later calls do nothing"""
+        if self.monitoring:
+            return
+        with self.monitoring_lock:
+            if self.monitoring:
+                return
             self.monitoring = True
-            self.monitor_thread = threading.Thread(target=self._monitor_transactions)
-            self.monitor_thread.daemon = True
-            self.monitor_thread.start()
-            logger.info("🔍 Started real-time fraud monitoring")
+            # Fraud alerts are read from Store B, as for the snapshots
+            feeds = [("STORE_A", self.redis_store_a, [TRANSACTION_STREAM]),
+                     ("STORE_B", self.redis_store_b, [TRANSACTION_STREAM, FRAUD_ALERTS])]
+            self.monitor_threads = []
+            for store_id, redis_client, streams in feeds:
+                if not redis_client:
+                    continue
+                try:
+                    start_id = self.prime_return_detector(redis_client)
+                except redis.RedisError as e:
+                    logger.error(f"Could not prime return detection from {store_id}: {e}")
+                    start_id = "$"
+                thread = threading.Thread(target=self._monitor_store,
+                                          args=(store_id, redis_client, streams, start_id))
+                thread.daemon = True
+                thread.start()
+                self.monitor_threads.append(thread)
+            logger.info(f"🔍 Started real-time fraud monitoring "
+                        f"({self.return_detector.size()} returns in the detection window)")
     
     def stop_monitoring(self):
         """Stop real-time monitoring"""
         self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join(timeout=1)
+        for thread in self.monitor_threads:
+            thread.join(timeout=1)
         logger.info("⏹️ Stopped fraud monitoring")
     
-    def _monitor_transactions(self):
-        """Monitor transactions in real-time and emit updates"""
-        last_check = time.time()
+    def _monitor_store(self, store_id: str, redis_client, streams, start_id="$"):
+        """Block on one store's streams and emit each batch of new entries as a delta"""
+        # Only entries added after the thread starts (or priming ends); snapshots cover the rest
+        last_ids = {stream: "$" for stream in streams}
+        last_ids[TRANSACTION_STREAM] = start_id
         
         while self.monitoring:
             try:
-                current_time = time.time()
+                # "$" is re-sent until a stream appears in a reply, missing entries added in between
+                for stream, last_id in last_ids.items():
+                    if last_id == "$":
+                        last_ids[stream] = stream_position(redis_client, stream)
                 
-                # Get recent transactions from both stores
-                store_a_data = self.get_recent_transactions(self.redis_store_a, 10)
-                store_b_data = self.get_recent_transactions(self.redis_store_b, 10)
-                
-                # Get fraud alerts
-                fraud_alerts = self.get_fraud_alerts(self.redis_store_b)
+                reply = redis_client.xread(last_ids, count=DELTA_MAX_ENTRIES, block=DELTA_BLOCK_MS)
+                if not reply:
+                    continue
                 
-                # Detect simultaneous returns
-                simultaneous_attempts = self.detect_simultaneous_returns()
+                delta = {"store_id": store_id, "transactions": [], "fraud_alerts": [], "timestamp": time.time()}
+                detected = False
+                for stream, entries in reply:
+                    stream = stream.decode()
+                    last_ids[stream] = entries[-1][0]
+                    # Newest first, as in the snapshots
+                    for stream_id, fields in reversed(entries):
+                        try:
+                            if stream == TRANSACTION_STREAM:
+                                transaction = self.transaction_from_entry(stream_id, fields)
+                                detected = self.return_detector.add(transaction) is not None or detected
+                                delta["transactions"].append(transaction)
+                            else:
+                                delta["fraud_alerts"].append(self.alert_from_entry(stream_id, fields))
+                        except (KeyError, ValueError) as e:
+                            logger.warning(f"Skipping malformed {stream} entry {stream_id}: {e}")
+                self.hydrate_transactions(redis_client, delta["transactions"])
                 
-                # Emit updates to connected clients
-                socketio.emit('transaction_update', {
-                    'store_a_transactions': store_a_data,
-                    'store_b_transactions': store_b_data,
-                    'fraud_alerts': fraud_alerts,
-                    'simultaneous_attempts': simultaneous_attempts,
-                    'timestamp': current_time
-                })
+                if detected:
+                    delta["simultaneous_attempts"] = self.detect_simultaneous_returns()
                 
-                last_check = current_time
-                time.sleep(2)  # Check every 2 seconds
+                self.snapshot.invalidate()
+                socketio.emit('transaction_delta', delta)
                 
             except Exception as e:
-                logger.error(f"Error in monitoring loop: {e}")
+                logger.error(f"Error in {store_id} monitoring loop: {e}")
                 time.sleep(5)
 
+def stream_position(redis_client, stream: str):
+    """ID of a stream's last entry, "0-0" if it is empty or missing"""
+    last_entry = redis_client.xrevrange(stream, count=1)
+    return last_entry[0][0] if last_entry else "0-0"
+
+def add_photo_url(transaction, transaction_id: str):
+    """Point a transaction that has a photo at the photo and thumbnail endpoints"""
+    if transaction.get("has_photo") or transaction.get("photo_ref"):
+        transaction["photo_url"] = f"/api/transaction/{transaction_id}/photo"
+        transaction["thumbnail_url"] = f"/api/transaction/{transaction_id}/thumbnail"
+    return transaction
+
 # Initialize dashboard
 dashboard = FraudDashboard()
 
@@ -243,37 +373,54 @@ def index():
 
 @app.route('/api/transactions')
 def get_transactions():
-    """API endpoint to get current transaction data"""
-    store_a_data = dashboard.get_recent_transactions(dashboard.redis_store_a, 20)
-    store_b_data = dashboard.get_recent_transactions(dashboard.redis_store_b, 20)
-    fraud_alerts = dashboard.get_fraud_alerts(dashboard.redis_store_b)
-    simultaneous_attempts = dashboard.detect_simultaneous_returns()
-    
-    return jsonify({
-        'store_a_transactions': store_a_data,
-        'store_b_transactions': store_b_data,
-        'fraud_alerts': fraud_alerts,
-        'simultaneous_attempts': simultaneous_attempts,
-        'timestamp': time.time()
-    })
+    """API endpoint to get current transaction data, 304 if unchanged"""
+    status, body, headers = conditional_response(dashboard.get_snapshot(), request.headers.get('If-None-Match'))
+    return Response(body, status=status, headers=headers, mimetype='application/json')
 
 @app.route('/api/transaction/<transaction_id>')
 def get_transaction_details(transaction_id):
-    """Get detailed transaction information"""
+    """Get detailed transaction information; ?include_photo=true inlines the photo"""
+    include_photo = request.args.get('include_photo', 'false').lower() == 'true'
     # Try both Redis instances
-    transaction_data = (dashboard.get_transaction_data(dashboard.redis_store_a, transaction_id) or
-                       dashboard.get_transaction_data(dashboard.redis_store_b, transaction_id))
+    transaction_data = (dashboard.get_transaction_data(dashboard.redis_store_a, transaction_id, include_photo) or
+                       dashboard.get_transaction_data(dashboard.redis_store_b, transaction_id, include_photo))
     
     if transaction_data:
         return jsonify(transaction_data)
     else:
         return jsonify({"error": "Transaction not found"}), 404
 
+@app.route('/api/transaction/<transaction_id>/photo')
+def get_transaction_photo(transaction_id):
+    """A transaction's photo as JPEG, cacheable by browsers and proxies"""
+    photo_jpeg, etag = dashboard.get_transaction_photo(transaction_id)
+    if etag is None:
+        return jsonify({"error": "Photo not found"}), 404
+    
+    response = Response(photo_jpeg or b"", status=200 if photo_jpeg else 304, mimetype="image/jpeg")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={PHOTO_CACHE_SECONDS}, immutable"
+    return response
+
+@app.route('/api/transaction/<transaction_id>/thumbnail')
+def get_transaction_thumbnail(transaction_id):
+    """A small WebP/JPEG rendition of a transaction's photo, for listings"""
+    thumbnail, etag = dashboard.get_transaction_thumbnail(transaction_id)
+    if etag is None:
+        return jsonify({"error": "Photo not found"}), 404
+    
+    if thumbnail:
+        response = Response(thumbnail["data"], mimetype=thumbnail["mimetype"])
+    else:
+        response = Response(b"", status=304)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = f"public, max-age={PHOTO_CACHE_SECONDS}, immutable"
+    return response
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection"""
     logger.info("Client connected to fraud dashboard")
-    dashboard.start_monitoring()
     emit('status', {'message': 'Connected to fraud detection dashboard'})
 
 @socketio.on('disconnect')
@@ -284,18 +431,7 @@ def handle_disconnect():
 @socketio.on('request_update')
 def handle_update_request():
     """Handle manual update request"""
-    store_a_data = dashboard.get_recent_transactions(dashboard.redis_store_a, 20)
-    store_b_data = dashboard.get_recent_transactions(dashboard.redis_store_b, 20)
-    fraud_alerts = dashboard.get_fraud_alerts(dashboard.redis_store_b)
-    simultaneous_attempts = dashboard.detect_simultaneous_returns()
-    
-    emit('transaction_update', {
-        'store_a_transactions': store_a_data,
-        'store_b_transactions': store_b_data,
-        'fraud_alerts': fraud_alerts,
-        'simultaneous_attempts': simultaneous_attempts,
-        'timestamp': time.time()
-    })
+    emit('transaction_update', dashboard.get_snapshot()["value"])
 
 if __name__ == '__main__':
     try:
@@ -306,6 +442,7 @@ if __name__ == '__main__':
         print("⚠️ Fraud detection: Enabled")
         print("\nPress Ctrl+C to stop the dashboard")
         
+        dashboard.start_monitoring()
         socketio.run(app, host='0.0.0.0', port=8080, debug=False)
         
     except KeyboardInterrupt:
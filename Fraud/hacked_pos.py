@@ -18,6 +18,8 @@ from typing import Dict, List
 import logging
 import random
 
+from transaction_store import parse_transaction
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -88,7 +90,7 @@ class HackedPOSSimulator:
             if not original_data:
                 return {"error": "Target transaction not found", "fraud_detected": True}
             
-            original_transaction = json.loads(original_data)
+            original_transaction = parse_transaction(original_data)
             
             # Select random fraudster if not specified
             if not fraudster_id:
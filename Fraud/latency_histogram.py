@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Latency Histogram - log-bucketed replication latency percentiles
+
+A running average hides the tail latency that matters for replication.
+Latencies are recorded in nanoseconds into buckets that grow
+geometrically: every power of two is split into ``2 ** SUB_BUCKET_BITS``
+linear sub-buckets, so each value is kept to within ~3% in a few hundred
+counters however many samples are taken.
+
+Histograms with the same layout merge by adding bucket counts. Each
+replication monitor publishes its snapshot to the ``replication_latency``
+hash of the store the data was written to, one field per monitor, and
+readers merge every field into one distribution per direction and data
+type.
+
+Those histograms time the replicator's own writes. ``ReplicationLag``
+measures staleness instead: from an entry's commit at its origin to the
+moment it is readable on the target, including time spent waiting in the
+stream. It is published to ``replication_lag`` as a histogram plus a live
+gauge per direction.
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Dict, Any, Iterable, Optional
+
+REPLICATION_LATENCY = "replication_latency"
+REPLICATION_LAG = "replication_lag"
+
+# Data type of end-to-end lag series
+LAG_SERIES = "END_TO_END"
+
+# 32 sub-buckets per power of two: at most 1/32 relative error
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+PERCENTILES = {"p50": 50.0, "p90": 90.0, "p99": 99.0, "p999": 99.9}
+
+
+def wall_clock_ms() -> int:
+    """Milliseconds since the epoch, comparable with stream entry IDs"""
+    return time.time_ns() // 1_000_000
+
+
+def bucket_index(value_ns: int) -> int:
+    """Bucket holding a latency in nanoseconds"""
+    if value_ns < 2 * SUB_BUCKETS:
+        return max(0, value_ns)
+    shift = value_ns.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value_ns >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index: int):
+    """Lowest and highest nanosecond value that map to a bucket"""
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    shift = index // SUB_BUCKETS - 1
+    sub_bucket = index % SUB_BUCKETS + SUB_BUCKETS
+    return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self):
+        """Mergeable latency distribution with nanosecond input"""
+        self.lock = threading.Lock()
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum_ns = 0
+        self.min_ns: Optional[int] = None
+        self.max_ns = 0
+
+    def record_ns(self, value_ns: int):
+        value_ns = max(0, int(value_ns))
+        index = bucket_index(value_ns)
+        with self.lock:
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+            self.count += 1
+            self.sum_ns += value_ns
+            self.min_ns = value_ns if self.min_ns is None else min(self.min_ns, value_ns)
+            self.max_ns = max(self.max_ns, value_ns)
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's samples into this one"""
+        with other.lock:
+            buckets, count, sum_ns = dict(other.buckets), other.count, other.sum_ns
+            min_ns, max_ns = other.min_ns, other.max_ns
+        with self.lock:
+            for index, bucket_count in buckets.items():
+                self.buckets[index] = self.buckets.get(index, 0) + bucket_count
+            self.count += count
+            self.sum_ns += sum_ns
+            if min_ns is not None:
+                self.min_ns = min_ns if self.min_ns is None else min(self.min_ns, min_ns)
+            self.max_ns = max(self.max_ns, max_ns)
+        return self
+
+    def percentile_ns(self, percent: float) -> int:
+        """Nearest-rank percentile, reported as the middle of its bucket"""
+        with self.lock:
+            if not self.count:
+                return 0
+            rank = max(1, math.ceil(percent / 100 * self.count))
+            seen = 0
+            for index in sorted(self.buckets):
+                seen += self.buckets[index]
+                if seen >= rank:
+                    low, high = bucket_bounds(index)
+                    # Never report beyond the observed extremes
+                    return min(max((low + high) // 2, self.min_ns), self.max_ns)
+            return self.max_ns
+
+    def summary(self) -> Dict[str, Any]:
+        """Count, mean and percentiles in milliseconds"""
+        result = {
+            "count": self.count,
+            "min_ms": round((self.min_ns or 0) / 1e6, 3),
+            "mean_ms": round(self.sum_ns / self.count / 1e6, 3) if self.count else 0.0
+        }
+        for label, percent in PERCENTILES.items():
+            result[f"{label}_ms"] = round(self.percentile_ns(percent) / 1e6, 3)
+        result["max_ms"] = round(self.max_ns / 1e6, 3)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable snapshot that ``from_dict`` restores"""
+        with self.lock:
+            return {
+                "sub_bucket_bits": SUB_BUCKET_BITS,
+                "count": self.count,
+                "sum_ns": self.sum_ns,
+                "min_ns": self.min_ns,
+                "max_ns": self.max_ns,
+                "buckets": {str(index): count for index, count in self.buckets.items()}
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyHistogram":
+        if data.get("sub_bucket_bits") != SUB_BUCKET_BITS:
+            raise ValueError(f"Histogram layout mismatch: {data.get('sub_bucket_bits')} sub-bucket bits")
+        histogram = cls()
+        histogram.buckets = {int(index): count for index, count in data["buckets"].items()}
+        histogram.count = data["count"]
+        histogram.sum_ns = data["sum_ns"]
+        histogram.min_ns = data["min_ns"]
+        histogram.max_ns = data["max_ns"]
+        return histogram
+
+
+class LatencyHistograms:
+    def __init__(self):
+        """One histogram per replication direction and data type"""
+        self.lock = threading.Lock()
+        self.histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+
+    def get(self, direction: str, data_type: str) -> LatencyHistogram:
+        with self.lock:
+            by_type = self.histograms.setdefault(direction, {})
+            if data_type not in by_type:
+                by_type[data_type] = LatencyHistogram()
+            return by_type[data_type]
+
+    def record_ns(self, direction: str, data_type: str, value_ns: int):
+        self.get(direction, data_type).record_ns(value_ns)
+
+    def items(self):
+        """``(direction, data_type, histogram)`` for every recorded series"""
+        with self.lock:
+            return [(direction, data_type, histogram)
+                    for direction, by_type in self.histograms.items()
+                    for data_type, histogram in by_type.items()]
+
+    def overall(self) -> LatencyHistogram:
+        """All series merged"""
+        merged = LatencyHistogram()
+        for _, _, histogram in self.items():
+            merged.merge(histogram)
+        return merged
+
+    def snapshot(self, direction: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Serializable ``{direction: {data_type: histogram}}``, optionally one direction"""
+        snapshot = {}
+        for series_direction, data_type, histogram in self.items():
+            if direction is None or series_direction == direction:
+                snapshot.setdefault(series_direction, {})[data_type] = histogram.to_dict()
+        return snapshot
+
+
+class ReplicationLag:
+    def __init__(self):
+        """End-to-end lag per direction: a histogram and a live gauge
+
+        Commit and visibility times are wall clocks on different hosts, so
+        clock skew between them shows up as lag; negative lags count as 0.
+        """
+        self.histograms = LatencyHistograms()
+        self.lock = threading.Lock()
+        self.gauges: Dict[str, Dict[str, int]] = {}
+
+    def record(self, direction: str, commit_ms_values: Iterable[int],
+               visible_ms: Optional[int] = None) -> int:
+        """Record entries that just became readable on the target
+
+        The gauge is set to the lag of the last entry, the newest one the
+        target now holds. Returns that lag in milliseconds.
+        """
+        visible_ms = visible_ms or wall_clock_ms()
+        lag_ms = None
+        for commit_ms in commit_ms_values:
+            lag_ms = max(0, visible_ms - commit_ms)
+            self.histograms.record_ns(direction, LAG_SERIES, lag_ms * 1_000_000)
+        if lag_ms is not None:
+            self.set_gauge(direction, lag_ms, visible_ms)
+        return lag_ms or 0
+
+    def caught_up(self, direction: str):
+        """The source stream had nothing waiting: the target is current"""
+        self.set_gauge(direction, 0)
+
+    def set_gauge(self, direction: str, lag_ms: int, measured_ms: Optional[int] = None):
+        with self.lock:
+            self.gauges[direction] = {"lag_ms": lag_ms, "measured_ms": measured_ms or wall_clock_ms()}
+
+    def gauge(self, direction: str) -> Optional[int]:
+        with self.lock:
+            return self.gauges.get(direction, {}).get("lag_ms")
+
+    def snapshot(self, direction: Optional[str] = None) -> Dict[str, Any]:
+        """Serializable histograms and gauges, optionally for one direction"""
+        with self.lock:
+            gauges = {name: dict(gauge) for name, gauge in self.gauges.items()
+                      if direction is None or name == direction}
+        return {"histograms": self.histograms.snapshot(direction), "gauges": gauges}
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict[str, Any]]]) -> LatencyHistograms:
+    """Combine snapshots from several processes into one set of histograms"""
+    merged = LatencyHistograms()
+    for snapshot in snapshots:
+        for direction, by_type in snapshot.items():
+            for data_type, data in by_type.items():
+                merged.get(direction, data_type).merge(LatencyHistogram.from_dict(data))
+    return merged
+
+
+def publish_latency(redis_client, monitor_name: str, snapshot: Dict[str, Dict[str, Any]]):
+    """Store one monitor's snapshot, replacing its previous one
+
+    Returns the client call, so ``redis.asyncio`` callers await it.
+    """
+    return redis_client.hset(REPLICATION_LATENCY, monitor_name, json.dumps(snapshot))
+
+
+def publish_lag(redis_client, monitor_name: str, snapshot: Dict[str, Any]):
+    """Store one monitor's ``ReplicationLag.snapshot()``, replacing its previous one"""
+    return redis_client.hset(REPLICATION_LAG, monitor_name, json.dumps(snapshot))
+
+
+def latency_report(raw_hashes: Iterable[Dict]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Percentile summaries from ``HGETALL replication_latency`` results"""
+    snapshots = [json.loads(value) for raw in raw_hashes for value in (raw or {}).values()]
+    merged = merge_snapshots(snapshots)
+    report = {}
+    for direction, data_type, histogram in merged.items():
+        report.setdefault(direction, {})[data_type] = histogram.summary()
+    return report
+
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """One-line p50/p90/p99/p999 rendering of ``LatencyHistogram.summary()``"""
+    return (f"n={summary['count']} p50 {summary['p50_ms']:.3f}ms | p90 {summary['p90_ms']:.3f}ms | "
+            f"p99 {summary['p99_ms']:.3f}ms | p999 {summary['p999_ms']:.3f}ms | max {summary['max_ms']:.3f}ms")
+
+
+def lag_report(raw_hashes: Iterable[Dict], stale_after_ms: int = 30000) -> Dict[str, Dict[str, Any]]:
+    """Lag percentiles and live gauges per direction from ``HGETALL replication_lag`` results
+
+    Each direction's gauge is the worst one reported by a monitor within
+    the last ``stale_after_ms``; older gauges come from stopped monitors.
+    """
+    snapshots = [json.loads(value) for raw in raw_hashes for value in (raw or {}).values()]
+    merged = merge_snapshots(snapshot.get("histograms", {}) for snapshot in snapshots)
+    report = {direction: {"histogram": histogram.summary(), "lag_ms": None, "measured_ms": None}
+              for direction, _, histogram in merged.items()}
+
+    now_ms = wall_clock_ms()
+    for snapshot in snapshots:
+        for direction, gauge in snapshot.get("gauges", {}).items():
+            entry = report.setdefault(direction, {"histogram": None, "lag_ms": None, "measured_ms": None})
+            if now_ms - gauge["measured_ms"] > stale_after_ms:
+                continue
+            if entry["lag_ms"] is None or gauge["lag_ms"] > entry["lag_ms"]:
+                entry["lag_ms"] = gauge["lag_ms"]
+                entry["measured_ms"] = gauge["measured_ms"]
+    return report
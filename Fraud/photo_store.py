@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Photo Store - content-addressed customer photos
+
+Raw JPEG bytes are stored once per store under their SHA-256 digest
+(``photo_blob:{digest}``) and transactions carry that digest as
+``photo_ref``. A reference count per blob lets the last transaction that
+uses a photo delete it, and running totals report how many bytes the
+dedup and the move away from base64 strings have saved. Each transaction
+holds at most one reference (``photo_holders`` maps it to its digest), so
+re-applying a transaction, as replication redeliveries and retries do,
+never takes a second one.
+
+Both updates run as small Lua scripts sent with EVAL so they can be queued
+on any pipeline (sync or asyncio) inside a transaction commit.
+
+Replication can defer photos and copy only the ``photo_ref``. A store
+that then reads such a photo fetches it from the transaction's store once
+and keeps it under ``photo_cache:{digest}`` with a TTL; the cached copy
+carries no reference, so it never interferes with refcounted blobs.
+"""
+
+import argparse
+import base64
+import hashlib
+from typing import Dict, Any, Optional
+
+import redis
+
+from payload_codec import decode_payload
+
+PHOTO_BLOB_PREFIX = "photo_blob:"
+PHOTO_REFS = "photo_refs"
+PHOTO_HOLDERS = "photo_holders"
+PHOTO_STATS = "photo_stats"
+PHOTO_CACHE_PREFIX = "photo_cache:"
+
+# Photos fetched from another store stay cached locally for an hour
+PHOTO_CACHE_TTL = 3600
+
+# KEYS: blob, refs hash, stats hash, holders hash  ARGV: jpeg bytes, digest, transaction id
+ADD_REF_SCRIPT = """
+if redis.call('HSETNX', KEYS[4], ARGV[3], ARGV[2]) == 0 then
+    return tonumber(redis.call('HGET', KEYS[2], ARGV[2]) or 0)
+end
+local size = string.len(ARGV[1])
+if redis.call('SET', KEYS[1], ARGV[1], 'NX') then
+    redis.call('HINCRBY', KEYS[3], 'stored_bytes', size)
+    redis.call('HINCRBY', KEYS[3], 'blobs', 1)
+end
+redis.call('HINCRBY', KEYS[3], 'logical_bytes', size)
+redis.call('HINCRBY', KEYS[3], 'base64_bytes', 4 * math.ceil(size / 3))
+redis.call('HINCRBY', KEYS[3], 'references', 1)
+return redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+"""
+
+# KEYS: blob, refs hash, stats hash, holders hash  ARGV: digest, transaction id
+RELEASE_REF_SCRIPT = """
+if redis.call('HDEL', KEYS[4], ARGV[2]) == 0 then
+    return -1
+end
+if redis.call('HEXISTS', KEYS[2], ARGV[1]) == 0 then
+    return -1
+end
+local size = redis.call('STRLEN', KEYS[1])
+redis.call('HINCRBY', KEYS[3], 'logical_bytes', -size)
+redis.call('HINCRBY', KEYS[3], 'base64_bytes', -4 * math.ceil(size / 3))
+redis.call('HINCRBY', KEYS[3], 'references', -1)
+local refs = redis.call('HINCRBY', KEYS[2], ARGV[1], -1)
+if refs <= 0 then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('DEL', KEYS[1])
+    redis.call('HINCRBY', KEYS[3], 'stored_bytes', -size)
+    redis.call('HINCRBY', KEYS[3], 'blobs', -1)
+    return 0
+end
+return refs
+"""
+
+
+def photo_digest(photo_jpeg: bytes) -> str:
+    """Content hash used as the photo reference"""
+    return hashlib.sha256(photo_jpeg).hexdigest()
+
+
+def photo_blob_key(digest: str) -> str:
+    """Key holding the raw JPEG bytes for a digest"""
+    return f"{PHOTO_BLOB_PREFIX}{digest}"
+
+
+def photo_cache_key(digest: str) -> str:
+    """Key caching a photo fetched on demand from another store"""
+    return f"{PHOTO_CACHE_PREFIX}{digest}"
+
+
+def queue_add_photo(pipe, photo_jpeg: bytes, transaction_id: str, digest: Optional[str] = None) -> str:
+    """Queue storing a photo (once) and taking the transaction's reference on it
+
+    A transaction that already holds a reference does not take another.
+    """
+    digest = digest or photo_digest(photo_jpeg)
+    pipe.eval(ADD_REF_SCRIPT, 4, photo_blob_key(digest), PHOTO_REFS, PHOTO_STATS, PHOTO_HOLDERS,
+              photo_jpeg, digest, transaction_id)
+    return digest
+
+
+def queue_release_photo(pipe, digest: str, transaction_id: str):
+    """Queue dropping a transaction's reference; the blob is deleted with its last reference"""
+    pipe.eval(RELEASE_REF_SCRIPT, 4, photo_blob_key(digest), PHOTO_REFS, PHOTO_STATS, PHOTO_HOLDERS,
+              digest, transaction_id)
+    return pipe
+
+
+def add_photo(redis_client, photo_jpeg: bytes, transaction_id: str) -> str:
+    """Store a photo outside a transaction commit and return its reference"""
+    digest = photo_digest(photo_jpeg)
+    redis_client.eval(ADD_REF_SCRIPT, 4, photo_blob_key(digest), PHOTO_REFS, PHOTO_STATS, PHOTO_HOLDERS,
+                      photo_jpeg, digest, transaction_id)
+    return digest
+
+
+def release_photo(redis_client, digest: str, transaction_id: str) -> int:
+    """Drop a transaction's reference and return how many remain (-1 if it held none)"""
+    return redis_client.eval(RELEASE_REF_SCRIPT, 4, photo_blob_key(digest),
+                             PHOTO_REFS, PHOTO_STATS, PHOTO_HOLDERS, digest, transaction_id)
+
+
+def binary_client(redis_client):
+    """Client on the same server that returns raw bytes
+
+    The web POS uses ``decode_responses=True`` clients, which cannot read
+    JPEG bytes back.
+    """
+    pool = redis_client.connection_pool
+    if not pool.connection_kwargs.get("decode_responses"):
+        return redis_client
+    return redis.Redis(connection_pool=redis.ConnectionPool(
+        connection_class=pool.connection_class,
+        **dict(pool.connection_kwargs, decode_responses=False)
+    ))
+
+
+def fetch_remote_photo(redis_client, digest: str, origin_client,
+                       cache_ttl: int = PHOTO_CACHE_TTL) -> Optional[bytes]:
+    """Fetch a photo from the store that holds it and cache it locally
+
+    Both clients must not decode responses. The bytes are checked against
+    the digest before they are cached.
+    """
+    photo_jpeg = origin_client.get(photo_blob_key(digest))
+    if photo_jpeg is None or photo_digest(photo_jpeg) != digest:
+        return None
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.set(photo_cache_key(digest), photo_jpeg, ex=cache_ttl)
+    pipe.hincrby(PHOTO_STATS, "remote_fetches", 1)
+    pipe.hincrby(PHOTO_STATS, "remote_fetch_bytes", len(photo_jpeg))
+    pipe.execute()
+    return photo_jpeg
+
+
+def load_photo(redis_client, transaction: Dict[str, Any],
+               origins: Optional[Dict[str, Any]] = None) -> Optional[bytes]:
+    """Load the JPEG for a transaction, falling back to legacy base64 keys
+
+    ``redis_client`` must not decode responses; see ``binary_client``.
+    ``origins`` maps store IDs to clients; when given, a photo whose
+    replication was deferred is fetched from the transaction's store.
+    """
+    photo_ref = transaction.get("photo_ref")
+    if photo_ref:
+        photo_jpeg, cached = redis_client.mget(photo_blob_key(photo_ref), photo_cache_key(photo_ref))
+        photo_jpeg = photo_jpeg or cached
+        if photo_jpeg is None and origins:
+            origin_client = origins.get(transaction.get("store_id"))
+            if origin_client is not None and origin_client is not redis_client:
+                photo_jpeg = fetch_remote_photo(redis_client, photo_ref, origin_client)
+        return photo_jpeg
+
+    transaction_id = transaction.get("transaction_id")
+    legacy_photo = redis_client.get(f"photo:{transaction_id}") if transaction_id else None
+    return base64.b64decode(decode_payload(legacy_photo)) if legacy_photo else None
+
+
+def load_photo_base64(redis_client, transaction: Dict[str, Any],
+                      origins: Optional[Dict[str, Any]] = None) -> Optional[str]:
+    """Load a transaction's photo as a base64 string for JSON/HTML consumers"""
+    photo_jpeg = load_photo(redis_client, transaction, origins)
+    return base64.b64encode(photo_jpeg).decode("utf-8") if photo_jpeg else None
+
+
+def get_photo_stats(redis_client) -> Dict[str, Any]:
+    """Report stored vs. referenced photo bytes for one store"""
+    raw = redis_client.hgetall(PHOTO_STATS)
+    stats = {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in raw.items()}
+
+    stored_bytes = stats.get("stored_bytes", 0)
+    logical_bytes = stats.get("logical_bytes", 0)
+    base64_bytes = stats.get("base64_bytes", 0)
+
+    return {
+        "blobs": stats.get("blobs", 0),
+        "references": stats.get("references", 0),
+        "stored_bytes": stored_bytes,
+        "logical_bytes": logical_bytes,
+        "base64_bytes": base64_bytes,
+        "bytes_saved": base64_bytes - stored_bytes,
+        "dedup_ratio": round(logical_bytes / stored_bytes, 2) if stored_bytes else 1.0,
+        "remote_fetches": stats.get("remote_fetches", 0),
+        "remote_fetch_bytes": stats.get("remote_fetch_bytes", 0)
+    }
+
+
+def main():
+    """Print photo storage statistics for each store"""
+    parser = argparse.ArgumentParser(description="Photo store statistics")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, action="append",
+                        help="Store port (repeatable, default 6379 and 6380)")
+    args = parser.parse_args()
+
+    for port in args.port or [6379, 6380]:
+        try:
+            stats = get_photo_stats(redis.Redis(host=args.host, port=port))
+        except redis.ConnectionError as e:
+            print(f"❌ Failed to connect to {args.host}:{port}: {e}")
+            continue
+
+        print(f"\n📷 PHOTO STORE - {args.host}:{port}")
+        print("=" * 40)
+        print(f"🖼️  Unique photos: {stats['blobs']}")
+        print(f"🔗 References: {stats['references']}")
+        print(f"💾 Stored: {stats['stored_bytes']:,} bytes")
+        print(f"📦 As base64 per transaction: {stats['base64_bytes']:,} bytes")
+        print(f"✅ Saved: {stats['bytes_saved']:,} bytes")
+        print(f"🔁 Dedup ratio: {stats['dedup_ratio']}x")
+        print(f"🌐 Fetched on demand: {stats['remote_fetches']} photos, {stats['remote_fetch_bytes']:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Photo Thumbnails - small cached renditions of customer photos
+
+Dashboards show each photo as a 60px tile, but a capture is a 320x240
+JPEG. Thumbnails are encoded once, as WebP where OpenCV supports it and
+JPEG otherwise, and cached per photo digest under
+``photo_thumb:{format}:{digest}``. The POS writes a photo's thumbnail with
+its checkout; any other photo gets one the first time it is requested.
+
+Thumbnails are a cache, not data: they expire after THUMBNAIL_TTL, carry
+no reference count and are not replicated. Without OpenCV, callers fall
+back to the full photo.
+
+Run ``python photo_thumbnails.py`` to compare photo and thumbnail sizes
+in a store.
+"""
+
+import argparse
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+from photo_store import load_photo, photo_digest, PHOTO_BLOB_PREFIX
+
+THUMBNAIL_PREFIX = "photo_thumb:"
+
+# Twice the dashboard tile size, for high-density screens
+THUMBNAIL_WIDTH = 120
+THUMBNAIL_QUALITY = 70
+
+# Thumbnails are rebuilt from the photo whenever they have expired
+THUMBNAIL_TTL = 7 * 24 * 3600
+
+# Preferred first; (format, file extension, mimetype)
+THUMBNAIL_FORMATS = [("webp", ".webp", "image/webp"), ("jpeg", ".jpg", "image/jpeg")]
+MIMETYPES = {name: mimetype for name, _, mimetype in THUMBNAIL_FORMATS}
+
+
+def thumbnail_key(digest: str, fmt: str) -> str:
+    return f"{THUMBNAIL_PREFIX}{fmt}:{digest}"
+
+
+def make_thumbnail(photo_jpeg: bytes, width: int = THUMBNAIL_WIDTH) -> Optional[Tuple[bytes, str]]:
+    """Encode a downscaled copy of a photo; returns ``(image_bytes, format)``
+
+    Returns None when OpenCV is missing or the photo cannot be decoded.
+    """
+    if cv2 is None or not photo_jpeg:
+        return None
+    image = cv2.imdecode(np.frombuffer(photo_jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+
+    height, original_width = image.shape[:2]
+    if original_width > width:
+        image = cv2.resize(image, (width, max(1, round(height * width / original_width))),
+                           interpolation=cv2.INTER_AREA)
+
+    for fmt, extension, _ in THUMBNAIL_FORMATS:
+        quality = cv2.IMWRITE_WEBP_QUALITY if fmt == "webp" else cv2.IMWRITE_JPEG_QUALITY
+        try:
+            encoded, buffer = cv2.imencode(extension, image, [quality, THUMBNAIL_QUALITY])
+        except cv2.error:
+            continue
+        if encoded:
+            return buffer.tobytes(), fmt
+    return None
+
+
+def queue_store_thumbnail(pipe, digest: str, thumbnail: Optional[Tuple[bytes, str]]):
+    """Queue caching a thumbnail made by ``make_thumbnail`` under the photo's digest"""
+    if thumbnail:
+        image_bytes, fmt = thumbnail
+        pipe.set(thumbnail_key(digest, fmt), image_bytes, ex=THUMBNAIL_TTL)
+    return pipe
+
+
+def load_thumbnail(redis_client, transaction: Dict[str, Any],
+                   origins: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Thumbnail for a transaction's photo, made and cached on first use
+
+    Returns ``{"data", "mimetype", "etag"}``, the full JPEG if no thumbnail
+    can be made, or None without a photo. ``redis_client`` must not decode
+    responses; ``origins`` is passed on to ``load_photo``.
+    """
+    digest = transaction.get("photo_ref")
+    if digest:
+        cached = redis_client.mget([thumbnail_key(digest, fmt) for fmt, _, _ in THUMBNAIL_FORMATS])
+        for (fmt, _, mimetype), image_bytes in zip(THUMBNAIL_FORMATS, cached):
+            if image_bytes:
+                return {"data": image_bytes, "mimetype": mimetype, "etag": f"{digest}-{fmt}"}
+
+    photo_jpeg = load_photo(redis_client, transaction, origins)
+    if not photo_jpeg:
+        return None
+    # Legacy base64 photos have no reference; their content gives them one
+    digest = digest or photo_digest(photo_jpeg)
+
+    thumbnail = make_thumbnail(photo_jpeg)
+    if thumbnail is None:
+        return {"data": photo_jpeg, "mimetype": "image/jpeg", "etag": digest}
+    queue_store_thumbnail(redis_client, digest, thumbnail)
+    image_bytes, fmt = thumbnail
+    return {"data": image_bytes, "mimetype": MIMETYPES[fmt], "etag": f"{digest}-{fmt}"}
+
+
+def main():
+    """Report how much smaller thumbnails are than the photos in one store"""
+    import redis
+
+    parser = argparse.ArgumentParser(description="Photo thumbnail size report")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    if cv2 is None:
+        print("❌ Thumbnails need OpenCV (opencv-python)")
+        return
+
+    client = redis.Redis(host=args.host, port=args.port)
+    photo_bytes = thumbnail_bytes = photos = 0
+    formats = {}
+    for key in client.scan_iter(match=f"{PHOTO_BLOB_PREFIX}*", count=500):
+        photo_jpeg = client.get(key)
+        thumbnail = make_thumbnail(photo_jpeg) if photo_jpeg else None
+        if thumbnail is None:
+            continue
+        photos += 1
+        photo_bytes += len(photo_jpeg)
+        thumbnail_bytes += len(thumbnail[0])
+        formats[thumbnail[1]] = formats.get(thumbnail[1], 0) + 1
+        if photos >= args.samples:
+            break
+
+    print(f"\n🖼️  PHOTO THUMBNAILS - {args.host}:{args.port}")
+    print("=" * 60)
+    if not photos:
+        print("No photos found")
+        return
+    print(f"📷 {photos} photos, {photo_bytes / photos:,.0f} bytes average")
+    print(f"🖼️  Thumbnails ({', '.join(formats)}): {thumbnail_bytes / photos:,.0f} bytes average")
+    print(f"📉 {photo_bytes / max(thumbnail_bytes, 1):.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,13 +13,15 @@ import redis
 import json
 import time
 import uuid
-import base64
 import cv2
 import numpy as np
 from datetime import datetime
 from typing import Dict, Optional
 import logging
 
+from transaction_store import transaction_key, queue_transaction_commit, parse_transaction
+from photo_store import photo_digest
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -71,8 +73,8 @@ class POSSimulator:
             logger.warning(f"⚠️ Camera initialization failed: {e}")
             self.camera = None
     
-    def capture_photo(self) -> Optional[str]:
-        """Capture photo from camera and return as base64 string"""
+    def capture_photo(self) -> Optional[bytes]:
+        """Capture photo from camera and return the raw JPEG bytes"""
         if self.camera and self.camera.isOpened():
             try:
                 ret, frame = self.camera.read()
@@ -80,12 +82,11 @@ class POSSimulator:
                     # Resize image for storage efficiency
                     frame = cv2.resize(frame, (320, 240))
                     
-                    # Encode image to base64
+                    # Encode image as JPEG
                     _, buffer = cv2.imencode('.jpg', frame)
-                    img_base64 = base64.b64encode(buffer).decode('utf-8')
                     
                     logger.info("📸 Photo captured successfully")
-                    return img_base64
+                    return buffer.tobytes()
                 else:
                     logger.warning("⚠️ Failed to capture frame from camera")
             except Exception as e:
@@ -94,7 +95,7 @@ class POSSimulator:
         # Generate placeholder image if camera not available
         return self.generate_placeholder_image()
     
-    def generate_placeholder_image(self) -> str:
+    def generate_placeholder_image(self) -> bytes:
         """Generate a placeholder image for demo purposes"""
         # Create a simple colored rectangle as placeholder
         img = np.random.randint(0, 255, (240, 320, 3), dtype=np.uint8)
@@ -106,10 +107,9 @@ class POSSimulator:
                    (50, 160), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         
         _, buffer = cv2.imencode('.jpg', img)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
         
         logger.info("🖼️ Generated placeholder customer photo")
-        return img_base64
+        return buffer.tobytes()
     
     def process_purchase(self, customer_id: str, product_sku: str, payment_method: str = "credit_card") -> Dict:
         """Process a purchase transaction with photo capture"""
@@ -122,6 +122,7 @@ class POSSimulator:
         
         # Capture customer photo
         customer_photo = self.capture_photo()
+        photo_ref = photo_digest(customer_photo) if customer_photo else None
         
         # Create transaction record
         transaction = {
@@ -139,20 +140,12 @@ class POSSimulator:
             "timestamp": timestamp,
             "datetime": datetime.fromtimestamp(timestamp).isoformat(),
             "has_photo": customer_photo is not None,
+            "photo_ref": photo_ref,
             "status": "COMPLETED"
         }
         
         try:
-            # Store transaction data
-            transaction_key = f"transaction:{transaction_id}"
-            self.redis_client.set(transaction_key, json.dumps(transaction))
-            
-            # Store customer photo separately
-            if customer_photo:
-                photo_key = f"photo:{transaction_id}"
-                self.redis_client.set(photo_key, customer_photo)
-            
-            # Add to transaction stream
+            # Transaction stream entry
             stream_data = {
                 "transaction_id": transaction_id,
                 "store_id": self.store_id,
@@ -163,9 +156,10 @@ class POSSimulator:
                 "has_photo": "true" if customer_photo else "false",
                 "timestamp": str(timestamp)
             }
-            self.redis_client.xadd("transaction_stream", stream_data)
+            if photo_ref:
+                stream_data["photo_ref"] = photo_ref
             
-            # Store customer purchase history
+            # Customer purchase history
             customer_key = f"customer:{customer_id}:purchases"
             purchase_record = {
                 "transaction_id": transaction_id,
@@ -173,7 +167,13 @@ class POSSimulator:
                 "timestamp": timestamp,
                 "store_id": self.store_id
             }
-            self.redis_client.lpush(customer_key, json.dumps(purchase_record))
+            
+            # Store transaction, photo, stream entry and history in one MULTI/EXEC
+            pipe = self.redis_client.pipeline(transaction=True)
+            queue_transaction_commit(pipe, transaction_id, json.dumps(transaction),
+                                     stream_data, customer_photo, photo_ref)
+            pipe.lpush(customer_key, json.dumps(purchase_record))
+            pipe.execute()
             
             logger.info(f"✅ Purchase processed: {transaction_id} - {product['name']} - ${product['price']}")
             
@@ -194,13 +194,13 @@ class POSSimulator:
         """Process a legitimate return transaction with photo verification"""
         try:
             # Get original transaction
-            transaction_key = f"transaction:{original_transaction_id}"
-            original_data = self.redis_client.get(transaction_key)
+            original_key = transaction_key(original_transaction_id)
+            original_data = self.redis_client.get(original_key)
             
             if not original_data:
                 return {"error": "Original transaction not found"}
             
-            original_transaction = json.loads(original_data)
+            original_transaction = parse_transaction(original_data)
             
             # Verify customer ID matches
             if original_transaction["customer_id"] != customer_id:
@@ -212,6 +212,7 @@ class POSSimulator:
             
             # Capture new photo for verification
             verification_photo = self.capture_photo()
+            photo_ref = photo_digest(verification_photo) if verification_photo else None
             
             # Create return transaction
             return_transaction_id = f"RTN_{self.store_id}_{uuid.uuid4().hex[:8].upper()}"
@@ -228,20 +229,12 @@ class POSSimulator:
                 "timestamp": timestamp,
                 "datetime": datetime.fromtimestamp(timestamp).isoformat(),
                 "has_photo": verification_photo is not None,
+                "photo_ref": photo_ref,
                 "verification_method": "PHOTO_CAPTURE",
                 "status": "COMPLETED"
             }
             
-            # Store return transaction
-            return_key = f"transaction:{return_transaction_id}"
-            self.redis_client.set(return_key, json.dumps(return_transaction))
-            
-            # Store verification photo
-            if verification_photo:
-                photo_key = f"photo:{return_transaction_id}"
-                self.redis_client.set(photo_key, verification_photo)
-            
-            # Add to transaction stream
+            # Transaction stream entry
             stream_data = {
                 "transaction_id": return_transaction_id,
                 "original_transaction_id": original_transaction_id,
@@ -253,12 +246,19 @@ class POSSimulator:
                 "verification": "PHOTO_CAPTURE",
                 "timestamp": str(timestamp)
             }
-            self.redis_client.xadd("transaction_stream", stream_data)
+            if photo_ref:
+                stream_data["photo_ref"] = photo_ref
             
             # Mark original transaction as returned
             original_transaction["return_transaction_id"] = return_transaction_id
             original_transaction["status"] = "RETURNED"
-            self.redis_client.set(transaction_key, json.dumps(original_transaction))
+            
+            # Store return, verification photo, stream entry and updated original together
+            pipe = self.redis_client.pipeline(transaction=True)
+            queue_transaction_commit(pipe, return_transaction_id, json.dumps(return_transaction),
+                                     stream_data, verification_photo, photo_ref)
+            pipe.set(original_key, json.dumps(original_transaction))
+            pipe.execute()
             
             logger.info(f"✅ Return processed: {return_transaction_id} - Verified with photo")
             
@@ -3,8 +3,25 @@
 Real-time Redis Replication Monitor
 
 Shows live data synchronization between Redis instances with precise timing.
+
+Stream entries are read through the same consumer groups as
+redis_replication_monitor.py and acknowledged once replicated, so a
+restart resumes from the group checkpoint rather than the stream start.
+Entries that originated at the target store are not copied back.
+Latencies go into per-direction, per-type histograms (p50/p90/p99/p999).
+End-to-end lag, from an entry's commit at its origin until it is readable
+on the other store, is shown per entry and kept as a live gauge and
+histogram published to the replication_lag hash.
+With --lazy-photos only photo references are replicated and a store
+fetches a photo from its origin the first time it reads it.
+Events are queued for a writer thread (see event_log) so the replication
+threads never wait on the console; --output, --sample and --jsonl choose
+what it writes.
+With --compress transaction records and legacy photos are written to the
+other store dictionary-compressed; readers decompress transparently.
 """
 
+import argparse
 import redis
 import json
 import time
@@ -13,17 +30,40 @@ from datetime import datetime
 from typing import Dict, Any
 import sys
 
+from photo_store import binary_client
+from transaction_store import should_replicate
+from payload_codec import CompressionStats, format_compression
+from event_log import EventWriter, add_output_arguments, writer_from_args
+from latency_histogram import (
+    LatencyHistograms, ReplicationLag, LAG_SERIES, publish_latency, publish_lag, format_summary
+)
+from stream_replication import (
+    fetch_entry_payloads, compress_payloads, apply_payload_staged, StreamGroupReader, replication_group, default_consumer_name, entry_commit_ms
+)
+
 class RealtimeReplicationMonitor:
-    def __init__(self):
+    def __init__(self, consumer: str = None, start_id: str = "0", lazy_photos: bool = False,
+                 compress: bool = False, events: EventWriter = None):
         """Initialize the real-time monitor"""
         # Redis connections
         self.redis_a = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
         self.redis_b = redis.Redis(host='localhost', port=6380, db=0, decode_responses=True)
         
+        # Photo blobs are raw JPEG bytes and need non-decoding clients
+        self.redis_a_binary = binary_client(self.redis_a)
+        self.redis_b_binary = binary_client(self.redis_b)
+        
+        # Replicate photo references only; blobs are fetched on demand
+        self.lazy_photos = lazy_photos
+        
+        # Compress replicated records and legacy photos
+        self.compression = CompressionStats() if compress else None
+        
+        # Replication threads only queue events; a writer thread prints them
+        self.events = events or EventWriter(format_replication_event)
+        
         # Monitoring state
         self.running = False
-        self.last_stream_id_a = "0-0"
-        self.last_stream_id_b = "0-0"
         
         # Statistics
         self.stats = {
@@ -34,10 +74,22 @@ class RealtimeReplicationMonitor:
             "min_time": float('inf'),
             "max_time": 0.0,
             "data_volume": 0,
+            "loopback_skipped": 0,
+            "photos_deferred": 0,
+            "deferred_bytes": 0,
             "errors": 0
         }
+        self.latency = LatencyHistograms()
+        self.lag = ReplicationLag()
         
         self.test_connections()
+        
+        # Consumer groups: A's stream feeds B, B's stream feeds A
+        consumer = consumer or default_consumer_name("realtime_monitor")
+        self.reader_a = StreamGroupReader(self.redis_a, replication_group("STORE_B"), consumer,
+                                          count=50, start_id=start_id)
+        self.reader_b = StreamGroupReader(self.redis_b, replication_group("STORE_A"), consumer,
+                                          count=50, start_id=start_id)
     
     def test_connections(self):
         """Test Redis connections"""
@@ -55,96 +107,77 @@ class RealtimeReplicationMonitor:
             print(f"❌ Store B connection failed: {e}")
             raise
     
-    def replicate_data(self, source_redis, target_redis, key: str, value: Any) -> float:
-        """Replicate data and measure precise timing"""
-        start_time = time.perf_counter()
+    def replicate_entry(self, direction: str, message_id: str, fields: Dict) -> bool:
+        """Apply one stream entry with its record and photo, with timing; False if it failed
+
+        The photo, the record (with its index and counters) and the stream
+        entry are applied and timed as separate stages, through the same
+        writes as the POS commit path.
+        """
+        if direction == "A → B":
+            source_binary, target_redis = self.redis_a_binary, self.redis_b
+        else:
+            source_binary, target_redis = self.redis_b_binary, self.redis_a
         
         try:
-            target_redis.set(key, value)
-            end_time = time.perf_counter()
-            
-            replication_time = (end_time - start_time) * 1000  # Convert to milliseconds
-            
-            # Update statistics
-            self.stats["total_replications"] += 1
-            self.stats["total_time"] += replication_time
-            self.stats["min_time"] = min(self.stats["min_time"], replication_time)
-            self.stats["max_time"] = max(self.stats["max_time"], replication_time)
-            
-            # Estimate data size
-            if isinstance(value, str):
-                self.stats["data_volume"] += len(value.encode('utf-8'))
-            elif isinstance(value, bytes):
-                self.stats["data_volume"] += len(value)
+            payloads = fetch_entry_payloads(source_binary, [(message_id, fields)], self.lazy_photos)
+            if self.compression is not None:
+                compress_payloads(payloads, self.compression)
+            stages = apply_payload_staged(target_redis, payloads[0])
             
-            return replication_time
+            # Only the reference travelled; the target fetches the blob on first read
+            for payload in payloads:
+                if payload["photo_deferred"]:
+                    self.stats["photos_deferred"] += 1
+                    self.stats["deferred_bytes"] += payload.get("photo_size") or 0
             
         except Exception as e:
             print(f"❌ Replication error: {e}")
             self.stats["errors"] += 1
-            return -1
-    
-    def replicate_stream_entry(self, source_redis, target_redis, fields: Dict) -> float:
-        """Replicate stream entry with timing"""
-        start_time = time.perf_counter()
+            return False
         
-        try:
-            target_redis.xadd("transaction_stream", fields)
-            end_time = time.perf_counter()
-            
-            replication_time = (end_time - start_time) * 1000
+        for data_type, key, data_bytes, stage_ns in stages:
+            replication_time = stage_ns / 1e6  # Convert to milliseconds
             
             # Update statistics
             self.stats["total_replications"] += 1
             self.stats["total_time"] += replication_time
             self.stats["min_time"] = min(self.stats["min_time"], replication_time)
             self.stats["max_time"] = max(self.stats["max_time"], replication_time)
+            self.stats["data_volume"] += data_bytes
             
-            # Estimate data size
-            data_size = sum(len(str(k)) + len(str(v)) for k, v in fields.items())
-            self.stats["data_volume"] += data_size
-            
-            return replication_time
-            
-        except Exception as e:
-            print(f"❌ Stream replication error: {e}")
-            self.stats["errors"] += 1
-            return -1
+            self.print_replication_event(direction, data_type, key, f"{data_bytes} bytes", replication_time)
+        return True
     
     def monitor_stream_a_to_b(self):
         """Monitor Store A → Store B replication"""
         while self.running:
             try:
-                # Read new entries from Store A
-                entries = self.redis_a.xread(
-                    {"transaction_stream": self.last_stream_id_a},
-                    count=1,
-                    block=1000
-                )
-                
-                for stream_name, messages in entries:
-                    for message_id, fields in messages:
-                        self.last_stream_id_a = message_id
-                        
-                        # Replicate stream entry
-                        replication_time = self.replicate_stream_entry(
-                            self.redis_a, self.redis_b, fields
-                        )
-                        
-                        if replication_time > 0:
-                            self.stats["a_to_b_count"] += 1
-                            self.print_replication_event(
-                                "A → B", "STREAM", message_id, fields, replication_time
-                            )
-                        
-                        # Replicate associated data
-                        if "transaction_id" in fields:
-                            self.replicate_associated_data(
-                                fields["transaction_id"], self.redis_a, self.redis_b, "A → B"
-                            )
+                # Read pending, claimed or new entries from Store A
+                messages = self.reader_a.read()
+                if not messages:
+                    self.lag.caught_up("A → B")
+                for message_id, fields in messages:
+                    if not should_replicate(fields, "STORE_B"):
+                        # Originated at Store B; sending it back would ping-pong
+                        self.reader_a.ack([message_id])
+                        self.stats["loopback_skipped"] += 1
+                        continue
+                    
+                    # Photo, record, then the stream entry
+                    if not self.replicate_entry("A → B", message_id, fields):
+                        # Left pending; reclaimed and retried once idle
+                        continue
+                    self.stats["a_to_b_count"] += 1
+                    self.print_lag("A → B", entry_commit_ms(message_id, fields))
+                    
+                    self.reader_a.ack([message_id])
             
-            except redis.ResponseError:
-                time.sleep(0.1)
+            except redis.ResponseError as e:
+                if "NOGROUP" in str(e):
+                    self.reader_a.ensure_group()
+                else:
+                    time.sleep(0.1)
             except Exception as e:
                 if self.running:
                     print(f"❌ Error in A→B monitor: {e}")
@@ -154,106 +187,50 @@ class RealtimeReplicationMonitor:
         """Monitor Store B → Store A replication"""
         while self.running:
             try:
-                # Read new entries from Store B
-                entries = self.redis_b.xread(
-                    {"transaction_stream": self.last_stream_id_b},
-                    count=1,
-                    block=1000
-                )
-                
-                for stream_name, messages in entries:
-                    for message_id, fields in messages:
-                        self.last_stream_id_b = message_id
-                        
-                        # Replicate stream entry
-                        replication_time = self.replicate_stream_entry(
-                            self.redis_b, self.redis_a, fields
-                        )
-                        
-                        if replication_time > 0:
-                            self.stats["b_to_a_count"] += 1
-                            self.print_replication_event(
-                                "B → A", "STREAM", message_id, fields, replication_time
-                            )
-                        
-                        # Replicate associated data
-                        if "transaction_id" in fields:
-                            self.replicate_associated_data(
-                                fields["transaction_id"], self.redis_b, self.redis_a, "B → A"
-                            )
+                # Read pending, claimed or new entries from Store B
+                messages = self.reader_b.read()
+                if not messages:
+                    self.lag.caught_up("B → A")
+                for message_id, fields in messages:
+                    if not should_replicate(fields, "STORE_A"):
+                        # Originated at Store A; sending it back would ping-pong
+                        self.reader_b.ack([message_id])
+                        self.stats["loopback_skipped"] += 1
+                        continue
+                    
+                    # Photo, record, then the stream entry
+                    if not self.replicate_entry("B → A", message_id, fields):
+                        # Left pending; reclaimed and retried once idle
+                        continue
+                    self.stats["b_to_a_count"] += 1
+                    self.print_lag("B → A", entry_commit_ms(message_id, fields))
+                    
+                    self.reader_b.ack([message_id])
             
-            except redis.ResponseError:
-                time.sleep(0.1)
+            except redis.ResponseError as e:
+                if "NOGROUP" in str(e):
+                    self.reader_b.ensure_group()
+                else:
+                    time.sleep(0.1)
             except Exception as e:
                 if self.running:
                     print(f"❌ Error in B→A monitor: {e}")
                 time.sleep(1)
     
-    def replicate_associated_data(self, transaction_id: str, source_redis, target_redis, direction: str):
-        """Replicate transaction and photo data"""
-        try:
-            # Replicate transaction data
-            transaction_key = f"transaction:{transaction_id}"
-            transaction_data = source_redis.get(transaction_key)
-            
-            if transaction_data:
-                replication_time = self.replicate_data(
-                    source_redis, target_redis, transaction_key, transaction_data
-                )
-                if replication_time > 0:
-                    self.print_replication_event(
-                        direction, "TRANSACTION", transaction_key, 
-                        f"{len(transaction_data)} bytes", replication_time
-                    )
-            
-            # Replicate photo data
-            photo_key = f"photo:{transaction_id}"
-            photo_data = source_redis.get(photo_key)
-            
-            if photo_data:
-                replication_time = self.replicate_data(
-                    source_redis, target_redis, photo_key, photo_data
-                )
-                if replication_time > 0:
-                    self.print_replication_event(
-                        direction, "PHOTO", photo_key, 
-                        f"{len(photo_data)} bytes", replication_time
-                    )
-        
-        except Exception as e:
-            print(f"❌ Error replicating associated data: {e}")
-    
     def print_replication_event(self, direction: str, data_type: str, key: str, data_info: Any, replication_time: float):
-        """Print replication event with detailed timing"""
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        
-        # Direction indicators
-        if direction == "A → B":
-            arrow = "🔵 ➡️"
-        else:
-            arrow = "🟠 ⬅️"
-        
-        # Data type icons
-        icons = {"STREAM": "📊", "TRANSACTION": "💳", "PHOTO": "📷"}
-        icon = icons.get(data_type, "📄")
-        
-        # Time color coding
-        if replication_time < 1:
-            time_indicator = "🟢"  # Very fast
-        elif replication_time < 5:
-            time_indicator = "🟡"  # Fast
-        else:
-            time_indicator = "🔴"  # Slow
-        
-        print(f"\n{timestamp} {arrow} {icon} {data_type}")
-        print(f"  Key: {key}")
-        print(f"  Data: {data_info}")
-        print(f"  {time_indicator} Replication Time: {replication_time:.3f}ms")
-        
-        # Show running statistics
-        if self.stats["total_replications"] > 0:
-            avg_time = self.stats["total_time"] / self.stats["total_replications"]
-            print(f"  📈 Total: {self.stats['total_replications']} | Avg: {avg_time:.3f}ms | Volume: {self.stats['data_volume']:,} bytes")
+        """Record a replication's latency and queue the event with detailed timing"""
+        self.latency.record_ns(direction, data_type, int(replication_time * 1e6))
+        total = self.stats["total_replications"]
+        self.events.emit({
+            "type": data_type, "direction": direction, "key": key, "data": data_info, "ms": replication_time,
+            "total": total, "avg_ms": self.stats["total_time"] / total if total else 0.0,
+            "volume": self.stats["data_volume"]
+        })
+    
+    def print_lag(self, direction: str, commit_ms: int):
+        """Record and queue how long an entry took to become readable on the target"""
+        lag_ms = self.lag.record(direction, [commit_ms])
+        self.events.emit({"type": "LAG", "direction": direction, "ms": lag_ms})
     
     def print_status_header(self):
         """Print monitoring header"""
@@ -262,7 +239,12 @@ class RealtimeReplicationMonitor:
         print("=" * 80)
         print("🔵 Store A (port 6379) ↔️ Store B (port 6380)")
         print("⏱️  Microsecond-precision timing measurements")
+        if self.lazy_photos:
+            print("📷 Lazy photos: references only, fetched from the origin on first read")
+        if self.compression is not None:
+            print("🗜️  Compressed payloads: dictionary-compressed records and legacy photos")
         print("📊 Live data volume and performance tracking")
+        print(f"📍 Consumer {self.reader_a.consumer} resuming from group checkpoints")
         print("🛑 Press Ctrl+C to stop")
         print("=" * 80)
     
@@ -284,13 +266,47 @@ class RealtimeReplicationMonitor:
                 print(f"🔴 Slowest: {self.stats['max_time']:.3f}ms")
                 print(f"📊 Data Volume: {self.stats['data_volume']:,} bytes")
                 print(f"📈 Throughput: {self.stats['data_volume']/1024:.1f} KB/total")
+                print(f"🔁 Loopback Skipped: {self.stats['loopback_skipped']}")
+                if self.lazy_photos:
+                    print(f"📷 Photos Deferred: {self.stats['photos_deferred']} "
+                          f"({self.stats['deferred_bytes']:,} bytes not sent)")
+                if self.compression is not None:
+                    for data_type, stats in self.compression.snapshot().items():
+                        print(f"🗜️  {format_compression(data_type, stats)}")
                 print(f"❌ Errors: {self.stats['errors']}")
+                for direction, data_type, histogram in self.latency.items():
+                    print(f"⏱️  {direction} {data_type}: {format_summary(histogram.summary())}")
+                for direction in ("A → B", "B → A"):
+                    lag_ms = self.lag.gauge(direction)
+                    if lag_ms is not None:
+                        histogram = self.lag.histograms.get(direction, LAG_SERIES)
+                        print(f"🕰️  {direction} lag now {lag_ms}ms, end to end {format_summary(histogram.summary())}")
+                self.publish_latency()
+                for label, reader in (("A → B", self.reader_a), ("B → A", self.reader_b)):
+                    try:
+                        checkpoint = reader.checkpoint()
+                    except redis.ResponseError:
+                        checkpoint = None
+                    if checkpoint:
+                        print(f"📍 {label} checkpoint: {checkpoint['last_delivered_id']} "
+                              f"(pending {checkpoint['pending']}, claimed {checkpoint['claimed']})")
                 print("-" * 60)
     
+    def publish_latency(self):
+        """Publish each direction's histograms and lag to the store it writes to"""
+        try:
+            publish_latency(self.redis_b, self.reader_a.consumer, self.latency.snapshot("A → B"))
+            publish_latency(self.redis_a, self.reader_a.consumer, self.latency.snapshot("B → A"))
+            publish_lag(self.redis_b, self.reader_a.consumer, self.lag.snapshot("A → B"))
+            publish_lag(self.redis_a, self.reader_a.consumer, self.lag.snapshot("B → A"))
+        except redis.RedisError as e:
+            print(f"❌ Failed to publish latency histograms: {e}")
+    
     def start_monitoring(self):
         """Start real-time monitoring"""
         self.print_status_header()
         self.running = True
+        self.events.start()
         
         # Start monitoring threads
         thread_a_to_b = threading.Thread(target=self.monitor_stream_a_to_b, daemon=True)
@@ -309,6 +325,7 @@ class RealtimeReplicationMonitor:
         except KeyboardInterrupt:
             print("\n\n🛑 Stopping real-time monitor...")
             self.running = False
+            self.events.stop()
             
             # Final comprehensive statistics
             if self.stats["total_replications"] > 0:
@@ -323,9 +340,15 @@ class RealtimeReplicationMonitor:
                 print(f"Average Time: {avg_time:.3f}ms")
                 print(f"Fastest: {self.stats['min_time']:.3f}ms")
                 print(f"Slowest: {self.stats['max_time']:.3f}ms")
+                print(f"Latency: {format_summary(self.latency.overall().summary())}")
+                print(f"End-to-end Lag: {format_summary(self.lag.histograms.overall().summary())}")
+                self.publish_latency()
                 print(f"Total Data: {self.stats['data_volume']:,} bytes ({self.stats['data_volume']/1024:.1f} KB)")
                 print(f"Throughput: {throughput:.0f} bytes/sec")
                 print(f"Errors: {self.stats['errors']}")
+                events = self.events.snapshot()
+                if events["dropped"]:
+                    print(f"Events Dropped: {events['dropped']} of {events['emitted'] + events['dropped']}")
                 
                 # Performance rating
                 if avg_time < 1:
@@ -339,10 +362,63 @@ class RealtimeReplicationMonitor:
             
             print("👋 Monitor stopped")
 
+def format_replication_event(event: Dict[str, Any]) -> str:
+    """Console lines for one queued replication or lag event"""
+    if event["type"] == "LAG":
+        indicator = "🟢" if event["ms"] < 100 else "🟡" if event["ms"] < 1000 else "🔴"
+        return f"  {indicator} End-to-end Lag: {event['ms']}ms since commit"
+    
+    timestamp = datetime.fromtimestamp(event["ts"]).strftime("%H:%M:%S.%f")[:-3]
+    
+    # Direction indicators
+    if event["direction"] == "A → B":
+        arrow = "🔵 ➡️"
+    else:
+        arrow = "🟠 ⬅️"
+    
+    # Data type icons
+    icons = {"STREAM": "📊", "TRANSACTION": "💳", "PHOTO": "📷"}
+    icon = icons.get(event["type"], "📄")
+    
+    # Time color coding
+    if event["ms"] < 1:
+        time_indicator = "🟢"  # Very fast
+    elif event["ms"] < 5:
+        time_indicator = "🟡"  # Fast
+    else:
+        time_indicator = "🔴"  # Slow
+    
+    lines = [
+        f"\n{timestamp} {arrow} {icon} {event['type']}",
+        f"  Key: {event['key']}",
+        f"  Data: {event['data']}",
+        f"  {time_indicator} Replication Time: {event['ms']:.3f}ms"
+    ]
+    
+    # Show running statistics
+    if event["total"] > 0:
+        lines.append(f"  📈 Total: {event['total']} | Avg: {event['avg_ms']:.3f}ms | Volume: {event['volume']:,} bytes")
+    return "\n".join(lines)
+
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Real-time Redis replication monitor")
+    parser.add_argument("--consumer", default=None,
+                        help="Consumer name within the replication groups (default: hostname-based)")
+    parser.add_argument("--from-now", action="store_true",
+                        help="When creating the groups, skip existing history instead of replicating it")
+    parser.add_argument("--lazy-photos", action="store_true",
+                        help="Replicate photo references only; photos are fetched from their origin on read")
+    parser.add_argument("--compress", action="store_true",
+                        help="Write replicated records and legacy photos dictionary-compressed")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
     try:
-        monitor = RealtimeReplicationMonitor()
+        monitor = RealtimeReplicationMonitor(consumer=args.consumer,
+                                             start_id="$" if args.from_now else "0",
+                                             lazy_photos=args.lazy_photos, compress=args.compress,
+                                             events=writer_from_args(args, format_replication_event))
         monitor.start_monitoring()
     except Exception as e:
         print(f"❌ Failed to start monitor: {e}")
@@ -4,8 +4,41 @@ Redis Active-Active Replication Monitor
 
 Shows real-time data synchronization between Redis instances
 with precise timing measurements.
+
+By default stream entries are replicated in batches: each XREADGROUP
+returns up to --batch-size entries, whose transactions and photos are
+fetched with one pipeline and written to the other store with another.
+--batch-size 1 applies one entry at a time, timing its photo, record
+and stream entry separately.
+
+Entries are acknowledged (XACK) only once applied, so the consumer
+groups' checkpoints survive restarts and entries left pending by a
+crashed monitor are claimed with XAUTOCLAIM.
+
+Entries that originated at the target store are acknowledged without being
+copied back, so replicated writes do not bounce between the stores.
+
+Replication times are measured with perf_counter_ns into log-bucketed
+histograms per direction and data type; the status reports p50/p90/p99/
+p999 and each snapshot is published for /api/replication_latency.
+End-to-end lag, from an entry's commit at its origin to the moment its
+record is readable on the target, is kept as a live gauge and histogram
+per direction and published to the replication_lag hash.
+
+--lazy-photos copies only each transaction's photo_ref; the other store
+fetches the photo from its origin the first time it is read.
+
+Replication events are queued for a writer thread (see event_log) instead
+of being printed by the replication threads: --output summary prints one
+line per second, --sample prints a fraction of events and --jsonl keeps
+every event in a file.
+
+--compress writes replicated records and legacy photos dictionary-
+compressed; readers decompress transparently.
 """
 
+import argparse
+import logging
 import redis
 import json
 import time
@@ -14,26 +47,71 @@ from datetime import datetime
 from typing import Dict, Any
 import sys
 
+from photo_store import binary_client
+from transaction_store import should_replicate
+from payload_codec import CompressionStats, format_compression
+from event_log import EventWriter, add_output_arguments, writer_from_args
+from latency_histogram import (
+    LatencyHistograms, ReplicationLag, LAG_SERIES, publish_latency, publish_lag, format_summary
+)
+from stream_replication import (
+    replicate_batch, fetch_entry_payloads, compress_payloads, apply_payload_staged, payload_bytes,
+    deferred_photos, BatchStats, split_loopback, entry_commit_ms,
+    StreamGroupReader, replication_group, default_consumer_name
+)
+
+logger = logging.getLogger(__name__)
+
 class RedisReplicationMonitor:
-    def __init__(self):
-        """Initialize the replication monitor"""
+    def __init__(self, batch_size: int = 500, consumer: str = None, start_id: str = "0",
+                 lazy_photos: bool = False, compress: bool = False, events: EventWriter = None):
+        """Initialize the replication monitor
+
+        Each direction reads through a consumer group on the source stream,
+        so a restart resumes from the group's checkpoint instead of "0-0".
+        """
         # Redis connections
         self.redis_a = redis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
         self.redis_b = redis.Redis(host='localhost', port=6380, db=0, decode_responses=True)
         
+        # Photo blobs are raw JPEG bytes and need non-decoding clients
+        self.redis_a_binary = binary_client(self.redis_a)
+        self.redis_b_binary = binary_client(self.redis_b)
+        
+        # Entries per read; 1 replicates entry by entry
+        self.batch_size = max(1, batch_size)
+        self.batch_stats = BatchStats()
+        self.latency = LatencyHistograms()
+        self.lag = ReplicationLag()
+        
+        # Replicate photo references only; blobs are fetched on demand
+        self.lazy_photos = lazy_photos
+        
+        # Compress replicated records and legacy photos
+        self.compression = CompressionStats() if compress else None
+        
+        # Replication threads only queue events; a writer thread prints them
+        self.events = events or EventWriter(format_replication_event)
+        
         # Monitoring state
         self.running = False
-        self.last_stream_id_a = "0-0"
-        self.last_stream_id_b = "0-0"
         self.replication_stats = {
             "total_replicated": 0,
-            "avg_replication_time": 0.0,
             "last_replication_time": 0.0,
+            "loopback_skipped": 0,
+            "photos_deferred": 0,
             "errors": 0
         }
         
         # Test connections
         self.test_connections()
+        
+        # Consumer groups: A's stream feeds B, B's stream feeds A
+        consumer = consumer or default_consumer_name("replication_monitor")
+        self.reader_a = StreamGroupReader(self.redis_a, replication_group("STORE_B"), consumer,
+                                          count=self.batch_size, start_id=start_id)
+        self.reader_b = StreamGroupReader(self.redis_b, replication_group("STORE_A"), consumer,
+                                          count=self.batch_size, start_id=start_id)
     
     def test_connections(self):
         """Test Redis connections"""
@@ -51,74 +129,118 @@ class RedisReplicationMonitor:
             print(f"❌ Failed to connect to Store B: {e}")
             raise
     
-    def replicate_data(self, source_redis, target_redis, data_type: str, key: str, value: Any) -> float:
-        """Replicate data from source to target and return replication time"""
-        start_time = time.time()
+    def replicate_entry(self, direction: str, message_id: str, fields: Dict) -> bool:
+        """Apply one stream entry with its record and photo; False if it failed
+
+        The photo, the record (with its index and counters) and the stream
+        entry are applied and timed as separate stages.
+        """
+        if direction == "A → B":
+            source_binary, target = self.redis_a_binary, self.redis_b
+        else:
+            source_binary, target = self.redis_b_binary, self.redis_a
         
         try:
-            if data_type == "string":
-                target_redis.set(key, value)
-            elif data_type == "hash":
-                target_redis.hset(key, mapping=value)
-            elif data_type == "stream":
-                # For streams, we add the entry
-                target_redis.xadd("transaction_stream", value)
-            
-            replication_time = (time.time() - start_time) * 1000  # Convert to milliseconds
+            payloads = fetch_entry_payloads(source_binary, [(message_id, fields)], self.lazy_photos)
+            if self.compression is not None:
+                compress_payloads(payloads, self.compression)
+            stages = apply_payload_staged(target, payloads[0])
+        except Exception as e:
+            logger.error(f"❌ Replication error: {e}")
+            self.replication_stats["errors"] += 1
+            return False
+        
+        self.replication_stats["photos_deferred"] += deferred_photos(payloads)
+        for data_type, key, data_bytes, stage_ns in stages:
+            replication_time = stage_ns / 1e6  # Convert to milliseconds
             
             # Update stats
             self.replication_stats["total_replicated"] += 1
             self.replication_stats["last_replication_time"] = replication_time
             
-            # Calculate running average
-            total = self.replication_stats["total_replicated"]
-            current_avg = self.replication_stats["avg_replication_time"]
-            self.replication_stats["avg_replication_time"] = (
-                (current_avg * (total - 1) + replication_time) / total
+            self.print_replication_event(
+                direction, data_type, key, f"{data_type.title()} data ({data_bytes} bytes)", replication_time
             )
-            
-            return replication_time
-            
-        except Exception as e:
-            logger.error(f"❌ Replication error: {e}")
-            self.replication_stats["errors"] += 1
-            return -1
+        return True
     
+    def monitor_stream_batched(self, direction: str):
+        """Replicate one direction a whole read batch at a time"""
+        if direction == "A → B":
+            reader, source_binary, target, target_store = self.reader_a, self.redis_a_binary, self.redis_b, "STORE_B"
+        else:
+            reader, source_binary, target, target_store = self.reader_b, self.redis_b_binary, self.redis_a, "STORE_A"
+
+        while self.running:
+            try:
+                messages, loopback = split_loopback(reader.read(), target_store)
+                if loopback:
+                    reader.ack(loopback)
+                    self.replication_stats["loopback_skipped"] += len(loopback)
+                if not messages:
+                    self.lag.caught_up(direction)
+                    continue
+
+                start_ns = time.perf_counter_ns()
+                payloads = replicate_batch(source_binary, target, messages, self.lazy_photos, self.compression)
+                batch_ns = time.perf_counter_ns() - start_ns
+                self.lag.record(direction, [entry_commit_ms(message_id, fields) for message_id, fields in messages])
+                batch_time = batch_ns / 1e6
+                self.latency.record_ns(direction, "BATCH", batch_ns)
+
+                # Only acknowledge once the whole batch is applied
+                reader.ack([message_id for message_id, _ in messages])
+                self.replication_stats["photos_deferred"] += deferred_photos(payloads)
+                self.batch_stats.record(len(messages), batch_time, payload_bytes(payloads))
+                self.print_batch_event(direction, len(messages), batch_time)
+
+            except redis.ResponseError as e:
+                self.handle_group_error(reader, e)
+            except Exception as e:
+                if self.running:  # Only log if we're still supposed to be running
+                    logger.error(f"Error monitoring {direction}: {e}")
+                time.sleep(1)
+
+    def handle_group_error(self, reader, error):
+        """Recreate a consumer group lost with its stream, otherwise back off"""
+        if "NOGROUP" in str(error):
+            reader.ensure_group()
+        else:
+            logger.error(f"Stream read error: {error}")
+            time.sleep(0.1)
+
+    def print_batch_event(self, direction: str, batch_size: int, batch_time: float):
+        """Queue one event per replicated batch"""
+        self.events.emit({"type": "BATCH", "direction": direction, "entries": batch_size, "ms": batch_time})
+
     def monitor_stream_a_to_b(self):
         """Monitor Store A stream and replicate to Store B"""
+        if self.batch_size > 1:
+            return self.monitor_stream_batched("A → B")
+
         while self.running:
             try:
-                # Read new entries from Store A stream
-                entries = self.redis_a.xread(
-                    {"transaction_stream": self.last_stream_id_a},
-                    count=1,
-                    block=1000  # Block for 1 second
-                )
-                
-                for stream_name, messages in entries:
-                    for message_id, fields in messages:
-                        # Update last processed ID
-                        self.last_stream_id_a = message_id
-                        
-                        # Replicate to Store B
-                        replication_time = self.replicate_data(
-                            self.redis_a, self.redis_b, "stream", "transaction_stream", fields
-                        )
-                        
-                        if replication_time > 0:
-                            self.print_replication_event(
-                                "A → B", "STREAM", message_id, fields, replication_time
-                            )
-                        
-                        # Also replicate associated transaction and photo data
-                        if "transaction_id" in fields:
-                            self.replicate_transaction_data(
-                                fields["transaction_id"], self.redis_a, self.redis_b, "A → B"
-                            )
+                # Read pending, claimed or new entries from Store A stream
+                messages = self.reader_a.read()
+                if not messages:
+                    self.lag.caught_up("A → B")
+                for message_id, fields in messages:
+                    if not should_replicate(fields, "STORE_B"):
+                        # Store B's own write coming back: nothing to copy
+                        self.reader_a.ack([message_id])
+                        self.replication_stats["loopback_skipped"] += 1
+                        continue
+                    
+                    # Photo, record, then the stream entry
+                    if not self.replicate_entry("A → B", message_id, fields):
+                        # Left pending; reclaimed and retried once idle
+                        continue
+                    self.lag.record("A → B", [entry_commit_ms(message_id, fields)])
+                    
+                    # Checkpoint only once the entry is applied
+                    self.reader_a.ack([message_id])
             
-            except redis.ResponseError:
-                # Stream doesn't exist yet, continue
-                time.sleep(0.1)
+            except redis.ResponseError as e:
+                self.handle_group_error(self.reader_a, e)
             except Exception as e:
                 if self.running:  # Only log if we're still supposed to be running
                     logger.error(f"Error monitoring A→B: {e}")
@@ -126,111 +248,43 @@ class RedisReplicationMonitor:
     
     def monitor_stream_b_to_a(self):
         """Monitor Store B stream and replicate to Store A"""
+        if self.batch_size > 1:
+            return self.monitor_stream_batched("B → A")
+
         while self.running:
             try:
-                # Read new entries from Store B stream
-                entries = self.redis_b.xread(
-                    {"transaction_stream": self.last_stream_id_b},
-                    count=1,
-                    block=1000  # Block for 1 second
-                )
-                
-                for stream_name, messages in entries:
-                    for message_id, fields in messages:
-                        # Update last processed ID
-                        self.last_stream_id_b = message_id
-                        
-                        # Replicate to Store A
-                        replication_time = self.replicate_data(
-                            self.redis_b, self.redis_a, "stream", "transaction_stream", fields
-                        )
-                        
-                        if replication_time > 0:
-                            self.print_replication_event(
-                                "B → A", "STREAM", message_id, fields, replication_time
-                            )
-                        
-                        # Also replicate associated transaction and photo data
-                        if "transaction_id" in fields:
-                            self.replicate_transaction_data(
-                                fields["transaction_id"], self.redis_b, self.redis_a, "B → A"
-                            )
+                # Read pending, claimed or new entries from Store B stream
+                messages = self.reader_b.read()
+                if not messages:
+                    self.lag.caught_up("B → A")
+                for message_id, fields in messages:
+                    if not should_replicate(fields, "STORE_A"):
+                        # Store A's own write coming back: nothing to copy
+                        self.reader_b.ack([message_id])
+                        self.replication_stats["loopback_skipped"] += 1
+                        continue
+                    
+                    # Photo, record, then the stream entry
+                    if not self.replicate_entry("B → A", message_id, fields):
+                        # Left pending; reclaimed and retried once idle
+                        continue
+                    self.lag.record("B → A", [entry_commit_ms(message_id, fields)])
+                    
+                    # Checkpoint only once the entry is applied
+                    self.reader_b.ack([message_id])
             
-            except redis.ResponseError:
-                # Stream doesn't exist yet, continue
-                time.sleep(0.1)
+            except redis.ResponseError as e:
+                self.handle_group_error(self.reader_b, e)
             except Exception as e:
                 if self.running:  # Only log if we're still supposed to be running
                     logger.error(f"Error monitoring B→A: {e}")
                 time.sleep(1)
     
-    def replicate_transaction_data(self, transaction_id: str, source_redis, target_redis, direction: str):
-        """Replicate transaction and photo data"""
-        try:
-            # Replicate transaction data
-            transaction_key = f"transaction:{transaction_id}"
-            transaction_data = source_redis.get(transaction_key)
-            
-            if transaction_data:
-                replication_time = self.replicate_data(
-                    source_redis, target_redis, "string", transaction_key, transaction_data
-                )
-                if replication_time > 0:
-                    self.print_replication_event(
-                        direction, "TRANSACTION", transaction_key, 
-                        f"Transaction data ({len(transaction_data)} bytes)", replication_time
-                    )
-            
-            # Replicate photo data
-            photo_key = f"photo:{transaction_id}"
-            photo_data = source_redis.get(photo_key)
-            
-            if photo_data:
-                replication_time = self.replicate_data(
-                    source_redis, target_redis, "string", photo_key, photo_data
-                )
-                if replication_time > 0:
-                    self.print_replication_event(
-                        direction, "PHOTO", photo_key, 
-                        f"Photo data ({len(photo_data)} bytes)", replication_time
-                    )
-        
-        except Exception as e:
-            logger.error(f"Error replicating transaction data: {e}")
-    
     def print_replication_event(self, direction: str, data_type: str, key: str, data_summary: Any, replication_time: float):
-        """Print a replication event with timing"""
-        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]  # Include milliseconds
-        
-        # Color coding for direction
-        if direction == "A → B":
-            direction_color = "🔵"  # Blue for A to B
-        else:
-            direction_color = "🟠"  # Orange for B to A
-        
-        # Data type icons
-        type_icons = {
-            "STREAM": "📊",
-            "TRANSACTION": "💳",
-            "PHOTO": "📷"
-        }
-        icon = type_icons.get(data_type, "📄")
-        
-        # Format replication time with color coding
-        if replication_time < 1:
-            time_color = "🟢"  # Green for very fast
-        elif replication_time < 10:
-            time_color = "🟡"  # Yellow for fast
-        else:
-            time_color = "🔴"  # Red for slow
-        
-        print(f"{timestamp} {direction_color} {direction} {icon} {data_type}")
-        print(f"    Key: {key}")
-        print(f"    Data: {data_summary}")
-        print(f"    {time_color} Replication Time: {replication_time:.2f}ms")
-        print(f"    📈 Total Replicated: {self.replication_stats['total_replicated']}")
-        print(f"    ⏱️  Average Time: {self.replication_stats['avg_replication_time']:.2f}ms")
-        print("-" * 60)
+        """Record a replication's latency and queue the event for output"""
+        self.latency.record_ns(direction, data_type, int(replication_time * 1e6))
+        self.events.emit({"type": data_type, "direction": direction, "key": key, "data": data_summary,
+                          "ms": replication_time, "total": self.replication_stats["total_replicated"]})
     
     def print_status(self):
         """Print current status"""
@@ -240,10 +294,19 @@ class RedisReplicationMonitor:
             print(f"\n📊 REPLICATION STATUS - {datetime.now().strftime('%H:%M:%S')}")
             print("=" * 60)
             print(f"🔄 Total Replications: {self.replication_stats['total_replicated']}")
-            print(f"⏱️  Average Time: {self.replication_stats['avg_replication_time']:.2f}ms")
+            self.print_latency_percentiles()
             print(f"🕐 Last Replication: {self.replication_stats['last_replication_time']:.2f}ms")
+            print(f"🔁 Loopback Entries Skipped: {self.replication_stats['loopback_skipped']}")
+            if self.lazy_photos:
+                print(f"📷 Photos Deferred: {self.replication_stats['photos_deferred']}")
+            if self.compression is not None:
+                for data_type, stats in self.compression.snapshot().items():
+                    print(f"🗜️  {format_compression(data_type, stats)}")
             print(f"❌ Errors: {self.replication_stats['errors']}")
             
+            if self.batch_size > 1:
+                self.print_batch_stats()
+            
             # Show current stream positions
             try:
                 stream_info_a = self.redis_a.xinfo_stream("transaction_stream")
@@ -253,19 +316,77 @@ class RedisReplicationMonitor:
             except:
                 print("📊 Streams not yet created")
             
+            self.print_checkpoints()
+            self.publish_latency()
+            
             print("=" * 60)
     
+    def print_latency_percentiles(self):
+        """Print latency percentiles per direction and data type"""
+        series = self.latency.items()
+        if not series:
+            print("⏱️  Latency: no replications yet")
+        for direction, data_type, histogram in series:
+            print(f"⏱️  {direction} {data_type}: {format_summary(histogram.summary())}")
+        for direction in ("A → B", "B → A"):
+            lag_ms = self.lag.gauge(direction)
+            if lag_ms is not None:
+                histogram = self.lag.histograms.get(direction, LAG_SERIES)
+                print(f"🕰️  {direction} lag now {lag_ms}ms, end to end {format_summary(histogram.summary())}")
+    
+    def publish_latency(self):
+        """Publish each direction's histograms and lag to the store it writes to"""
+        try:
+            publish_latency(self.redis_b, self.reader_a.consumer, self.latency.snapshot("A → B"))
+            publish_latency(self.redis_a, self.reader_a.consumer, self.latency.snapshot("B → A"))
+            publish_lag(self.redis_b, self.reader_a.consumer, self.lag.snapshot("A → B"))
+            publish_lag(self.redis_a, self.reader_a.consumer, self.lag.snapshot("B → A"))
+        except redis.RedisError as e:
+            logger.error(f"Failed to publish latency histograms: {e}")
+    
+    def print_checkpoints(self):
+        """Print each consumer group's checkpoint and backlog"""
+        for label, reader in (("A → B", self.reader_a), ("B → A", self.reader_b)):
+            try:
+                checkpoint = reader.checkpoint()
+            except redis.ResponseError:
+                checkpoint = None
+            if checkpoint:
+                lag = checkpoint["lag"] if checkpoint["lag"] is not None else "n/a"
+                print(f"📍 {label} checkpoint {checkpoint['last_delivered_id']} "
+                      f"(pending {checkpoint['pending']}, lag {lag}, claimed {checkpoint['claimed']})")
+    
+    def print_batch_stats(self):
+        """Print batched replication throughput and batch sizes"""
+        stats = self.batch_stats.snapshot()
+        print(f"📦 Batched: {stats['entries']} entries in {stats['batches']} batches")
+        print(f"🚀 Throughput: {stats['entries_per_sec']} entries/sec")
+        print(f"📏 Batch size: avg {stats['avg_batch_size']}, max {stats['max_batch_size']}, "
+              f"avg {stats['avg_batch_ms']}ms per batch")
+        distribution = ", ".join(f"{label}: {count}" for label, count
+                                 in stats["batch_size_distribution"].items() if count)
+        print(f"📊 Batch sizes: {distribution or 'none yet'}")
+    
     def start_monitoring(self):
         """Start the replication monitoring"""
         print("\n🔄 Starting Redis Active-Active Replication Monitor")
         print("=" * 60)
         print("🔵 Store A (port 6379) ↔️ Store B (port 6380)")
         print("📊 Monitoring real-time data synchronization...")
-        print("⏱️  Showing replication timing for each operation")
+        print(f"📍 Consumer {self.reader_a.consumer} resuming from group checkpoints")
+        if self.batch_size > 1:
+            print(f"📦 Batched replication: up to {self.batch_size} entries per round trip")
+        else:
+            print("⏱️  Showing replication timing for each operation")
+        if self.lazy_photos:
+            print("📷 Lazy photos: references only, fetched from the origin on first read")
+        if self.compression is not None:
+            print("🗜️  Compressed payloads: dictionary-compressed records and legacy photos")
         print("🛑 Press Ctrl+C to stop")
         print("=" * 60)
         
         self.running = True
+        self.events.start()
         
         # Start monitoring threads
         thread_a_to_b = threading.Thread(target=self.monitor_stream_a_to_b, daemon=True)
@@ -283,19 +404,84 @@ class RedisReplicationMonitor:
         except KeyboardInterrupt:
             print("\n\n🛑 Stopping replication monitor...")
             self.running = False
+            self.events.stop()
             
             # Final stats
             print(f"\n📊 FINAL STATISTICS")
             print("=" * 30)
             print(f"Total Replications: {self.replication_stats['total_replicated']}")
-            print(f"Average Time: {self.replication_stats['avg_replication_time']:.2f}ms")
+            print(f"Latency: {format_summary(self.latency.overall().summary())}")
+            print(f"End-to-end Lag: {format_summary(self.lag.histograms.overall().summary())}")
+            self.publish_latency()
             print(f"Errors: {self.replication_stats['errors']}")
+            events = self.events.snapshot()
+            if events["dropped"]:
+                print(f"Events Dropped: {events['dropped']} of {events['emitted'] + events['dropped']}")
+            if self.batch_size > 1:
+                self.print_batch_stats()
             print("👋 Monitor stopped")
 
+def format_replication_event(event: Dict[str, Any]) -> str:
+    """Console lines for one queued replication event"""
+    timestamp = datetime.fromtimestamp(event["ts"]).strftime("%H:%M:%S.%f")[:-3]  # Include milliseconds
+    
+    # Color coding for direction
+    if event["direction"] == "A → B":
+        direction_color = "🔵"  # Blue for A to B
+    else:
+        direction_color = "🟠"  # Orange for B to A
+    
+    if event["type"] == "BATCH":
+        per_entry = event["ms"] / event["entries"] if event["entries"] else 0.0
+        return (f"{timestamp} {direction_color} {event['direction']} 📦 BATCH of {event['entries']} "
+                f"in {event['ms']:.2f}ms ({per_entry:.3f}ms/entry)")
+    
+    # Data type icons
+    type_icons = {
+        "STREAM": "📊",
+        "TRANSACTION": "💳",
+        "PHOTO": "📷"
+    }
+    icon = type_icons.get(event["type"], "📄")
+    
+    # Format replication time with color coding
+    if event["ms"] < 1:
+        time_color = "🟢"  # Green for very fast
+    elif event["ms"] < 10:
+        time_color = "🟡"  # Yellow for fast
+    else:
+        time_color = "🔴"  # Red for slow
+    
+    return "\n".join([
+        f"{timestamp} {direction_color} {event['direction']} {icon} {event['type']}",
+        f"    Key: {event['key']}",
+        f"    Data: {event['data']}",
+        f"    {time_color} Replication Time: {event['ms']:.2f}ms",
+        f"    📈 Total Replicated: {event['total']}",
+        "-" * 60
+    ])
+
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Redis Active-Active replication monitor")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Stream entries per read (1 = per-entry mode with per-key timings)")
+    parser.add_argument("--consumer", default=None,
+                        help="Consumer name within the replication groups (default: hostname-based)")
+    parser.add_argument("--from-now", action="store_true",
+                        help="When creating the groups, skip existing history instead of replicating it")
+    parser.add_argument("--lazy-photos", action="store_true",
+                        help="Replicate photo references only; photos are fetched from their origin on read")
+    parser.add_argument("--compress", action="store_true",
+                        help="Write replicated records and legacy photos dictionary-compressed")
+    add_output_arguments(parser)
+    args = parser.parse_args()
+
     try:
-        monitor = RedisReplicationMonitor()
+        monitor = RedisReplicationMonitor(batch_size=args.batch_size, consumer=args.consumer,
+                                          start_id="$" if args.from_now else "0",
+                                          lazy_photos=args.lazy_photos, compress=args.compress,
+                                          events=writer_from_args(args, format_replication_event))
         monitor.start_monitoring()
     except Exception as e:
         logger.error(f"❌ Failed to start monitor: {e}")
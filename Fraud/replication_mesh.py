@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Replication Mesh - asyncio active-active replication across N stores
+
+The replication monitors are wired for two stores and run a thread per
+direction. The mesh takes any number of stores and runs one coroutine per
+source stream: each batch is read once through the source's consumer
+group, fetched with one pipeline and applied to every peer concurrently.
+Every source → peer link has a bounded window of batches in flight, so a
+slow peer throttles its source instead of growing a queue. A batch is
+acknowledged once every peer has applied it; a batch that failed on any
+peer stays pending and is claimed again after the idle timeout. Peers
+that already applied it see no change the second time: each store
+appends at most one stream entry per transaction.
+
+Only entries that originated at the source are forwarded. In a full mesh
+the origin's own coroutine already reaches every peer, so forwarding the
+copies a store received would only create duplicates.
+
+--lazy-photos replicates only photo references; a store fetches a photo
+from its origin the first time it reads it. --compress writes records
+and legacy photos dictionary-compressed, compressing each batch once for
+all peers.
+
+Each link keeps a live end-to-end lag gauge and histogram, from an
+entry's commit at its origin to the moment the peer has applied it,
+published to the peer's replication_lag hash.
+
+Run the mesh instead of the two-store monitors, not alongside them:
+    python replication_mesh.py --store STORE_A=localhost:6379 \\
+        --store STORE_B=localhost:6380 --store STORE_C=localhost:6381
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from transaction_store import entry_origin
+from stream_replication import (
+    AsyncStreamGroupReader, replication_group, default_consumer_name,
+    fetch_entry_payloads_async, apply_payloads_async, compress_payloads, payload_bytes,
+    deferred_photos, entry_commit_ms, BatchStats
+)
+from latency_histogram import (
+    LatencyHistograms, ReplicationLag, publish_latency, publish_lag, format_summary
+)
+from payload_codec import CompressionStats, format_compression
+
+logger = logging.getLogger(__name__)
+
+MESH_GROUP = replication_group("mesh")
+
+DEFAULT_STORES = ["STORE_A=localhost:6379", "STORE_B=localhost:6380"]
+
+StoreSpec = Tuple[str, str, int]
+
+
+def parse_store(spec: str) -> StoreSpec:
+    """Parse ``NAME=HOST:PORT`` into ``(name, host, port)``"""
+    name, _, address = spec.partition("=")
+    host, _, port = address.rpartition(":")
+    if not name or not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"Expected NAME=HOST:PORT, got {spec!r}")
+    return name, host, int(port)
+
+
+def link_label(source: str, peer: str) -> str:
+    return f"{source} → {peer}"
+
+
+class ReplicationMesh:
+    def __init__(self, stores: List[StoreSpec], consumer: str = None, batch_size: int = 500,
+                 window: int = 4, start_id: str = "0", lazy_photos: bool = False,
+                 compress: bool = False):
+        """Replicate every store's own writes to every other store
+
+        ``window`` is the number of batches allowed in flight on each
+        source → peer link before that source stops reading.
+        """
+        if len({name for name, _, _ in stores}) < 2:
+            raise ValueError("A replication mesh needs at least two distinct stores")
+
+        self.stores = stores
+        self.consumer = consumer or default_consumer_name("replication_mesh")
+        self.batch_size = max(1, batch_size)
+        self.window = max(1, window)
+        self.start_id = start_id
+        self.lazy_photos = lazy_photos
+        self.compression = CompressionStats() if compress else None
+
+        # Raw clients: stream fields, records and photos stay bytes end to end
+        self.clients = {name: aioredis.Redis(host=host, port=port) for name, host, port in stores}
+        self.windows: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+
+        # Statistics
+        self.running = False
+        self.batch_stats = {name: BatchStats() for name in self.clients}
+        self.latency = LatencyHistograms()
+        self.lag = ReplicationLag()
+        self.stats = {"received_skipped": 0, "photos_deferred": 0, "failed_batches": 0, "errors": 0}
+
+    def peers(self, source: str) -> List[str]:
+        return [name for name in self.clients if name != source]
+
+    async def replicate_source(self, source: str):
+        """Read one source stream and fan its batches out to every peer"""
+        reader = AsyncStreamGroupReader(self.clients[source], MESH_GROUP, self.consumer,
+                                        count=self.batch_size, start_id=self.start_id)
+        await reader.ensure_group()
+        peers = self.peers(source)
+        pending = set()
+
+        while self.running:
+            try:
+                entries = await reader.read()
+                if not entries:
+                    for peer in peers:
+                        self.lag.caught_up(link_label(source, peer))
+
+                # Forward this store's own writes; acknowledge copies it received
+                forward, received = [], []
+                for entry_id, fields in entries:
+                    if entry_origin(fields) in (source, None):
+                        forward.append((entry_id, fields))
+                    else:
+                        received.append(entry_id)
+                if received:
+                    await reader.ack(received)
+                    self.stats["received_skipped"] += len(received)
+                if not forward:
+                    continue
+
+                payloads = await fetch_entry_payloads_async(self.clients[source], forward, self.lazy_photos)
+                self.stats["photos_deferred"] += deferred_photos(payloads)
+                if self.compression is not None:
+                    compress_payloads(payloads, self.compression)
+
+                # A full window on any link holds this source back
+                for peer in peers:
+                    await self.windows[(source, peer)].acquire()
+                    self.in_flight[(source, peer)] += 1
+
+                task = asyncio.create_task(self.fan_out(reader, source, peers, forward, payloads))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+            except redis.ResponseError as e:
+                if "NOGROUP" in str(e):
+                    await reader.ensure_group()
+                else:
+                    logger.error(f"Stream read error on {source}: {e}")
+                    await asyncio.sleep(0.1)
+            except Exception as e:
+                if self.running:
+                    logger.error(f"Error replicating from {source}: {e}")
+                    self.stats["errors"] += 1
+                await asyncio.sleep(1)
+
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def fan_out(self, reader, source: str, peers: List[str], entries, payloads):
+        """Apply one batch to every peer concurrently, then acknowledge it"""
+        start_ns = time.perf_counter_ns()
+        applied = await asyncio.gather(*(self.apply_to_peer(source, peer, payloads) for peer in peers))
+
+        if all(applied):
+            await reader.ack([entry_id for entry_id, _ in entries])
+            batch_ms = (time.perf_counter_ns() - start_ns) / 1e6
+            self.batch_stats[source].record(len(entries), batch_ms, payload_bytes(payloads) * len(peers))
+        else:
+            # Left pending: reclaimed after the idle timeout and re-applied; peers that
+            # already applied it append no second stream entry
+            self.stats["failed_batches"] += 1
+
+    async def apply_to_peer(self, source: str, peer: str, payloads) -> bool:
+        """Write a fetched batch to one peer, releasing the link's window slot"""
+        start_ns = time.perf_counter_ns()
+        try:
+            await apply_payloads_async(self.clients[peer], payloads)
+            self.latency.record_ns(link_label(source, peer), "BATCH", time.perf_counter_ns() - start_ns)
+            self.lag.record(link_label(source, peer),
+                            [entry_commit_ms(payload["stream_id"], payload["fields"]) for payload in payloads])
+            return True
+        except Exception as e:
+            logger.error(f"Failed to apply batch {link_label(source, peer)}: {e}")
+            self.stats["errors"] += 1
+            return False
+        finally:
+            self.in_flight[(source, peer)] -= 1
+            self.windows[(source, peer)].release()
+
+    async def publish_latency(self):
+        """Publish the histograms of the links writing into each store"""
+        for peer, client in self.clients.items():
+            snapshot = {}
+            lag = {"histograms": {}, "gauges": {}}
+            for source in self.peers(peer):
+                snapshot.update(self.latency.snapshot(link_label(source, peer)))
+                link_lag = self.lag.snapshot(link_label(source, peer))
+                lag["histograms"].update(link_lag["histograms"])
+                lag["gauges"].update(link_lag["gauges"])
+            if snapshot:
+                try:
+                    await publish_latency(client, self.consumer, snapshot)
+                    await publish_lag(client, self.consumer, lag)
+                except redis.RedisError as e:
+                    logger.error(f"Failed to publish latency to {peer}: {e}")
+
+    def print_status(self):
+        """Print throughput per source and latency per link"""
+        print(f"\n📊 MESH STATUS - {datetime.now().strftime('%H:%M:%S')}")
+        print("=" * 60)
+        for source, batch_stats in self.batch_stats.items():
+            stats = batch_stats.snapshot()
+            print(f"📦 {source}: {stats['entries']} entries in {stats['batches']} batches, "
+                  f"{stats['entries_per_sec']} entries/sec")
+        for (source, peer), in_flight in self.in_flight.items():
+            histogram = self.latency.get(link_label(source, peer), "BATCH")
+            lag_ms = self.lag.gauge(link_label(source, peer))
+            print(f"🔗 {link_label(source, peer)} [{in_flight}/{self.window} in flight] "
+                  f"{format_summary(histogram.summary())}")
+            if lag_ms is not None:
+                print(f"   🕰️  lag now {lag_ms}ms")
+        print(f"🔁 Received Copies Skipped: {self.stats['received_skipped']}")
+        if self.lazy_photos:
+            print(f"📷 Photos Deferred: {self.stats['photos_deferred']}")
+        if self.compression is not None:
+            for data_type, stats in self.compression.snapshot().items():
+                print(f"🗜️  {format_compression(data_type, stats)}")
+        print(f"⚠️  Failed Batches: {self.stats['failed_batches']}")
+        print(f"❌ Errors: {self.stats['errors']}")
+        print("=" * 60)
+
+    async def report_status(self, interval: float = 5.0):
+        while self.running:
+            await asyncio.sleep(interval)
+            self.print_status()
+            await self.publish_latency()
+
+    async def run(self):
+        """Replicate until cancelled"""
+        for name, client in self.clients.items():
+            await client.ping()
+            print(f"✅ Connected to {name} ({client.connection_pool.connection_kwargs.get('port')})")
+
+        for source in self.clients:
+            for peer in self.peers(source):
+                self.windows[(source, peer)] = asyncio.Semaphore(self.window)
+                self.in_flight[(source, peer)] = 0
+
+        print("\n🔄 Starting Replication Mesh")
+        print("=" * 60)
+        print(f"🕸️  {len(self.clients)} stores, {len(self.windows)} links")
+        print(f"📦 Up to {self.batch_size} entries per batch, {self.window} batches in flight per link")
+        print(f"📍 Consumer {self.consumer} in group {MESH_GROUP}")
+        print("🛑 Press Ctrl+C to stop")
+        print("=" * 60)
+
+        self.running = True
+        try:
+            await asyncio.gather(self.report_status(),
+                                 *(self.replicate_source(name) for name in self.clients))
+        finally:
+            self.running = False
+            await self.publish_latency()
+            for client in self.clients.values():
+                await client.connection_pool.disconnect()
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="asyncio replication mesh across N Redis stores")
+    parser.add_argument("--store", dest="stores", action="append", type=parse_store,
+                        help="Store as NAME=HOST:PORT, repeat per store (default: STORE_A and STORE_B)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Stream entries per read")
+    parser.add_argument("--window", type=int, default=4,
+                        help="Batches in flight per source → peer link")
+    parser.add_argument("--consumer", default=None,
+                        help="Consumer name within the mesh groups (default: hostname-based)")
+    parser.add_argument("--from-now", action="store_true",
+                        help="When creating the groups, skip existing history instead of replicating it")
+    parser.add_argument("--lazy-photos", action="store_true",
+                        help="Replicate photo references only; photos are fetched from their origin on read")
+    parser.add_argument("--compress", action="store_true",
+                        help="Write replicated records and legacy photos dictionary-compressed")
+    args = parser.parse_args()
+
+    try:
+        mesh = ReplicationMesh(args.stores or [parse_store(spec) for spec in DEFAULT_STORES],
+                               consumer=args.consumer, batch_size=args.batch_size, window=args.window,
+                               start_id="$" if args.from_now else "0", lazy_photos=args.lazy_photos,
+                               compress=args.compress)
+        asyncio.run(mesh.run())
+    except KeyboardInterrupt:
+        print("\n\n🛑 Stopping replication mesh...")
+        mesh.print_status()
+        print("👋 Mesh stopped")
+    except Exception as e:
+        logger.error(f"❌ Failed to start mesh: {e}")
+
+if __name__ == "__main__":
+    main()
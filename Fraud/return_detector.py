@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Return Detector - streaming detection of simultaneous cross-store returns
+
+Comparing every return at one store with every return at the other only
+covers the few entries fetched, and grows with the square of them. The
+detector instead indexes each return as it is read from a transaction
+stream, by original transaction and store, so a second store returning
+the same original transaction is found with one dictionary lookup.
+
+Returns are forgotten once they fall out of the window (five minutes by
+default), measured against the newest return seen, so memory is bounded
+by the returns in the window rather than by how long the dashboard runs.
+Each store's stream also carries the other store's replicated returns;
+a return is indexed only the first time its transaction ID is seen.
+"""
+
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+RETURN_WINDOW_SECONDS = 300
+
+# Kept per indexed return; the caller's dict may be changed after add()
+RETURN_FIELDS = ["stream_id", "transaction_id", "original_transaction_id", "store_id",
+                 "customer_id", "has_photo", "timestamp"]
+
+
+class SimultaneousReturnDetector:
+    def __init__(self, window_seconds: float = RETURN_WINDOW_SECONDS):
+        """Returns per original transaction and store, over a sliding window"""
+        self.window_seconds = window_seconds
+        self.lock = threading.Lock()
+
+        # original_transaction_id → {store_id: first return from that store}
+        self.returns: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # original_transaction_id → attempt, in detection order
+        self.attempts: Dict[str, Dict[str, Any]] = {}
+        # (timestamp, original_transaction_id, store_id, transaction_id) in arrival order
+        self.expiry = deque()
+        self.seen = set()
+        self.newest = 0
+
+    def add(self, transaction: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Index one return; returns the attempt it completes, if any
+
+        ``transaction`` needs transaction_id, original_transaction_id,
+        store_id and timestamp (seconds); anything else is ignored.
+        """
+        original_id = transaction.get("original_transaction_id")
+        if transaction.get("type") != "RETURN" or not original_id:
+            return None
+
+        with self.lock:
+            if transaction["transaction_id"] in self.seen:
+                return None
+            timestamp = transaction["timestamp"]
+            self.newest = max(self.newest, timestamp)
+            self.expire()
+            if timestamp < self.newest - self.window_seconds:
+                # Arrived after its window had passed
+                return None
+
+            transaction = {field: transaction.get(field) for field in RETURN_FIELDS}
+            self.seen.add(transaction["transaction_id"])
+            self.expiry.append((timestamp, original_id, transaction["store_id"], transaction["transaction_id"]))
+            by_store = self.returns.setdefault(original_id, {})
+            by_store.setdefault(transaction["store_id"], transaction)
+
+            attempt = None
+            for store_id, other in by_store.items():
+                if store_id != transaction["store_id"] and \
+                        abs(other["timestamp"] - timestamp) < self.window_seconds:
+                    attempt = simultaneous_attempt(original_id, other, transaction)
+                    self.attempts.pop(original_id, None)
+                    self.attempts[original_id] = attempt
+                    break
+            return attempt
+
+    def expire(self):
+        """Forget returns older than the window; called with the lock held"""
+        cutoff = self.newest - self.window_seconds
+        while self.expiry and self.expiry[0][0] < cutoff:
+            _, original_id, store_id, transaction_id = self.expiry.popleft()
+            self.seen.discard(transaction_id)
+            by_store = self.returns.get(original_id)
+            if by_store and by_store.get(store_id, {}).get("transaction_id") == transaction_id:
+                del by_store[store_id]
+                if not by_store:
+                    del self.returns[original_id]
+            attempt = self.attempts.get(original_id)
+            if attempt and transaction_id in (attempt["legitimate_return"]["transaction_id"],
+                                              attempt["fraudulent_return"]["transaction_id"]):
+                del self.attempts[original_id]
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Attempts still in the window, most recently detected first"""
+        with self.lock:
+            return list(reversed(self.attempts.values()))
+
+    def size(self) -> int:
+        with self.lock:
+            return len(self.seen)
+
+
+def simultaneous_attempt(original_id: str, first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+    """Dashboard record of two stores returning the same original transaction
+
+    The earlier return, or the photo-verified one if only one is, is
+    taken as the legitimate one.
+    """
+    legitimate, fraudulent = sorted((first, second), key=lambda t: t["timestamp"])
+    if fraudulent.get("has_photo") and not legitimate.get("has_photo"):
+        legitimate, fraudulent = fraudulent, legitimate
+    return {
+        "original_transaction_id": original_id,
+        "legitimate_return": legitimate,
+        "fraudulent_return": fraudulent,
+        "time_difference": abs(legitimate["timestamp"] - fraudulent["timestamp"]),
+        "fraud_indicators": {
+            "simultaneous_attempts": True,
+            "photo_verification_mismatch": legitimate.get("has_photo", False) != fraudulent.get("has_photo", False),
+            "different_stores": legitimate["store_id"] != fraudulent["store_id"],
+            "no_photo_verification": not fraudulent.get("has_photo", False)
+        }
+    }
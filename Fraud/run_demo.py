@@ -188,20 +188,15 @@ class FraudDemo:
         
         try:
             import redis
+            from stream_replication import replicate_transaction
             
             # Connect to both instances
             redis_a = redis.Redis(host='localhost', port=6379, db=0, decode_responses=False)
             redis_b = redis.Redis(host='localhost', port=6380, db=0, decode_responses=False)
             
-            # Copy transaction data
-            transaction_data = redis_a.get(f"transaction:{transaction_id}")
-            if transaction_data:
-                redis_b.set(f"transaction:{transaction_id}", transaction_data)
-            
-            # Copy photo data
-            photo_data = redis_a.get(f"photo:{transaction_id}")
-            if photo_data:
-                redis_b.set(f"photo:{transaction_id}", photo_data)
+            # Copy the transaction, its photo blob and stream entry through the commit path
+            if not replicate_transaction(redis_a, redis_b, transaction_id):
+                logger.warning(f"⚠️ No stream entry for {transaction_id}")
             
             # Copy customer data
             customer_data = redis_a.get("customer:CUST_001")
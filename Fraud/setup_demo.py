@@ -17,6 +17,9 @@ import threading
 from datetime import datetime
 import logging
 
+from photo_store import binary_client
+from stream_replication import replicate_transaction
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -170,17 +173,12 @@ class DemoSetup:
             logger.info("🔄 Waiting for Active-Active replication...")
             time.sleep(2)
             
-            # Simulate data sync to Store B
-            transaction_data = self.redis_store_a.get(f"transaction:{transaction_id}")
-            if transaction_data:
-                self.redis_store_b.set(f"transaction:{transaction_id}", transaction_data)
-                
-                # Copy photo data if exists
-                photo_data = self.redis_store_a.get(f"photo:{transaction_id}")
-                if photo_data:
-                    self.redis_store_b.set(f"photo:{transaction_id}", photo_data)
-            
-            logger.info("✅ Data replicated to Store B")
+            # Simulate data sync to Store B: record, photo blob and stream entry,
+            # through the same commit path as the replication monitors
+            if replicate_transaction(binary_client(self.redis_store_a), self.redis_store_b, transaction_id):
+                logger.info("✅ Data replicated to Store B")
+            else:
+                logger.warning(f"⚠️ No stream entry for {transaction_id}; Store B left unchanged")
             
             # Step 2: Legitimate return at Store A
             logger.info("🔄 Step 2: Customer returns item at Store A (legitimate)...")
@@ -216,6 +214,7 @@ class DemoSetup:
         
         try:
             import fraud_dashboard
+            fraud_dashboard.dashboard.start_monitoring()
             
             # Start dashboard in a separate thread
             dashboard_thread = threading.Thread(
@@ -19,6 +19,8 @@ from datetime import datetime
 from typing import Dict, Optional
 import logging
 
+from face_tracker import FaceTracker, load_face_cascade
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -71,12 +73,8 @@ class SimpleFacePOS:
     def init_face_detection(self):
         """Initialize face detection"""
         try:
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            if self.face_cascade.empty():
-                logger.error("❌ Failed to load face cascade")
-                self.face_cascade = None
-            else:
-                logger.info("✅ Face detection initialized")
+            self.face_cascade = load_face_cascade()
+            logger.info("✅ Face detection initialized")
         except Exception as e:
             logger.error(f"❌ Face detection failed: {e}")
             self.face_cascade = None
@@ -95,6 +93,9 @@ class SimpleFacePOS:
         print("  'c' - Capture photo")
         print("  'q' - Cancel")
         
+        # Full detection every few frames, cheap tracking in between
+        tracker = FaceTracker(min_face_size=(30, 30)) if self.face_cascade is not None else None
+        
         while True:
             ret, frame = self.camera.read()
             if not ret:
@@ -102,10 +103,7 @@ class SimpleFacePOS:
                 break
             
             # Simple face detection
-            faces = []
-            if self.face_cascade is not None:
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                faces = self.face_cascade.detectMultiScale(gray, 1.1, 4, minSize=(30, 30))
+            faces = tracker.update(frame) if tracker else []
             
             # Draw face boxes
             for (x, y, w, h) in faces:
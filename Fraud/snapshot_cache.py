@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Snapshot Cache - one dashboard snapshot shared by every client
+
+Each open dashboard used to rebuild the same snapshot from Redis on every
+poll, so Redis load grew with the number of viewers. A ``SharedSnapshot``
+builds it at most once per ``max_age`` seconds, however many clients ask;
+callers arriving while it is being rebuilt wait for that build instead of
+starting their own.
+
+The snapshot is serialized once per build, and carries a versioned ETag
+that changes only when its content does: clients polling with
+If-None-Match get a 304 and no body until something actually changed.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Seconds a snapshot is served before it is rebuilt
+DEFAULT_MAX_AGE = 1.0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header names ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    return any((tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == wanted
+               for tag in if_none_match.split(","))
+
+
+def conditional_response(snapshot: Dict[str, Any], if_none_match: Optional[str]) -> Tuple[int, bytes, Dict[str, str]]:
+    """``(status, body, headers)`` for serving a snapshot: 304 if the client has it"""
+    # no-cache: browsers may keep the body but must revalidate it every time
+    headers = {"ETag": snapshot["etag"], "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, snapshot["etag"]):
+        return 304, b"", headers
+    return 200, snapshot["body"], headers
+
+
+class SharedSnapshot:
+    def __init__(self, max_age: float = DEFAULT_MAX_AGE, volatile_keys=("timestamp",)):
+        """Most recent snapshot, shared by every caller
+
+        ``get`` returns a dict with the snapshot ``value``, its serialized
+        ``body``, ``etag`` and ``version``, replaced as a whole on rebuild.
+        ``volatile_keys`` are top-level keys left out of the content hash,
+        so a rebuild that only moves the timestamp keeps the same ETag.
+        """
+        self.max_age = max_age
+        self.volatile_keys = set(volatile_keys)
+        self.lock = threading.Lock()
+        self.async_lock = None
+
+        self.current: Optional[Dict[str, Any]] = None
+        self.version = 0
+        self.digest = None
+        self.built_at = 0.0
+        self.builds = 0
+        self.generation = 0
+
+    def fresh(self) -> bool:
+        return self.current is not None and time.monotonic() - self.built_at < self.max_age
+
+    def invalidate(self):
+        """Rebuild on the next request, e.g. after new data was pushed to clients"""
+        self.generation += 1
+        self.built_at = 0.0
+
+    def publish(self, value: Dict[str, Any], generation: Optional[int] = None) -> Dict[str, Any]:
+        """Serialize a freshly built snapshot; the version moves only if its content changed
+
+        A snapshot whose build started before an ``invalidate`` is served
+        but not considered fresh.
+        """
+        stable = {key: item for key, item in value.items() if key not in self.volatile_keys}
+        digest = hashlib.sha1(json.dumps(stable, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if digest != self.digest:
+            self.version += 1
+            self.digest = digest
+        self.current = {
+            "value": value,
+            "body": json.dumps(value, default=str).encode("utf-8"),
+            "etag": f'W/"{self.version}-{digest[:16]}"',
+            "version": self.version
+        }
+        self.built_at = time.monotonic() if generation in (None, self.generation) else 0.0
+        self.builds += 1
+        return self.current
+
+    def get(self, builder: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Rebuild with ``builder`` if the snapshot is stale; one build at a time"""
+        if not self.fresh():
+            with self.lock:
+                if not self.fresh():
+                    generation = self.generation
+                    self.publish(builder(), generation)
+        return self.current
+
+    async def get_async(self, builder) -> Dict[str, Any]:
+        """``get`` for an async ``builder``, within one event loop"""
+        if not self.fresh():
+            if self.async_lock is None:
+                self.async_lock = asyncio.Lock()
+            async with self.async_lock:
+                if not self.fresh():
+                    generation = self.generation
+                    self.publish(await builder(), generation)
+        return self.current
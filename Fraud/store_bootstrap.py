@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Store Bootstrap - snapshot copy of a store, then hand off to replication
+
+The replication monitors only copy stream entries written after their
+consumer group's checkpoint. A new store, or one that was down long
+enough for the source stream to be trimmed, would miss the history, so
+it is seeded from a snapshot first:
+
+1. The cut: one MULTI/EXEC on the source DUMPs the stream together with
+   the aggregate keys (time index, counters, stream entry map, photo
+   references) and reads
+   the stream's last entry ID. Everything in the cut reflects exactly the
+   writes up to that ID.
+2. Per-key state (transaction records, photos, per-customer indexes) is
+   SCANned and copied with pipelined DUMP/RESTORE in parallel batches,
+   under an optional bytes/keys per second budget.
+3. The hand-off: the target's consumer group on the source stream is
+   created, or moved, at the cut's entry ID, so streaming replication
+   picks up with the first entry the snapshot does not cover.
+
+Records committed after the cut may be copied by the SCAN as well. That
+is harmless: replaying them through ``queue_transaction_commit`` indexes
+and counts each transaction only once.
+
+The stream is restored only if the target has none, so a lagging store
+keeps its own history; the source's consumer groups are dropped from the
+copy. The aggregate keys are restored with the stream. A store that keeps
+its own stream keeps its own aggregates too, and once the records are
+copied its indexes, counters and photo references are rebuilt from them.
+RESTORE needs a target running the same or a newer Redis version than
+the source.
+
+The replication mesh shares one group per source stream between all
+peers, so it is not moved: stop the mesh, bootstrap the new store with
+--no-handoff and restart the mesh with it. The mesh resumes from a
+checkpoint no later than the cut. Re-applying the entries in between is
+harmless: ``stream_entries`` restored with the stream keeps the target
+from appending a transaction's entry twice, and the index and photo
+references take each transaction once.
+
+    python store_bootstrap.py --source STORE_A=localhost:6379 --target STORE_C=localhost:6381
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+import redis
+
+from transaction_store import (
+    TRANSACTION_STREAM, TRANSACTION_INDEX, STORE_COUNTERS,
+    CUSTOMER_PURCHASES_PREFIX, CUSTOMERS_BY_LAST_PURCHASE, STREAM_ENTRIES,
+    index_existing_transactions, rebuild_store_counters, rebuild_photo_refs
+)
+from photo_store import PHOTO_BLOB_PREFIX, PHOTO_REFS, PHOTO_HOLDERS, PHOTO_STATS
+from stream_replication import replication_group
+from replication_mesh import parse_store
+
+# Dumped in the same MULTI as the stream, so they match the hand-off ID
+CUT_KEYS = [TRANSACTION_INDEX, STORE_COUNTERS, CUSTOMERS_BY_LAST_PURCHASE, STREAM_ENTRIES,
+            PHOTO_REFS, PHOTO_HOLDERS, PHOTO_STATS]
+
+# Per-key state copied by SCAN after the cut ("photo:*" is the legacy base64 key)
+SCAN_PATTERNS = ["transaction:*", "photo:*", f"{PHOTO_BLOB_PREFIX}*", f"{CUSTOMER_PURCHASES_PREFIX}*"]
+
+
+class Throttle:
+    def __init__(self, max_bytes_per_sec: Optional[float] = None, max_keys_per_sec: Optional[float] = None):
+        """Bytes and keys per second budget shared by every copy worker"""
+        self.max_bytes_per_sec = max_bytes_per_sec
+        self.max_keys_per_sec = max_keys_per_sec
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def wait(self, keys: int, data_bytes: int):
+        """Block until a batch of this size fits the budget"""
+        cost = 0.0
+        if self.max_keys_per_sec:
+            cost = max(cost, keys / self.max_keys_per_sec)
+        if self.max_bytes_per_sec:
+            cost = max(cost, data_bytes / self.max_bytes_per_sec)
+        if not cost:
+            return
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            self.next_at = start + cost
+        if start > now:
+            time.sleep(start - now)
+
+
+class StoreBootstrap:
+    def __init__(self, source, target, target_name: str, group: Optional[str] = None,
+                 batch_size: int = 200, workers: int = 4, throttle: Optional[Throttle] = None,
+                 handoff: bool = True):
+        """Copy ``source`` into ``target`` and hand off to ``target_name``'s replication group
+
+        Both clients must not decode responses: DUMP payloads are binary.
+        """
+        self.source = source
+        self.target = target
+        self.target_name = target_name
+        self.group = group or replication_group(target_name)
+        self.batch_size = max(1, batch_size)
+        self.workers = max(1, workers)
+        self.throttle = throttle or Throttle()
+        self.handoff = handoff
+
+        self.lock = threading.Lock()
+        self.stats = {"keys": 0, "bytes": 0, "missing": 0, "batches": 0}
+
+    def take_cut(self):
+        """Atomically dump the stream and aggregate keys; returns ``(handoff_id, dumps)``"""
+        pipe = self.source.pipeline(transaction=True)
+        pipe.xrevrange(TRANSACTION_STREAM, count=1)
+        for key in [TRANSACTION_STREAM] + CUT_KEYS:
+            pipe.dump(key)
+        last_entry, *payloads = pipe.execute()
+
+        handoff_id = last_entry[0][0].decode() if last_entry else "0"
+        return handoff_id, dict(zip([TRANSACTION_STREAM] + CUT_KEYS, payloads))
+
+    def restore_cut(self, dumps: Dict[str, Optional[bytes]]) -> bool:
+        """Restore the cut on the target; returns whether the stream was restored
+
+        The aggregate keys describe the cut's stream, so they are only
+        restored with it; a target keeping its own stream keeps its own.
+        """
+        if dumps[TRANSACTION_STREAM] is None or self.target.exists(TRANSACTION_STREAM):
+            return False
+
+        pipe = self.target.pipeline(transaction=True)
+        pipe.restore(TRANSACTION_STREAM, 0, dumps[TRANSACTION_STREAM])
+        for key in CUT_KEYS:
+            pipe.delete(key)
+            if dumps[key] is not None:
+                pipe.restore(key, 0, dumps[key])
+        pipe.execute()
+
+        # The source's groups feed its own peers and mean nothing here
+        for group in self.target.xinfo_groups(TRANSACTION_STREAM):
+            self.target.xgroup_destroy(TRANSACTION_STREAM, group["name"])
+        return True
+
+    def rebuild_aggregates(self) -> int:
+        """Fold the copied records into the target's own indexes, counters and photo references"""
+        indexed = index_existing_transactions(self.target, self.batch_size)
+        rebuild_store_counters(self.target, self.batch_size)
+        rebuild_photo_refs(self.target, self.batch_size)
+        return indexed
+
+    def copy_batch(self, keys: List[bytes]) -> int:
+        """DUMP a batch of keys from the source and RESTORE them on the target"""
+        read = self.source.pipeline(transaction=False)
+        for key in keys:
+            read.dump(key)
+            read.pttl(key)
+        results = read.execute()
+
+        write = self.target.pipeline(transaction=False)
+        copied = data_bytes = missing = 0
+        for key, payload, ttl in zip(keys, results[::2], results[1::2]):
+            if payload is None:
+                # Deleted since the SCAN returned it
+                missing += 1
+                continue
+            write.restore(key, max(ttl, 0), payload, replace=True)
+            copied += 1
+            data_bytes += len(payload)
+
+        self.throttle.wait(copied, data_bytes)
+        write.execute()
+
+        with self.lock:
+            self.stats["keys"] += copied
+            self.stats["bytes"] += data_bytes
+            self.stats["missing"] += missing
+            self.stats["batches"] += 1
+        return copied
+
+    def scan_batches(self):
+        """SCAN the source for every per-key pattern, ``batch_size`` keys at a time"""
+        for pattern in SCAN_PATTERNS:
+            batch = []
+            for key in self.source.scan_iter(match=pattern, count=self.batch_size):
+                batch.append(key)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    def copy_keyspace(self):
+        """Copy every scanned batch with a bounded number of batches in flight"""
+        start_time = time.perf_counter()
+        next_report = 50
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = set()
+            for batch in self.scan_batches():
+                if len(in_flight) >= self.workers * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                in_flight.add(executor.submit(self.copy_batch, batch))
+
+                if self.stats["batches"] >= next_report:
+                    self.print_progress(start_time)
+                    next_report += 50
+            for future in in_flight:
+                future.result()
+        return time.perf_counter() - start_time
+
+    def hand_off(self, handoff_id: str):
+        """Start the target's replication group at the end of the snapshot"""
+        try:
+            self.source.xgroup_create(TRANSACTION_STREAM, self.group, id=handoff_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+            self.source.xgroup_setid(TRANSACTION_STREAM, self.group, id=handoff_id)
+
+    def print_progress(self, start_time: float):
+        elapsed = max(time.perf_counter() - start_time, 0.001)
+        print(f"   📦 {self.stats['keys']:,} keys, {self.stats['bytes'] / 1024 / 1024:.1f} MB "
+              f"({self.stats['keys'] / elapsed:.0f} keys/sec)")
+
+    def run(self) -> str:
+        """Snapshot, copy and hand off; returns the hand-off stream ID"""
+        print(f"\n🚚 Bootstrapping {self.target_name}")
+        print("=" * 60)
+
+        handoff_id, dumps = self.take_cut()
+        print(f"✂️  Cut taken at stream entry {handoff_id}")
+
+        stream_restored = self.restore_cut(dumps)
+        if stream_restored:
+            print("📊 Stream restored from the snapshot")
+            print(f"📈 Restored {sum(1 for key in CUT_KEYS if dumps[key] is not None)} aggregate keys")
+        else:
+            print("📊 Target stream kept (already present or nothing to copy); aggregates will be rebuilt")
+
+        elapsed = self.copy_keyspace()
+        print(f"✅ Copied {self.stats['keys']:,} keys, {self.stats['bytes'] / 1024 / 1024:.1f} MB "
+              f"in {elapsed:.1f}s ({self.stats['keys'] / max(elapsed, 0.001):.0f} keys/sec)")
+        if self.stats["missing"]:
+            print(f"⚠️  {self.stats['missing']} keys were deleted during the copy")
+
+        if not stream_restored:
+            indexed = self.rebuild_aggregates()
+            print(f"📈 Rebuilt indexes, counters and photo references from {indexed:,} records")
+
+        if self.handoff:
+            self.hand_off(handoff_id)
+            print(f"🤝 Group {self.group} now starts after {handoff_id}; start replication to take over")
+        else:
+            print(f"🤝 Snapshot ends at {handoff_id}; no replication group was moved")
+        print("=" * 60)
+        return handoff_id
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Seed a store from a snapshot of another")
+    parser.add_argument("--source", type=parse_store, default=parse_store("STORE_A=localhost:6379"),
+                        help="Store to copy from, as NAME=HOST:PORT")
+    parser.add_argument("--target", type=parse_store, required=True,
+                        help="Store to seed, as NAME=HOST:PORT")
+    parser.add_argument("--group", default=None,
+                        help="Replication group to hand off (default: replicate:<target name>)")
+    parser.add_argument("--no-handoff", action="store_true",
+                        help="Copy only; leave every replication group where it is (replication mesh)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Keys per DUMP/RESTORE pipeline")
+    parser.add_argument("--workers", type=int, default=4, help="Batches copied in parallel")
+    parser.add_argument("--max-mb-per-sec", type=float, default=None, help="Copy throughput limit")
+    parser.add_argument("--max-keys-per-sec", type=float, default=None, help="Copy rate limit")
+    args = parser.parse_args()
+
+    _, source_host, source_port = args.source
+    target_name, target_host, target_port = args.target
+    throttle = Throttle(args.max_mb_per_sec * 1024 * 1024 if args.max_mb_per_sec else None,
+                        args.max_keys_per_sec)
+
+    try:
+        bootstrap = StoreBootstrap(redis.Redis(host=source_host, port=source_port),
+                                   redis.Redis(host=target_host, port=target_port),
+                                   target_name, group=args.group, batch_size=args.batch_size,
+                                   workers=args.workers, throttle=throttle, handoff=not args.no_handoff)
+        bootstrap.run()
+    except redis.RedisError as e:
+        print(f"❌ Bootstrap failed: {e}")
+
+
+if __name__ == "__main__":
+    main()
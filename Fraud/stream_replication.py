@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+"""
+Stream Replication - batched, pipelined copy of transaction_stream entries
+
+Replicating one stream entry at a time costs an XREAD, a GET for the
+transaction, a GET for its photo and a write per key, each a separate
+round trip. Here a whole XREAD batch is handled in one read pipeline
+against the source (transaction records and photos for every entry)
+and one write pipeline against the target.
+
+Each replicated transaction is applied with ``queue_transaction_commit``,
+so the target's time index, counters and photo references stay correct,
+and it keeps the commit time of its source stream entry.
+
+Entries are consumed through a consumer group per direction on the source
+stream (``StreamGroupReader``). The group's last-delivered ID is the
+checkpoint, kept by Redis itself; an entry is acknowledged only after it
+is applied to the target, so a restarted replicator first re-reads its own
+unacknowledged entries and entries stranded by a crashed replicator are
+taken over with XAUTOCLAIM.
+
+``AsyncStreamGroupReader`` and the ``*_async`` helpers are the
+``redis.asyncio`` equivalents, used by the N-store replication mesh.
+
+With ``lazy_photos`` only the transaction and its ``photo_ref`` are
+copied; the target fetches the blob from the origin store the first time
+it reads it (see ``photo_store.load_photo``). Legacy ``photo:{id}`` keys
+are still copied eagerly.
+
+``entry_commit_ms`` is when an entry was committed at its origin, from
+which replicators measure end-to-end lag (see
+``latency_histogram.ReplicationLag``).
+
+``apply_payload_staged`` applies one entry as three round trips (photo,
+record, stream entry) so per-entry replication can time each separately.
+
+``compress_payloads`` swaps records and legacy photos for their
+dictionary-compressed form before they are written to the target.
+"""
+
+import socket
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import redis
+
+from transaction_store import (
+    TRANSACTION_STREAM, COMMITTED_FIELD, STREAM_ENTRIES, transaction_key, queue_transaction_commit, queue_stream_entry,
+    should_replicate, stream_field, parse_transaction
+)
+from photo_store import photo_blob_key, queue_add_photo
+
+# Upper bounds of the batch-size distribution buckets
+BATCH_SIZE_BUCKETS = [1, 10, 50, 100, 250, 500, 1000]
+
+StreamEntry = Tuple[str, Dict[str, Any]]
+
+REPLICATION_GROUP_PREFIX = "replicate:"
+
+
+def replication_group(target_name: str) -> str:
+    """Consumer group on a source stream that feeds one target store"""
+    return f"{REPLICATION_GROUP_PREFIX}{target_name}"
+
+
+def default_consumer_name(role: str) -> str:
+    """Stable per-host consumer name, so a restart resumes its own pending entries"""
+    return f"{socket.gethostname()}:{role}"
+
+
+def flatten_stream_reply(response) -> List[StreamEntry]:
+    """Entries of an XREAD/XREADGROUP reply (RESP2 list or RESP3 dict)"""
+    if isinstance(response, dict):
+        response = list(response.items())
+    return [message for _, messages in response or [] for message in messages]
+
+
+def split_deleted(entries) -> Tuple[List[StreamEntry], List[str]]:
+    """Separate live entries from IDs of pending entries deleted from the stream"""
+    live = [(entry_id, fields) for entry_id, fields in entries if fields]
+    deleted = [entry_id for entry_id, fields in entries if not fields]
+    return live, deleted
+
+
+class StreamGroupReader:
+    def __init__(self, redis_client, group: str, consumer: str,
+                 stream: str = TRANSACTION_STREAM, count: int = 500, block_ms: int = 1000,
+                 min_idle_ms: int = 30000, claim_interval: float = 10.0, start_id: str = "0",
+                 create_group: bool = True):
+        """Read a stream through a consumer group with explicit acknowledgement
+
+        ``start_id`` only applies when the group is first created: "0"
+        replicates the existing history once, "$" only new entries.
+        """
+        self.redis_client = redis_client
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.count = count
+        self.block_ms = block_ms
+        self.min_idle_ms = min_idle_ms
+        self.claim_interval = claim_interval
+        self.start_id = start_id
+
+        # Re-deliver our own unacknowledged entries before anything new
+        self.recovering = True
+        self.claim_cursor = "0-0"
+        self.last_claim = 0.0
+        self.claimed = 0
+
+        if create_group:
+            self.ensure_group()
+
+    def ensure_group(self):
+        """Create the group (and the stream) if missing"""
+        try:
+            self.redis_client.xgroup_create(self.stream, self.group, id=self.start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.recovering = True
+
+    def _entries(self, response) -> List[StreamEntry]:
+        """Flatten an XREADGROUP reply, acknowledging entries deleted from the stream"""
+        return self._drop_deleted(flatten_stream_reply(response))
+
+    def _drop_deleted(self, entries) -> List[StreamEntry]:
+        live, deleted = split_deleted(entries)
+        if deleted:
+            self.ack(deleted)
+        return live
+
+    def read(self) -> List[StreamEntry]:
+        """Next batch: own pending entries, then stale claimed ones, then new ones"""
+        if self.recovering:
+            entries = self._entries(self.redis_client.xreadgroup(
+                self.group, self.consumer, {self.stream: "0"}, count=self.count))
+            if entries:
+                return entries
+            self.recovering = False
+
+        now = time.monotonic()
+        if now - self.last_claim >= self.claim_interval:
+            self.last_claim = now
+            entries = self.claim_stale()
+            if entries:
+                return entries
+
+        return self._entries(self.redis_client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.count, block=self.block_ms))
+
+    def claim_stale(self) -> List[StreamEntry]:
+        """Take over entries left pending by other consumers for ``min_idle_ms``"""
+        reply = self.redis_client.xautoclaim(self.stream, self.group, self.consumer,
+                                             min_idle_time=self.min_idle_ms,
+                                             start_id=self.claim_cursor, count=self.count)
+        self.claim_cursor = reply[0]
+        entries = self._drop_deleted(reply[1])
+        self.claimed += len(entries)
+        return entries
+
+    def ack(self, entry_ids: List[str]):
+        """Acknowledge applied entries, advancing the checkpoint"""
+        if entry_ids:
+            self.redis_client.xack(self.stream, self.group, *entry_ids)
+
+    def checkpoint(self) -> Optional[Dict[str, Any]]:
+        """The group's persisted position, pending count and lag (Redis 7+)"""
+        return self._checkpoint_from(self.redis_client.xinfo_groups(self.stream))
+
+    def _checkpoint_from(self, groups) -> Optional[Dict[str, Any]]:
+        for info in groups:
+            name = info.get("name")
+            if isinstance(name, bytes):
+                name = name.decode()
+            if name == self.group:
+                return {
+                    "last_delivered_id": info.get("last-delivered-id"),
+                    "pending": info.get("pending"),
+                    "lag": info.get("lag"),
+                    "claimed": self.claimed
+                }
+        return None
+
+
+class AsyncStreamGroupReader(StreamGroupReader):
+    def __init__(self, redis_client, group: str, consumer: str, **kwargs):
+        """``StreamGroupReader`` for ``redis.asyncio`` clients
+
+        The group is not created here; await ``ensure_group()`` first.
+        """
+        super().__init__(redis_client, group, consumer, create_group=False, **kwargs)
+
+    async def ensure_group(self):
+        try:
+            await self.redis_client.xgroup_create(self.stream, self.group, id=self.start_id, mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.recovering = True
+
+    async def _drop_deleted(self, entries) -> List[StreamEntry]:
+        live, deleted = split_deleted(entries)
+        if deleted:
+            await self.ack(deleted)
+        return live
+
+    async def read(self) -> List[StreamEntry]:
+        if self.recovering:
+            entries = await self._drop_deleted(flatten_stream_reply(await self.redis_client.xreadgroup(
+                self.group, self.consumer, {self.stream: "0"}, count=self.count)))
+            if entries:
+                return entries
+            self.recovering = False
+
+        now = time.monotonic()
+        if now - self.last_claim >= self.claim_interval:
+            self.last_claim = now
+            entries = await self.claim_stale()
+            if entries:
+                return entries
+
+        return await self._drop_deleted(flatten_stream_reply(await self.redis_client.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=self.count, block=self.block_ms)))
+
+    async def claim_stale(self) -> List[StreamEntry]:
+        reply = await self.redis_client.xautoclaim(self.stream, self.group, self.consumer,
+                                                   min_idle_time=self.min_idle_ms,
+                                                   start_id=self.claim_cursor, count=self.count)
+        self.claim_cursor = reply[0]
+        entries = await self._drop_deleted(reply[1])
+        self.claimed += len(entries)
+        return entries
+
+    async def ack(self, entry_ids: List[str]):
+        if entry_ids:
+            await self.redis_client.xack(self.stream, self.group, *entry_ids)
+
+    async def checkpoint(self) -> Optional[Dict[str, Any]]:
+        return self._checkpoint_from(await self.redis_client.xinfo_groups(self.stream))
+
+
+def split_loopback(entries: List[StreamEntry], target_store: str) -> Tuple[List[StreamEntry], List[str]]:
+    """Separate entries to replicate from IDs of entries that originated at the target
+
+    Those are copies the target already has; they are acknowledged without
+    being sent back, so traffic follows real writes instead of bouncing.
+    """
+    replicate, loopback = [], []
+    for entry_id, fields in entries:
+        if should_replicate(fields, target_store):
+            replicate.append((entry_id, fields))
+        else:
+            loopback.append(entry_id)
+    return replicate, loopback
+
+
+def stream_id_ms(stream_id) -> int:
+    """Milliseconds part of a stream entry ID"""
+    if isinstance(stream_id, bytes):
+        stream_id = stream_id.decode()
+    return int(stream_id.split("-", 1)[0])
+
+
+def entry_commit_ms(entry_id, fields: Dict) -> int:
+    """Origin commit time of an entry: its embedded ``committed_ms``, else its ID's time"""
+    committed_ms = stream_field(fields, COMMITTED_FIELD)
+    return int(committed_ms) if committed_ms else stream_id_ms(entry_id)
+
+
+def queue_payload_reads(pipe, entries: List[StreamEntry], lazy_photos: bool = False) -> List[Dict[str, Any]]:
+    """Queue the record and photo reads for every entry; returns unfilled payloads"""
+    payloads = []
+    for stream_id, fields in entries:
+        transaction_id = stream_field(fields, "transaction_id")
+        photo_ref = stream_field(fields, "photo_ref")
+        deferred = bool(lazy_photos and photo_ref)
+        payloads.append({"stream_id": stream_id, "fields": fields, "transaction_id": transaction_id,
+                         "photo_ref": photo_ref, "photo_deferred": deferred})
+        if transaction_id:
+            pipe.get(transaction_key(transaction_id))
+            if deferred:
+                # Only its size, for the stats, in the same round trip
+                pipe.strlen(photo_blob_key(photo_ref))
+            else:
+                pipe.get(photo_blob_key(photo_ref) if photo_ref else f"photo:{transaction_id}")
+    return payloads
+
+
+def fill_payloads(payloads: List[Dict[str, Any]], results, lazy_photos: bool = False) -> List[Dict[str, Any]]:
+    """Store pipeline results on the payloads
+
+    Returns the payloads whose record names a photo blob the stream entry
+    did not; their ``photo_ref`` is set and the blob still has to be read.
+    With ``lazy_photos`` those photos are deferred instead. Photos deferred
+    through the stream's ``photo_ref`` get their blob's ``photo_size``.
+    """
+    results = iter(results)
+    missing = []
+    for payload in payloads:
+        if not payload["transaction_id"]:
+            payload["transaction_json"] = payload["photo_jpeg"] = payload["legacy_photo"] = None
+            continue
+        payload["transaction_json"] = next(results)
+        photo = next(results)
+        if payload["photo_deferred"]:
+            payload["photo_size"], photo = photo, None
+        if payload["photo_ref"]:
+            payload["photo_jpeg"], payload["legacy_photo"] = photo, None
+        else:
+            payload["photo_jpeg"], payload["legacy_photo"] = None, photo
+            recorded_ref = parse_transaction(payload["transaction_json"]).get("photo_ref") \
+                if payload["transaction_json"] else None
+            if recorded_ref:
+                payload["photo_ref"] = recorded_ref
+                if lazy_photos:
+                    payload["photo_deferred"] = True
+                else:
+                    missing.append(payload)
+    return missing
+
+
+def fetch_entry_payloads(source_binary, entries: List[StreamEntry],
+                         lazy_photos: bool = False) -> List[Dict[str, Any]]:
+    """Load the transaction and photo for every entry in one pipeline
+
+    ``source_binary`` must not decode responses. Photos are found through
+    the stream's ``photo_ref`` when present, the legacy ``photo:{id}`` key
+    otherwise; records whose JSON names a photo the stream did not are
+    resolved with a second, usually empty, pipeline.
+    """
+    pipe = source_binary.pipeline(transaction=False)
+    payloads = queue_payload_reads(pipe, entries, lazy_photos)
+    missing = fill_payloads(payloads, pipe.execute(), lazy_photos)
+
+    if missing:
+        pipe = source_binary.pipeline(transaction=False)
+        for payload in missing:
+            pipe.get(photo_blob_key(payload["photo_ref"]))
+        for payload, photo in zip(missing, pipe.execute()):
+            payload["photo_jpeg"], payload["legacy_photo"] = photo, None
+
+    return payloads
+
+
+async def fetch_entry_payloads_async(source_binary, entries: List[StreamEntry],
+                                     lazy_photos: bool = False) -> List[Dict[str, Any]]:
+    """``fetch_entry_payloads`` for ``redis.asyncio`` clients"""
+    pipe = source_binary.pipeline(transaction=False)
+    payloads = queue_payload_reads(pipe, entries, lazy_photos)
+    missing = fill_payloads(payloads, await pipe.execute(), lazy_photos)
+
+    if missing:
+        pipe = source_binary.pipeline(transaction=False)
+        for payload in missing:
+            pipe.get(photo_blob_key(payload["photo_ref"]))
+        for payload, photo in zip(missing, await pipe.execute()):
+            payload["photo_jpeg"], payload["legacy_photo"] = photo, None
+
+    return payloads
+
+
+def compress_payloads(payloads: List[Dict[str, Any]], compression, codec: Optional[str] = None):
+    """Replace records and legacy photos with compressed values, in place
+
+    ``compression`` is a ``payload_codec.CompressionStats`` recording the
+    outcome per data type. Photo blobs are JPEG already and stay as they are.
+    """
+    for payload in payloads:
+        if payload.get("transaction_json"):
+            payload["transaction_json"] = compression.encode("transaction", payload["transaction_json"], codec)
+        if payload.get("legacy_photo"):
+            payload["legacy_photo"] = compression.encode("photo", payload["legacy_photo"], codec)
+    return payloads
+
+
+def queue_apply_payloads(pipe, payloads: List[Dict[str, Any]], stream_field_overrides=None):
+    """Queue writing every fetched entry to the target pipeline"""
+    for payload in payloads:
+        fields = dict(payload["fields"], **(stream_field_overrides or {}))
+        transaction_json = payload.get("transaction_json")
+
+        if not transaction_json:
+            # Stream-only entry (or the record is gone): copy the entry itself
+            queue_stream_entry(pipe, fields)
+            continue
+
+        if isinstance(transaction_json, bytes):
+            transaction_json = transaction_json.decode("utf-8")
+        queue_transaction_commit(pipe, payload["transaction_id"], transaction_json, fields,
+                                 payload.get("photo_jpeg"), payload.get("photo_ref"),
+                                 committed_at_ms=entry_commit_ms(payload["stream_id"], payload["fields"]))
+
+        if payload.get("legacy_photo"):
+            pipe.set(f"photo:{payload['transaction_id']}", payload["legacy_photo"])
+    return pipe
+
+
+def apply_payload_staged(target_redis, payload: Dict[str, Any]) -> List[Tuple[str, str, int, int]]:
+    """Apply one fetched entry stage by stage; returns ``(stage, key, bytes, ns)`` per stage
+
+    The photo, then the record with its index and counters, then the
+    stream entry, each in its own round trip. Every stage is idempotent,
+    so an entry retried after a failed stage still counts once.
+    """
+    stages = []
+    transaction_id = payload["transaction_id"]
+    transaction_json = payload.get("transaction_json")
+    photo_jpeg, legacy_photo = payload.get("photo_jpeg"), payload.get("legacy_photo")
+    committed_ms = entry_commit_ms(payload["stream_id"], payload["fields"])
+
+    if transaction_json and (photo_jpeg or legacy_photo):
+        start_ns = time.perf_counter_ns()
+        pipe = target_redis.pipeline(transaction=False)
+        if photo_jpeg:
+            key = photo_blob_key(queue_add_photo(pipe, photo_jpeg, transaction_id, payload.get("photo_ref")))
+        else:
+            key = f"photo:{transaction_id}"
+            pipe.set(key, legacy_photo)
+        pipe.execute()
+        stages.append(("PHOTO", key, len(photo_jpeg or legacy_photo), time.perf_counter_ns() - start_ns))
+
+    if transaction_json:
+        if isinstance(transaction_json, bytes):
+            transaction_json = transaction_json.decode("utf-8")
+        start_ns = time.perf_counter_ns()
+        pipe = target_redis.pipeline(transaction=True)
+        queue_transaction_commit(pipe, transaction_id, transaction_json, photo_ref=payload.get("photo_ref"),
+                                 committed_at_ms=committed_ms, photo_bytes=len(photo_jpeg) if photo_jpeg else 0)
+        pipe.execute()
+        stages.append(("TRANSACTION", transaction_key(transaction_id), len(transaction_json),
+                       time.perf_counter_ns() - start_ns))
+
+    start_ns = time.perf_counter_ns()
+    queue_stream_entry(target_redis, payload["fields"], committed_ms)
+    stage_bytes = sum(len(str(field)) + len(str(value)) for field, value in payload["fields"].items())
+    stages.append(("STREAM", str(payload["stream_id"]), stage_bytes, time.perf_counter_ns() - start_ns))
+    return stages
+
+
+def replicate_batch(source_binary, target_redis, entries: List[StreamEntry],
+                    lazy_photos: bool = False, compression=None) -> List[Dict[str, Any]]:
+    """Copy a batch of stream entries and their keys: two round trips in total"""
+    payloads = fetch_entry_payloads(source_binary, entries, lazy_photos)
+    if compression is not None:
+        compress_payloads(payloads, compression)
+    queue_apply_payloads(target_redis.pipeline(transaction=False), payloads).execute()
+    return payloads
+
+
+def replicate_transaction(source_binary, target_redis, transaction_id: str, lazy_photos: bool = False) -> bool:
+    """Copy one transaction's stream entry, record and photo, outside any consumer group
+
+    For demos that sync a single transaction on demand. Returns False if
+    the source has no stream entry recorded for the transaction.
+    """
+    entry_id = source_binary.hget(STREAM_ENTRIES, transaction_id)
+    entries = source_binary.xrange(TRANSACTION_STREAM, min=entry_id, max=entry_id) if entry_id else []
+    if not entries:
+        return False
+    replicate_batch(source_binary, target_redis, entries, lazy_photos)
+    return True
+
+
+async def apply_payloads_async(target_redis, payloads: List[Dict[str, Any]]):
+    """Write fetched payloads to one ``redis.asyncio`` target in one round trip"""
+    await queue_apply_payloads(target_redis.pipeline(transaction=False), payloads).execute()
+
+
+class BatchStats:
+    def __init__(self):
+        """Throughput and batch-size distribution for batched replication"""
+        self.lock = threading.Lock()
+        self.entries = 0
+        self.batches = 0
+        self.bytes = 0
+        self.total_time = 0.0
+        self.max_batch = 0
+        self.distribution = {upper: 0 for upper in BATCH_SIZE_BUCKETS + [float("inf")]}
+
+        # Sliding rate window
+        self.window_start = time.perf_counter()
+        self.window_entries = 0
+        self.entries_per_sec = 0.0
+
+    def record(self, batch_size: int, elapsed_ms: float, data_bytes: int = 0):
+        with self.lock:
+            self.entries += batch_size
+            self.batches += 1
+            self.bytes += data_bytes
+            self.total_time += elapsed_ms
+            self.max_batch = max(self.max_batch, batch_size)
+            for upper in self.distribution:
+                if batch_size <= upper:
+                    self.distribution[upper] += 1
+                    break
+            self.window_entries += batch_size
+            self._roll_window()
+
+    def _roll_window(self):
+        elapsed = time.perf_counter() - self.window_start
+        if elapsed >= 1.0:
+            self.entries_per_sec = self.window_entries / elapsed
+            self.window_start = time.perf_counter()
+            self.window_entries = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            self._roll_window()
+            labels, lower = {}, 1
+            for upper, count in self.distribution.items():
+                if upper == float("inf"):
+                    label = f">{BATCH_SIZE_BUCKETS[-1]}"
+                elif upper == lower:
+                    label = str(upper)
+                else:
+                    label = f"{lower}-{upper}"
+                labels[label] = count
+                lower = upper + 1
+            return {
+                "entries": self.entries,
+                "batches": self.batches,
+                "bytes": self.bytes,
+                "entries_per_sec": round(self.entries_per_sec, 1),
+                "avg_batch_size": round(self.entries / self.batches, 1) if self.batches else 0.0,
+                "max_batch_size": self.max_batch,
+                "avg_batch_ms": round(self.total_time / self.batches, 2) if self.batches else 0.0,
+                "batch_size_distribution": labels
+            }
+
+
+def deferred_photos(payloads: List[Dict[str, Any]]) -> int:
+    """Photos left at the origin for on-demand fetching"""
+    return sum(1 for payload in payloads if payload.get("photo_deferred"))
+
+
+def payload_bytes(payloads: List[Dict[str, Any]]) -> int:
+    """Approximate bytes moved for a batch"""
+    total = 0
+    for payload in payloads:
+        for key in ("transaction_json", "photo_jpeg", "legacy_photo"):
+            if payload.get(key):
+                total += len(payload[key])
+    return total
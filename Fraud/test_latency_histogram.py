@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Latency histogram tests - bucket layout, percentile accuracy and merging
+"""
+
+import json
+import random
+
+import pytest
+
+from latency_histogram import (
+    LatencyHistogram, LatencyHistograms, SUB_BUCKETS, SUB_BUCKET_BITS,
+    bucket_bounds, bucket_index, latency_report, merge_snapshots
+)
+
+MAX_RELATIVE_ERROR = 1 / SUB_BUCKETS
+
+
+def histogram_of(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record_ns(value)
+    return histogram
+
+
+def test_small_values_have_exact_buckets():
+    for value in range(2 * SUB_BUCKETS):
+        assert bucket_bounds(bucket_index(value)) == (value, value)
+
+
+def test_bucket_bounds_contain_value_within_relative_error():
+    rng = random.Random(7)
+    values = [rng.randrange(1, 10 ** 12) for _ in range(5000)] + [2 ** n for n in range(40)]
+    for value in values:
+        low, high = bucket_bounds(bucket_index(value))
+        assert low <= value <= high
+        assert low == high or (high - low + 1) / low <= MAX_RELATIVE_ERROR
+
+
+def test_bucket_indexes_are_contiguous_and_ordered():
+    previous_high = -1
+    for index in range(40 * SUB_BUCKETS):
+        low, high = bucket_bounds(index)
+        assert low == previous_high + 1
+        assert bucket_index(low) == index and bucket_index(high) == index
+        previous_high = high
+
+
+def test_negative_values_count_as_zero():
+    histogram = histogram_of([-5])
+    assert histogram.min_ns == 0
+    assert histogram.percentile_ns(50) == 0
+
+
+def test_empty_histogram_reports_zero():
+    histogram = LatencyHistogram()
+    assert histogram.percentile_ns(99) == 0
+    assert histogram.summary()["count"] == 0
+
+
+@pytest.mark.parametrize("percent", [50.0, 90.0, 99.0, 99.9])
+def test_percentiles_within_bucket_error(percent):
+    values = list(range(1_000, 10_001_000, 1_000))  # 1µs .. 10ms in 1µs steps
+    random.Random(3).shuffle(values)
+    histogram = histogram_of(values)
+
+    exact = sorted(values)[int(percent / 100 * len(values)) - 1]
+    assert abs(histogram.percentile_ns(percent) - exact) <= exact * MAX_RELATIVE_ERROR
+
+
+def test_percentiles_never_exceed_observed_extremes():
+    histogram = histogram_of([1_000_003])
+    for percent in (0.1, 50.0, 100.0):
+        assert histogram.percentile_ns(percent) == 1_000_003
+
+
+def test_summary_reports_milliseconds():
+    summary = histogram_of([1_000_000, 3_000_000]).summary()
+    assert summary["count"] == 2
+    assert summary["mean_ms"] == 2.0
+    assert summary["min_ms"] == 1.0 and summary["max_ms"] == 3.0
+
+
+def test_merge_equals_histogram_of_all_samples():
+    rng = random.Random(11)
+    first = [rng.randrange(10 ** 9) for _ in range(1000)]
+    second = [rng.randrange(10 ** 6) for _ in range(500)]
+
+    merged = histogram_of(first).merge(histogram_of(second))
+    combined = histogram_of(first + second)
+
+    assert merged.to_dict() == combined.to_dict()
+    for percent in (50.0, 99.0, 99.9):
+        assert merged.percentile_ns(percent) == combined.percentile_ns(percent)
+
+
+def test_merge_into_empty_keeps_extremes():
+    merged = LatencyHistogram().merge(histogram_of([5_000, 9_000]))
+    assert (merged.min_ns, merged.max_ns, merged.count) == (5_000, 9_000, 2)
+
+
+def test_snapshot_round_trip():
+    histogram = histogram_of([10, 1_000, 123_456_789])
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.to_dict() == histogram.to_dict()
+
+
+def test_snapshot_with_other_layout_is_rejected():
+    data = histogram_of([10]).to_dict()
+    data["sub_bucket_bits"] = SUB_BUCKET_BITS + 1
+    with pytest.raises(ValueError):
+        LatencyHistogram.from_dict(data)
+
+
+def test_merge_snapshots_combines_series_per_direction_and_type():
+    monitor_a, monitor_b = LatencyHistograms(), LatencyHistograms()
+    monitor_a.record_ns("A→B", "TRANSACTION", 1_000_000)
+    monitor_b.record_ns("A→B", "TRANSACTION", 3_000_000)
+    monitor_b.record_ns("B→A", "PHOTO", 2_000_000)
+
+    merged = merge_snapshots([monitor_a.snapshot(), monitor_b.snapshot()])
+    series = {(direction, data_type): histogram for direction, data_type, histogram in merged.items()}
+
+    assert set(series) == {("A→B", "TRANSACTION"), ("B→A", "PHOTO")}
+    assert series[("A→B", "TRANSACTION")].count == 2
+    assert series[("A→B", "TRANSACTION")].max_ns == 3_000_000
+    assert merged.overall().count == 3
+
+
+def test_snapshot_filters_one_direction():
+    histograms = LatencyHistograms()
+    histograms.record_ns("A→B", "STREAM", 1)
+    histograms.record_ns("B→A", "STREAM", 1)
+    assert list(histograms.snapshot("A→B")) == ["A→B"]
+
+
+def test_latency_report_merges_published_hashes():
+    monitor_a, monitor_b = LatencyHistograms(), LatencyHistograms()
+    monitor_a.record_ns("A→B", "STREAM", 2_000_000)
+    monitor_b.record_ns("A→B", "STREAM", 4_000_000)
+    raw_a = {"monitor-1": json.dumps(monitor_a.snapshot())}
+    raw_b = {"monitor-2": json.dumps(monitor_b.snapshot())}
+
+    report = latency_report([raw_a, raw_b, None])
+    assert report["A→B"]["STREAM"]["count"] == 2
+    assert report["A→B"]["STREAM"]["max_ms"] == 4.0
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Payload codec tests - round trips with and without a trained dictionary or zstd
+"""
+
+import base64
+import json
+import zlib
+
+import pytest
+
+import payload_codec
+from payload_codec import (
+    BUILTIN_DICTIONARY_ID, decode_payload, encode_payload, is_encoded, split_header,
+    train_dictionary, use_dictionary
+)
+
+RECORD = json.dumps({
+    "transaction_id": "TXN_STORE_B_77AA88BB", "store_id": "STORE_B", "customer_id": "CUST_042",
+    "transaction_type": "PURCHASE", "product": {"sku": "PHONE_001", "name": "Smartphone", "price": 899.99},
+    "amount": 899.99, "payment_method": "CREDIT_CARD", "timestamp": 1700000123,
+    "datetime": "2024-01-01T12:02:03", "has_photo": False, "photo_ref": None, "status": "COMPLETED"
+})
+
+
+def records(count):
+    return [json.dumps({"transaction_id": f"TXN_STORE_A_{n:08X}", "store_id": "STORE_A",
+                        "customer_id": f"CUST_{n % 50:03d}", "transaction_type": "PURCHASE",
+                        "product": {"sku": "LAPTOP_001", "name": "Gaming Laptop", "price": 2499.99},
+                        "amount": 2499.99, "timestamp": 1700000000 + n, "status": "COMPLETED"})
+            for n in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def builtin_dictionary():
+    """Every test starts and ends with the built-in dictionary active"""
+    active = use_dictionary(None)
+    yield
+    payload_codec._active_dictionary = active
+
+
+def test_zlib_round_trip_with_builtin_dictionary():
+    encoded = encode_payload(RECORD, "zlib")
+    assert encoded.startswith(f"~z{BUILTIN_DICTIONARY_ID}:")
+    assert len(encoded) < len(RECORD)
+    assert decode_payload(encoded) == RECORD
+
+
+def test_encoded_values_are_ascii_and_decode_from_bytes():
+    encoded = encode_payload(RECORD, "zlib")
+    assert encoded.isascii()
+    assert decode_payload(encoded.encode("ascii")) == RECORD
+
+
+def test_bytes_values_round_trip():
+    encoded = encode_payload(RECORD.encode("utf-8"), "zlib")
+    assert decode_payload(encoded) == RECORD
+
+
+def test_values_that_would_not_shrink_are_kept():
+    assert encode_payload("x", "zlib") == "x"
+    assert not is_encoded("x")
+
+
+@pytest.mark.parametrize("value", ["plain text", RECORD, b"\xff\xd8\xff\xe0 jpeg", "~not-a-header"])
+def test_plain_values_pass_through_decode(value):
+    assert decode_payload(value) == value
+
+
+def test_split_header():
+    assert split_header("~z1:abc") == ("z", "1", "abc")
+    assert split_header("~s0badf00d:abc") == ("s", "0badf00d", "abc")
+    assert split_header("~x1:abc") is None
+    assert split_header("~z:abc") is None
+
+
+def test_round_trip_with_trained_dictionary():
+    dictionary_id = use_dictionary(train_dictionary(records(200)))
+    assert dictionary_id != BUILTIN_DICTIONARY_ID
+
+    encoded = encode_payload(RECORD, "zlib")
+    assert split_header(encoded)[1] == dictionary_id
+    assert decode_payload(encoded) == RECORD
+
+
+def test_values_stay_readable_after_switching_dictionary():
+    builtin_encoded = encode_payload(RECORD, "zlib")
+    use_dictionary(train_dictionary(records(50)))
+    trained_encoded = encode_payload(RECORD, "zlib")
+    use_dictionary(None)
+
+    assert decode_payload(builtin_encoded) == RECORD
+    assert decode_payload(trained_encoded) == RECORD
+
+
+def test_unknown_dictionary_is_reported():
+    encoded = encode_payload(RECORD, "zlib")
+    _, _, body = split_header(encoded)
+    with pytest.raises(RuntimeError, match="not loaded"):
+        decode_payload(f"~z00000000:{body}")
+
+
+def test_greedy_dictionary_respects_size(monkeypatch):
+    monkeypatch.setattr(payload_codec, "zstandard", None)
+    samples = records(300)
+    dictionary = train_dictionary(samples, size=1024)
+    assert 0 < len(dictionary) <= 1024
+    # Built from whole sample records
+    assert any(sample.encode("utf-8") in dictionary for sample in samples)
+
+
+def test_greedy_dictionary_beats_no_dictionary(monkeypatch):
+    monkeypatch.setattr(payload_codec, "zstandard", None)
+    use_dictionary(train_dictionary(records(200)))
+    plain_size = len(base64.b85encode(zlib.compress(RECORD.encode("utf-8"), 6)))
+    assert len(split_header(encode_payload(RECORD, "zlib"))[2]) < plain_size
+
+
+def test_training_needs_samples():
+    with pytest.raises(ValueError):
+        train_dictionary([])
+
+
+def test_zstd_round_trip():
+    pytest.importorskip("zstandard")
+    encoded = encode_payload(RECORD, "zstd")
+    assert encoded.startswith(f"~s{BUILTIN_DICTIONARY_ID}:")
+    assert decode_payload(encoded) == RECORD
+
+    use_dictionary(train_dictionary(records(200)))
+    assert decode_payload(encode_payload(RECORD, "zstd")) == RECORD
+
+
+def test_without_zstd_zlib_is_used(monkeypatch):
+    monkeypatch.setattr(payload_codec, "zstandard", None)
+    assert payload_codec.default_codec() == "zlib"
+    assert decode_payload(encode_payload(RECORD)) == RECORD
+    with pytest.raises(RuntimeError):
+        encode_payload(RECORD, "zstd")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Return detector tests - cross-store duplicate flagging and window expiry
+"""
+
+from return_detector import SimultaneousReturnDetector
+
+
+def return_of(transaction_id, store_id, timestamp, original="TXN_STORE_A_ORIG", has_photo=False):
+    return {"type": "RETURN", "transaction_id": transaction_id, "original_transaction_id": original,
+            "store_id": store_id, "customer_id": "CUST_001", "has_photo": has_photo,
+            "timestamp": timestamp, "stream_id": f"{timestamp * 1000}-0"}
+
+
+def test_returns_at_two_stores_are_flagged():
+    detector = SimultaneousReturnDetector(window_seconds=300)
+    assert detector.add(return_of("RET_A", "STORE_A", 1000)) is None
+
+    attempt = detector.add(return_of("RET_B", "STORE_B", 1010))
+    assert attempt["original_transaction_id"] == "TXN_STORE_A_ORIG"
+    assert attempt["legitimate_return"]["transaction_id"] == "RET_A"
+    assert attempt["fraudulent_return"]["transaction_id"] == "RET_B"
+    assert attempt["time_difference"] == 10
+    assert attempt["fraud_indicators"]["different_stores"]
+    assert detector.snapshot() == [attempt]
+
+
+def test_second_return_at_same_store_is_not_flagged():
+    detector = SimultaneousReturnDetector()
+    detector.add(return_of("RET_A1", "STORE_A", 1000))
+    assert detector.add(return_of("RET_A2", "STORE_A", 1001)) is None
+    assert detector.snapshot() == []
+
+
+def test_replicated_copy_of_a_return_is_ignored():
+    detector = SimultaneousReturnDetector()
+    detector.add(return_of("RET_A", "STORE_A", 1000))
+    # The same return read again from the other store's stream
+    assert detector.add(return_of("RET_A", "STORE_A", 1000)) is None
+    assert detector.size() == 1
+
+
+def test_returns_of_different_transactions_are_not_flagged():
+    detector = SimultaneousReturnDetector()
+    detector.add(return_of("RET_A", "STORE_A", 1000, original="TXN_1"))
+    assert detector.add(return_of("RET_B", "STORE_B", 1000, original="TXN_2")) is None
+
+
+def test_purchases_and_unlinked_returns_are_skipped():
+    detector = SimultaneousReturnDetector()
+    purchase = dict(return_of("TXN_X", "STORE_A", 1000), type="PURCHASE")
+    unlinked = return_of("RET_X", "STORE_A", 1000, original=None)
+    assert detector.add(purchase) is None
+    assert detector.add(unlinked) is None
+    assert detector.size() == 0
+
+
+def test_photo_verified_return_is_taken_as_legitimate():
+    detector = SimultaneousReturnDetector()
+    detector.add(return_of("RET_A", "STORE_A", 1000))
+    attempt = detector.add(return_of("RET_B", "STORE_B", 1005, has_photo=True))
+    assert attempt["legitimate_return"]["transaction_id"] == "RET_B"
+    assert attempt["fraud_indicators"]["photo_verification_mismatch"]
+    assert attempt["fraud_indicators"]["no_photo_verification"]
+
+
+def test_returns_outside_the_window_are_not_flagged():
+    detector = SimultaneousReturnDetector(window_seconds=60)
+    detector.add(return_of("RET_A", "STORE_A", 1000))
+    assert detector.add(return_of("RET_B", "STORE_B", 1061)) is None
+    assert detector.snapshot() == []
+
+
+def test_expired_returns_are_forgotten():
+    detector = SimultaneousReturnDetector(window_seconds=60)
+    detector.add(return_of("RET_A", "STORE_A", 1000))
+    detector.add(return_of("RET_B", "STORE_B", 1030))
+    assert len(detector.snapshot()) == 1
+
+    # A later, unrelated return moves the window past both
+    detector.add(return_of("RET_C", "STORE_A", 1100, original="TXN_OTHER"))
+    assert detector.snapshot() == []
+    assert detector.size() == 1
+    assert "TXN_STORE_A_ORIG" not in detector.returns
+
+
+def test_late_arrival_after_window_is_dropped():
+    detector = SimultaneousReturnDetector(window_seconds=60)
+    detector.add(return_of("RET_NEW", "STORE_A", 2000, original="TXN_OTHER"))
+    assert detector.add(return_of("RET_OLD", "STORE_B", 1000)) is None
+    assert detector.size() == 1
+
+
+def test_indexed_return_is_a_copy():
+    detector = SimultaneousReturnDetector()
+    first = return_of("RET_A", "STORE_A", 1000)
+    detector.add(first)
+    first["store_id"] = "STORE_B"
+    attempt = detector.add(return_of("RET_B", "STORE_B", 1001))
+    assert attempt["legitimate_return"]["store_id"] == "STORE_A"
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Snapshot cache tests - ETag versioning, 304 handling and shared rebuilds
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from snapshot_cache import SharedSnapshot, conditional_response, etag_matches
+
+
+def build_counter(values):
+    """Builder returning ``values`` in turn, recording how often it ran"""
+    calls = []
+
+    def build():
+        calls.append(1)
+        return values[min(len(calls), len(values)) - 1]
+
+    return build, calls
+
+
+def test_etag_changes_only_with_content():
+    snapshot = SharedSnapshot()
+    first = snapshot.publish({"transactions": [1], "timestamp": 1})
+    same = snapshot.publish({"transactions": [1], "timestamp": 2})
+    changed = snapshot.publish({"transactions": [1, 2], "timestamp": 3})
+
+    assert same["etag"] == first["etag"] and same["version"] == first["version"]
+    assert changed["etag"] != first["etag"]
+    assert changed["version"] == first["version"] + 1
+
+
+def test_body_is_serialized_value():
+    current = SharedSnapshot().publish({"transactions": [1], "timestamp": 1})
+    assert json.loads(current["body"]) == current["value"]
+
+
+@pytest.mark.parametrize("header,expected", [
+    (None, False),
+    ("", False),
+    ('W/"1-abc"', True),
+    ('"1-abc"', True),
+    ('W/"0-old", W/"1-abc"', True),
+    ('W/"2-def"', False),
+    ("*", True),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, 'W/"1-abc"') is expected
+
+
+def test_conditional_response_serves_304_to_current_clients():
+    current = SharedSnapshot().publish({"transactions": [1]})
+
+    status, body, headers = conditional_response(current, None)
+    assert (status, body) == (200, current["body"])
+    assert headers["ETag"] == current["etag"]
+    assert headers["Cache-Control"] == "no-cache"
+
+    status, body, headers = conditional_response(current, current["etag"])
+    assert (status, body) == (304, b"")
+    assert headers["ETag"] == current["etag"]
+
+
+def test_conditional_response_after_change_serves_body():
+    snapshot = SharedSnapshot()
+    old_etag = snapshot.publish({"transactions": [1]})["etag"]
+    current = snapshot.publish({"transactions": [2]})
+
+    status, body, _ = conditional_response(current, old_etag)
+    assert status == 200 and json.loads(body) == {"transactions": [2]}
+
+
+def test_get_builds_once_per_max_age():
+    snapshot = SharedSnapshot(max_age=60)
+    build, calls = build_counter([{"transactions": [1]}])
+    for _ in range(5):
+        snapshot.get(build)
+    assert len(calls) == 1 and snapshot.builds == 1
+
+
+def test_stale_snapshot_is_rebuilt():
+    snapshot = SharedSnapshot(max_age=0)
+    build, calls = build_counter([{"transactions": [1]}, {"transactions": [2]}])
+    snapshot.get(build)
+    assert snapshot.get(build)["value"] == {"transactions": [2]}
+    assert len(calls) == 2
+
+
+def test_invalidate_forces_rebuild():
+    snapshot = SharedSnapshot(max_age=60)
+    build, calls = build_counter([{"transactions": [1]}, {"transactions": [2]}])
+    snapshot.get(build)
+    snapshot.invalidate()
+    assert snapshot.get(build)["value"] == {"transactions": [2]}
+    assert len(calls) == 2
+
+
+def test_build_started_before_invalidate_is_not_fresh():
+    snapshot = SharedSnapshot(max_age=60)
+    generation = snapshot.generation
+    snapshot.invalidate()
+    snapshot.publish({"transactions": [1]}, generation)
+    assert not snapshot.fresh()
+
+
+def test_get_async_shares_one_build():
+    snapshot = SharedSnapshot(max_age=60)
+    calls = []
+
+    async def build():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"transactions": [1]}
+
+    async def poll_concurrently():
+        return await asyncio.gather(*(snapshot.get_async(build) for _ in range(10)))
+
+    results = asyncio.run(poll_concurrently())
+    assert len(calls) == 1
+    assert len({result["etag"] for result in results}) == 1
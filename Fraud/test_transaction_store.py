@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Transaction store tests - page cursors and skipping entries across equal scores
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("redis")
+
+from transaction_store import (
+    fetch_transaction_page, is_valid_page_cursor, make_page_cursor, parse_page_cursor,
+    skip_seen_entries
+)
+
+
+class SortedSetPage:
+    """Just enough of a Redis client to page over an in-memory time index"""
+
+    def __init__(self, index):
+        self.index = index  # member → score
+        self.queued = []
+
+    def pipeline(self, transaction=False):
+        self.queued = []
+        return self
+
+    def zrevrangebyscore(self, key, max_score, min_score, start=0, num=None, withscores=False):
+        ceiling = float(max_score)
+        # Redis orders equal scores by member, descending in a reverse range
+        entries = sorted(((member, score) for member, score in self.index.items() if score <= ceiling),
+                         key=lambda entry: (entry[1], entry[0]), reverse=True)
+        entries = entries[start:start + num]
+        self.queued.append(entries)
+        return entries
+
+    def zcard(self, key):
+        self.queued.append(len(self.index))
+
+    def zcount(self, key, min_score, max_score):
+        self.queued.append(sum(1 for score in self.index.values() if float(min_score) <= score <= float(max_score)))
+
+    def execute(self):
+        return self.queued
+
+    def mget(self, keys):
+        return [json.dumps({"transaction_id": key.split(":", 1)[1]}) for key in keys]
+
+
+def page_ids(page):
+    return [transaction["transaction_id"] for transaction in page["transactions"]]
+
+
+def test_cursor_round_trip():
+    cursor = make_page_cursor("TXN_STORE_A_1A2B", 1700000000.0)
+    assert cursor == "1700000000:TXN_STORE_A_1A2B"
+    assert parse_page_cursor(cursor) == ("1700000000", "TXN_STORE_A_1A2B")
+
+
+def test_cursor_keeps_colons_in_transaction_id():
+    assert parse_page_cursor(make_page_cursor("TXN:1", 5)) == ("5", "TXN:1")
+
+
+def test_missing_cursor_starts_at_newest():
+    assert parse_page_cursor(None) == ("+inf", None)
+    assert parse_page_cursor("") == ("+inf", None)
+
+
+@pytest.mark.parametrize("cursor", [None, "", "1700000000:TXN_1", "1700000000.5:TXN_1", "-3:TXN_1"])
+def test_valid_cursors(cursor):
+    assert is_valid_page_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", ["abc", "abc:TXN_1", "1700000000", "1700000000:", ":TXN_1",
+                                    "inf:TXN_1", "nan:TXN_1"])
+def test_malformed_cursors(cursor):
+    assert not is_valid_page_cursor(cursor)
+
+
+def test_skip_seen_entries_drops_only_returned_ties():
+    entries = [("TXN_C", 100.0), ("TXN_B", 100.0), ("TXN_A", 100.0), ("TXN_Z", 99.0)]
+    assert skip_seen_entries(entries, "100", "TXN_B") == [("TXN_A", 100.0), ("TXN_Z", 99.0)]
+
+
+def test_skip_seen_entries_without_cursor_keeps_everything():
+    entries = [("TXN_A", 100.0)]
+    assert skip_seen_entries(entries, "+inf", None) == entries
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 5])
+def test_paging_visits_every_entry_once_across_equal_scores(limit):
+    index = {f"TXN_{n:02d}": float(100 + n // 4) for n in range(14)}  # runs of four equal scores
+    client = SortedSetPage(index)
+
+    seen, cursor = [], None
+    while True:
+        page = fetch_transaction_page(client, cursor=cursor, limit=limit)
+        seen.extend(page_ids(page))
+        assert page["total"] == len(index)
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert is_valid_page_cursor(cursor)
+
+    expected = sorted(index, key=lambda member: (index[member], member), reverse=True)
+    assert seen == expected
+
+
+def test_transactions_are_hydrated_from_their_keys():
+    client = SortedSetPage({"TXN_A": 100.0})
+    page = fetch_transaction_page(client, limit=10)
+    assert page_ids(page) == ["TXN_A"]
+    assert page["transactions"][0]["indexed_at"] == 100
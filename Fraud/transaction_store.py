@@ -0,0 +1,647 @@
+#!/usr/bin/env python3
+"""
+Transaction Store - shared write path for the POS front ends
+
+Every write that belongs to one transaction (the transaction record, a
+reference on its content-addressed photo, the transaction_stream entry and
+the time index) is queued onto a single MULTI/EXEC pipeline, so committing
+a sale to a store costs one network round trip instead of one per key.
+
+Transactions are indexed at write time in a per-store sorted set scored by
+commit time in milliseconds, so dashboards can page through the newest
+transactions without scanning the keyspace.
+
+The same commit bumps per-store counters (purchases, returns, fraud
+attempts, photo bytes) so status pages read one hash instead of counting
+keys. Counting is tied to the index entry being new, so committing the same
+transaction twice to a store does not count it twice.
+
+Legitimate purchases are also indexed per customer, newest first, so
+finding a customer's prior purchases (return validation, the fraud demos)
+is a sorted set range instead of a keyspace scan.
+
+Records written by a replicator may be stored compressed (see
+``payload_codec``); ``parse_transaction`` reads either form.
+
+Stream entries carry the store the write originated at. Replicated copies
+keep it, so a replicator can tell a store's own writes from entries it
+received from the other store. Each store appends at most one entry per
+transaction, so applying a transaction again never duplicates its entry.
+"""
+
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import redis
+
+from photo_store import (
+    queue_add_photo, queue_release_photo, photo_blob_key, PHOTO_REFS, PHOTO_HOLDERS, PHOTO_STATS
+)
+from photo_thumbnails import queue_store_thumbnail
+from payload_codec import decode_payload
+
+TRANSACTION_STREAM = "transaction_stream"
+TRANSACTION_INDEX = "transactions:by_time"
+STORE_COUNTERS = "store_counters"
+CUSTOMER_PURCHASES_PREFIX = "customer_purchases:"
+CUSTOMERS_BY_LAST_PURCHASE = "customers:by_last_purchase"
+STREAM_ENTRIES = "stream_entries"
+
+# Purchases kept per customer; older ones drop out of the index, not the store
+CUSTOMER_PURCHASES_LIMIT = 100
+
+# Returned to clients that send a page cursor not built by make_page_cursor
+INVALID_CURSOR_MESSAGE = "Invalid cursor: expected <score>:<transaction_id>"
+
+# Stream fields identifying where a write came from
+ORIGIN_FIELD = "origin"
+COMMITTED_FIELD = "committed_ms"
+
+COUNTER_FIELDS = ["transactions", "purchases", "returns", "fraud_attempts", "photo_bytes"]
+
+# KEYS: stream, entries hash  ARGV: transaction id, field, value, ...
+APPEND_ONCE_SCRIPT = """
+local existing = redis.call('HGET', KEYS[2], ARGV[1])
+if existing then
+    return existing
+end
+local entry_id = redis.call('XADD', KEYS[1], '*', unpack(ARGV, 2))
+redis.call('HSET', KEYS[2], ARGV[1], entry_id)
+return entry_id
+"""
+
+# KEYS: index, counters  ARGV: transaction id, score, field, increment, ...
+INDEX_AND_COUNT_SCRIPT = """
+if redis.call('ZADD', KEYS[1], 'NX', ARGV[2], ARGV[1]) == 0 then
+    return 0
+end
+for i = 3, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+# KEYS: index, counters, photo blob (optional)  ARGV: transaction id, field, decrement, ...
+UNINDEX_AND_COUNT_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[2], ARGV[i], ARGV[i + 1])
+end
+if KEYS[3] then
+    redis.call('HINCRBY', KEYS[2], 'photo_bytes', -redis.call('STRLEN', KEYS[3]))
+end
+return 1
+"""
+
+
+def transaction_key(transaction_id: str) -> str:
+    """Key holding the JSON transaction record"""
+    return f"transaction:{transaction_id}"
+
+
+def customer_purchases_key(customer_id: str) -> str:
+    """Sorted set of a customer's purchase IDs scored by commit time (ms)"""
+    return f"{CUSTOMER_PURCHASES_PREFIX}{customer_id}"
+
+
+def queue_customer_purchase(pipe, customer_id: str, transaction_id: str, score: int):
+    """Queue indexing a legitimate purchase under its customer"""
+    key = customer_purchases_key(customer_id)
+    pipe.zadd(key, {transaction_id: score})
+    pipe.zremrangebyrank(key, 0, -(CUSTOMER_PURCHASES_LIMIT + 1))
+    pipe.zadd(CUSTOMERS_BY_LAST_PURCHASE, {customer_id: score}, gt=True)
+    return pipe
+
+
+def stream_field(fields: Dict, name: str, default=None):
+    """Read a field from a decoded or raw (bytes) stream entry"""
+    value = fields.get(name, fields.get(name.encode(), default))
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def tag_origin(stream_fields: Dict, origin: Optional[str] = None,
+               committed_ms: Optional[int] = None) -> Dict:
+    """Stamp stream fields with the originating store
+
+    Entries that already carry an origin (replicated copies) are returned
+    unchanged. The origin defaults to the entry's ``store_id``.
+    ``committed_ms`` embeds the commit time at the origin, which replicated
+    copies keep while their own stream IDs are assigned by each target; a
+    commit time already in the fields wins.
+    """
+    if stream_field(stream_fields, ORIGIN_FIELD):
+        return stream_fields
+    origin = origin or stream_field(stream_fields, "store_id")
+    if not origin:
+        return stream_fields
+
+    tags = {ORIGIN_FIELD: origin}
+    if committed_ms is not None and not stream_field(stream_fields, COMMITTED_FIELD):
+        tags[COMMITTED_FIELD] = str(int(committed_ms))
+    if any(isinstance(field, bytes) for field in stream_fields):
+        tags = {field.encode(): value.encode() for field, value in tags.items()}
+    tagged = dict(stream_fields)
+    tagged.update(tags)
+    return tagged
+
+
+def entry_origin(fields: Dict) -> Optional[str]:
+    """Store an entry was first written at; untagged entries fall back to ``store_id``"""
+    return stream_field(fields, ORIGIN_FIELD) or stream_field(fields, "store_id")
+
+
+def should_replicate(fields: Dict, target_store: str) -> bool:
+    """False for entries that originated at the target (they would ping-pong)"""
+    return entry_origin(fields) != target_store
+
+
+def parse_transaction(value) -> Dict[str, Any]:
+    """Parse a stored transaction record, compressed by replication or plain"""
+    return json.loads(decode_payload(value))
+
+
+def transaction_counters(transaction: Dict[str, Any], photo_bytes: int = 0) -> Dict[str, int]:
+    """Counter increments for one transaction record
+
+    Understands the record formats written by the different POS scripts.
+    """
+    transaction_type = str(transaction.get("transaction_type") or transaction.get("type") or "").upper()
+    fraud_flags = (transaction.get("is_fraudulent"), transaction.get("fraud_attempt"))
+
+    counters = {"transactions": 1}
+    if transaction_type == "PURCHASE":
+        counters["purchases"] = 1
+    elif transaction_type == "RETURN":
+        counters["returns"] = 1
+    if any(flag is True or str(flag).lower() == "true" for flag in fraud_flags):
+        counters["fraud_attempts"] = 1
+    if photo_bytes:
+        counters["photo_bytes"] = photo_bytes
+    return counters
+
+
+def is_legitimate_purchase(counters: Dict[str, int]) -> bool:
+    """Whether a transaction's counters mark it as a non-fraudulent purchase"""
+    return "purchases" in counters and "fraud_attempts" not in counters
+
+
+def queue_stream_entry(pipe, stream_fields: Dict[str, Any], committed_at_ms: Optional[float] = None):
+    """Queue appending a transaction's entry to the stream, tagged with its origin
+
+    A transaction gets one entry per store: ``stream_entries`` maps it to
+    its entry ID, and re-applying it (redeliveries, retried fan-outs, a
+    POS dual write met by replication) appends nothing.
+    """
+    fields = tag_origin(stream_fields, committed_ms=committed_at_ms)
+    transaction_id = stream_field(fields, "transaction_id")
+    if not transaction_id:
+        pipe.xadd(TRANSACTION_STREAM, fields)
+        return pipe
+    pipe.eval(APPEND_ONCE_SCRIPT, 2, TRANSACTION_STREAM, STREAM_ENTRIES,
+              transaction_id, *[item for pair in fields.items() for item in pair])
+    return pipe
+
+
+def queue_transaction_commit(pipe, transaction_id: str, transaction_json: str,
+                             stream_fields: Optional[Dict[str, Any]] = None,
+                             photo_jpeg: Optional[bytes] = None,
+                             photo_ref: Optional[str] = None,
+                             committed_at_ms: Optional[float] = None,
+                             thumbnail=None, photo_bytes: Optional[int] = None):
+    """Queue all writes for one transaction onto an open pipeline
+
+    ``photo_ref`` should be the digest already recorded in the transaction
+    JSON; it is computed from ``photo_jpeg`` when omitted. ``thumbnail``,
+    from ``photo_thumbnails.make_thumbnail``, is cached with the photo. Works with both
+    ``redis.Redis`` and ``redis.asyncio`` pipelines because queuing a command
+    is synchronous for either; only ``execute()`` differs. ``photo_bytes``
+    is the photo size to count when the photo was added separately.
+    """
+    if committed_at_ms is None:
+        committed_at_ms = time.time() * 1000
+
+    pipe.set(transaction_key(transaction_id), transaction_json)
+
+    if photo_jpeg:
+        digest = queue_add_photo(pipe, photo_jpeg, transaction_id, photo_ref)
+        queue_store_thumbnail(pipe, digest, thumbnail)
+
+    if stream_fields:
+        queue_stream_entry(pipe, stream_fields, committed_at_ms)
+
+    if photo_bytes is None:
+        photo_bytes = len(photo_jpeg) if photo_jpeg else 0
+    transaction = parse_transaction(transaction_json)
+    counters = transaction_counters(transaction, photo_bytes)
+    counter_args = [value for item in counters.items() for value in item]
+    pipe.eval(INDEX_AND_COUNT_SCRIPT, 2, TRANSACTION_INDEX, STORE_COUNTERS,
+              transaction_id, int(committed_at_ms), *counter_args)
+
+    if is_legitimate_purchase(counters) and transaction.get("customer_id"):
+        queue_customer_purchase(pipe, transaction["customer_id"], transaction_id, int(committed_at_ms))
+
+    return pipe
+
+
+def commit_transaction(redis_client, transaction_id: str, transaction_json: str,
+                       stream_fields: Optional[Dict[str, Any]] = None,
+                       photo_jpeg: Optional[bytes] = None,
+                       photo_ref: Optional[str] = None, thumbnail=None) -> float:
+    """Atomically commit a transaction to one store and return the time in ms"""
+    start_time = time.perf_counter()
+
+    pipe = redis_client.pipeline(transaction=True)
+    queue_transaction_commit(pipe, transaction_id, transaction_json, stream_fields,
+                             photo_jpeg, photo_ref, thumbnail=thumbnail)
+    pipe.execute()
+
+    return (time.perf_counter() - start_time) * 1000
+
+
+async def commit_transaction_async(redis_client, transaction_id: str, transaction_json: str,
+                                   stream_fields: Optional[Dict[str, Any]] = None,
+                                   photo_jpeg: Optional[bytes] = None,
+                                   photo_ref: Optional[str] = None, thumbnail=None) -> float:
+    """``commit_transaction`` for ``redis.asyncio`` clients"""
+    start_time = time.perf_counter()
+
+    pipe = redis_client.pipeline(transaction=True)
+    queue_transaction_commit(pipe, transaction_id, transaction_json, stream_fields,
+                             photo_jpeg, photo_ref, thumbnail=thumbnail)
+    await pipe.execute()
+
+    return (time.perf_counter() - start_time) * 1000
+
+
+def delete_transaction(redis_client, transaction_id: str) -> bool:
+    """Delete a transaction, its index entry, its counts and its reference on the photo"""
+    transaction_data = redis_client.get(transaction_key(transaction_id))
+    if not transaction_data:
+        return False
+
+    transaction = parse_transaction(transaction_data)
+    photo_ref = transaction.get("photo_ref")
+
+    counters = transaction_counters(transaction)
+    counter_args = [value for field, count in counters.items() for value in (field, -count)]
+    keys = [TRANSACTION_INDEX, STORE_COUNTERS] + ([photo_blob_key(photo_ref)] if photo_ref else [])
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(transaction_key(transaction_id))
+    pipe.hdel(STREAM_ENTRIES, transaction_id)
+    # Counted photo bytes are read from the blob before the reference is released
+    pipe.eval(UNINDEX_AND_COUNT_SCRIPT, len(keys), *keys, transaction_id, *counter_args)
+    if transaction.get("customer_id"):
+        pipe.zrem(customer_purchases_key(transaction["customer_id"]), transaction_id)
+    if photo_ref:
+        queue_release_photo(pipe, photo_ref, transaction_id)
+    pipe.execute()
+
+    return True
+
+
+def parse_page_cursor(cursor: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Split a ``<score>:<transaction_id>`` cursor into a max score and last seen ID"""
+    if not cursor:
+        return "+inf", None
+
+    score, _, last_id = cursor.partition(":")
+    return score, last_id or None
+
+
+def is_valid_page_cursor(cursor: Optional[str]) -> bool:
+    """Whether a client-supplied cursor is empty or of the ``<score>:<transaction_id>`` form"""
+    if not cursor:
+        return True
+
+    score, sep, last_id = cursor.partition(":")
+    if not sep or not last_id:
+        return False
+    try:
+        return math.isfinite(float(score))
+    except ValueError:
+        return False
+
+
+def make_page_cursor(transaction_id: str, score: float) -> str:
+    """Build the cursor that resumes paging after the given index entry"""
+    return f"{int(score)}:{transaction_id}"
+
+
+def skip_seen_entries(entries: List[Tuple[str, float]], max_score: str,
+                      last_id: Optional[str]) -> List[Tuple[str, float]]:
+    """Drop index entries at the cursor score that were already returned
+
+    Entries with equal scores come back from ZREVRANGEBYSCORE in descending
+    member order, so everything at the cursor score with a member at or
+    above the last returned ID belongs to an earlier page.
+    """
+    if last_id is None:
+        return entries
+
+    cursor_score = float(max_score)
+    return [(member, score) for member, score in entries
+            if not (score == cursor_score and member >= last_id)]
+
+
+def queue_page_range(pipe, max_score: str, last_id: Optional[str], limit: int):
+    """Queue the index range, total and cursor tie count for one page"""
+    # Over-fetch by one to know whether another page exists, plus the cursor entry itself
+    pipe.zrevrangebyscore(TRANSACTION_INDEX, max_score, "-inf",
+                          start=0, num=limit + 1 + (1 if last_id else 0), withscores=True)
+    pipe.zcard(TRANSACTION_INDEX)
+    if last_id:
+        pipe.zcount(TRANSACTION_INDEX, max_score, max_score)
+    return pipe
+
+
+def build_page(page: List[Tuple[str, float]], hydrated: List[Optional[str]],
+               has_more: bool, total: int) -> Dict[str, Any]:
+    """Assemble a page response from index entries and their MGET results"""
+    transactions = []
+    for (transaction_id, score), transaction_data in zip(page, hydrated):
+        if not transaction_data:
+            continue
+
+        transaction = parse_transaction(transaction_data)
+        transaction["has_photo"] = bool(transaction.get("photo_ref")) or transaction.get("has_photo", False)
+        transaction["indexed_at"] = int(score)
+        transactions.append(transaction)
+
+    next_cursor = make_page_cursor(*page[-1]) if page and has_more else None
+    return {"transactions": transactions, "next_cursor": next_cursor, "total": total}
+
+
+def fetch_transaction_page(redis_client, cursor: Optional[str] = None,
+                           limit: int = 10) -> Dict[str, Any]:
+    """Fetch one page of transactions, newest first, from the time index
+
+    Costs two round trips regardless of store size: one for the index range
+    and total, one MGET to hydrate the page. Photos are never fetched,
+    only flagged.
+    """
+    max_score, last_id = parse_page_cursor(cursor)
+
+    results = queue_page_range(redis_client.pipeline(transaction=False),
+                               max_score, last_id, limit).execute()
+
+    entries, total = results[0], results[1]
+    if last_id and results[2] > 1:
+        # Many entries share the cursor score; re-read wide enough to skip them all
+        entries = redis_client.zrevrangebyscore(
+            TRANSACTION_INDEX, max_score, "-inf",
+            start=0, num=limit + 1 + results[2], withscores=True
+        )
+
+    entries = skip_seen_entries(entries, max_score, last_id)
+    page, has_more = entries[:limit], len(entries) > limit
+
+    hydrated = redis_client.mget([transaction_key(transaction_id) for transaction_id, _ in page]) if page else []
+    return build_page(page, hydrated, has_more, total)
+
+
+async def fetch_transaction_page_async(redis_client, cursor: Optional[str] = None,
+                                       limit: int = 10) -> Dict[str, Any]:
+    """``fetch_transaction_page`` for ``redis.asyncio`` clients"""
+    max_score, last_id = parse_page_cursor(cursor)
+
+    results = await queue_page_range(redis_client.pipeline(transaction=False),
+                                     max_score, last_id, limit).execute()
+
+    entries, total = results[0], results[1]
+    if last_id and results[2] > 1:
+        entries = await redis_client.zrevrangebyscore(
+            TRANSACTION_INDEX, max_score, "-inf",
+            start=0, num=limit + 1 + results[2], withscores=True
+        )
+
+    entries = skip_seen_entries(entries, max_score, last_id)
+    page, has_more = entries[:limit], len(entries) > limit
+
+    hydrated = await redis_client.mget([transaction_key(transaction_id) for transaction_id, _ in page]) if page else []
+    return build_page(page, hydrated, has_more, total)
+
+
+def get_customer_purchases(redis_client, customer_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """A customer's most recent legitimate purchases, newest first"""
+    transaction_ids = redis_client.zrevrange(customer_purchases_key(customer_id), 0, limit - 1)
+    if not transaction_ids:
+        return []
+
+    values = redis_client.mget([transaction_key(transaction_id) for transaction_id in transaction_ids])
+    return [parse_transaction(value) for value in values if value]
+
+
+def get_recent_customers(redis_client, limit: int = 10, offset: int = 0) -> List[str]:
+    """Customers with the most recent purchases, newest first, skipping the first ``offset``"""
+    customers = redis_client.zrevrange(CUSTOMERS_BY_LAST_PURCHASE, offset, offset + limit - 1)
+    return [customer.decode() if isinstance(customer, bytes) else customer for customer in customers]
+
+
+def parse_store_counters(raw: Dict[Any, Any]) -> Dict[str, int]:
+    """Counters from an HGETALL of ``store_counters``, missing fields as 0"""
+    counters = {field: 0 for field in COUNTER_FIELDS}
+    for field, value in raw.items():
+        counters[field.decode() if isinstance(field, bytes) else field] = int(value)
+    return counters
+
+
+def get_store_counters(redis_client) -> Dict[str, int]:
+    """Read a store's counters in one round trip"""
+    return parse_store_counters(redis_client.hgetall(STORE_COUNTERS))
+
+
+def transaction_timestamp_ms(transaction: Dict[str, Any]) -> Optional[int]:
+    """Best-effort commit time for records written before the index existed"""
+    value = transaction.get("timestamp") or transaction.get("datetime")
+
+    if isinstance(value, (int, float)):
+        return int(value * 1000)
+
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).timestamp() * 1000)
+        except ValueError:
+            return None
+
+    return None
+
+
+def index_existing_transactions(redis_client, batch_size: int = 500) -> int:
+    """Backfill the time index from a SCAN of transaction:* keys
+
+    Only needed once per store for data written by older POS scripts.
+    Existing index entries are left untouched; the per-customer purchase
+    index is backfilled at the same time.
+    """
+    indexed = 0
+    keys = []
+
+    def flush(batch):
+        values = redis_client.mget(batch)
+        pipe = redis_client.pipeline(transaction=False)
+        count = 0
+        for key, value in zip(batch, values):
+            if not value:
+                continue
+            try:
+                transaction = parse_transaction(value)
+            except ValueError:
+                continue
+            key = key.decode() if isinstance(key, bytes) else key
+            transaction_id = transaction.get("transaction_id") or key.split(":", 1)[1]
+            score = transaction_timestamp_ms(transaction) or int(time.time() * 1000)
+            pipe.zadd(TRANSACTION_INDEX, {transaction_id: score}, nx=True)
+            if is_legitimate_purchase(transaction_counters(transaction)) and transaction.get("customer_id"):
+                queue_customer_purchase(pipe, transaction["customer_id"], transaction_id, score)
+            count += 1
+        pipe.execute()
+        return count
+
+    for key in redis_client.scan_iter(match="transaction:*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            indexed += flush(keys)
+            keys = []
+
+    if keys:
+        indexed += flush(keys)
+
+    return indexed
+
+
+def rebuild_store_counters(redis_client, batch_size: int = 500) -> Dict[str, int]:
+    """Recount a store's counters from a SCAN of transaction:* keys
+
+    Use after data was written by older POS scripts or copied by the
+    replication monitors, which bypass the commit path. Legacy base64
+    photos are counted at their decoded size.
+    """
+    totals = {field: 0 for field in COUNTER_FIELDS}
+    keys = []
+
+    def flush(batch):
+        transactions = [parse_transaction(value) for value in redis_client.mget(batch) if value]
+
+        pipe = redis_client.pipeline(transaction=False)
+        for transaction in transactions:
+            if transaction.get("photo_ref"):
+                pipe.strlen(photo_blob_key(transaction["photo_ref"]))
+            else:
+                pipe.strlen(f"photo:{transaction.get('transaction_id')}")
+        sizes = pipe.execute()
+
+        for transaction, size in zip(transactions, sizes):
+            photo_bytes = size if transaction.get("photo_ref") else size * 3 // 4
+            for field, count in transaction_counters(transaction, photo_bytes).items():
+                totals[field] += count
+
+    for key in redis_client.scan_iter(match="transaction:*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            flush(keys)
+            keys = []
+
+    if keys:
+        flush(keys)
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(STORE_COUNTERS)
+    pipe.hset(STORE_COUNTERS, mapping=totals)
+    pipe.execute()
+
+    return totals
+
+
+def rebuild_photo_refs(redis_client, batch_size: int = 500) -> Dict[str, int]:
+    """Recount photo references from a SCAN of transaction:* keys
+
+    Each record whose ``photo_ref`` blob is present holds one reference.
+    Use after records and blobs were copied without taking references,
+    e.g. by store_bootstrap into a store that kept its own history. Remote
+    fetch statistics are kept.
+    """
+    holders = {}
+    keys = []
+
+    def flush(batch):
+        for value in redis_client.mget(batch):
+            transaction = parse_transaction(value) if value else {}
+            if transaction.get("photo_ref") and transaction.get("transaction_id"):
+                holders[transaction["transaction_id"]] = transaction["photo_ref"]
+
+    for key in redis_client.scan_iter(match="transaction:*", count=batch_size):
+        keys.append(key)
+        if len(keys) >= batch_size:
+            flush(keys)
+            keys = []
+
+    if keys:
+        flush(keys)
+
+    refs = {}
+    for digest in holders.values():
+        refs[digest] = refs.get(digest, 0) + 1
+
+    pipe = redis_client.pipeline(transaction=False)
+    for digest in refs:
+        pipe.strlen(photo_blob_key(digest))
+    sizes = dict(zip(refs, pipe.execute()))
+
+    # Records whose blob is missing hold nothing to release
+    holders = {transaction_id: digest for transaction_id, digest in holders.items() if sizes[digest]}
+    refs = {digest: count for digest, count in refs.items() if sizes[digest]}
+    totals = {
+        "blobs": len(refs),
+        "references": sum(refs.values()),
+        "stored_bytes": sum(sizes[digest] for digest in refs),
+        "logical_bytes": sum(sizes[digest] * count for digest, count in refs.items()),
+        "base64_bytes": sum(4 * -(-sizes[digest] // 3) * count for digest, count in refs.items())
+    }
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(PHOTO_REFS, PHOTO_HOLDERS)
+    if refs:
+        pipe.hset(PHOTO_REFS, mapping=refs)
+        pipe.hset(PHOTO_HOLDERS, mapping=holders)
+    pipe.hset(PHOTO_STATS, mapping=totals)
+    pipe.execute()
+
+    return totals
+
+
+def main():
+    """Maintenance commands for a store's transaction keys"""
+    parser = argparse.ArgumentParser(description="Transaction store maintenance")
+    parser.add_argument("command", choices=["reindex", "reconcile", "photo-refs"],
+                        help="reindex: backfill the time and customer indexes; reconcile: recount store counters; "
+                             "photo-refs: recount photo references")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, action="append",
+                        help="Store port (repeatable, default 6379 and 6380)")
+    args = parser.parse_args()
+
+    for port in args.port or [6379, 6380]:
+        client = redis.Redis(host=args.host, port=port, decode_responses=True)
+        try:
+            if args.command == "reindex":
+                count = index_existing_transactions(client)
+                print(f"✅ Indexed {count} transactions on {args.host}:{port}")
+            elif args.command == "reconcile":
+                counters = rebuild_store_counters(client)
+                print(f"✅ Reconciled counters on {args.host}:{port}: {counters}")
+            elif args.command == "photo-refs":
+                totals = rebuild_photo_refs(client)
+                print(f"✅ Recounted photo references on {args.host}:{port}: {totals}")
+        except redis.ConnectionError as e:
+            print(f"❌ Failed to connect to {args.host}:{port}: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,8 @@ from datetime import datetime
 from PIL import Image, ImageTk
 import os
 
+from face_tracker import FaceTracker
+
 class UnifiedPOS:
     def __init__(self):
         self.root = tk.Tk()
@@ -37,6 +39,7 @@ class UnifiedPOS:
         # Camera
         self.camera = None
         self.camera_active = False
+        self.face_tracker = None
         self.captured_photo = None
         self.photo_base64 = None
         
@@ -283,14 +286,10 @@ class UnifiedPOS:
     def detect_faces(self, frame):
         """Detect faces in the frame and draw rectangles"""
         try:
-            # Load face cascade
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-
-            # Convert to grayscale for detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-            # Detect faces
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            # Cascade is loaded once; detection runs every few frames, tracking in between
+            if self.face_tracker is None:
+                self.face_tracker = FaceTracker()
+            faces = self.face_tracker.update(frame)
 
             # Draw rectangles around faces
             for (x, y, w, h) in faces:
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Unified Web POS - asyncio serving mode
+
+Serves the same routes and JSON responses as ``unified_pos_web.py`` from a
+single ASGI process. Checkouts and dashboard reads use ``redis.asyncio``
+connection pools, and a checkout commits to the source and target stores
+concurrently, so one process can serve many terminals without a worker
+thread parked on every Redis round trip.
+
+Camera access and the fraud simulations are blocking OpenCV/demo code and
+run in the threadpool against the shared ``pos_system``.
+
+Run with:
+    python unified_pos_asgi.py
+or
+    uvicorn unified_pos_asgi:app --host 0.0.0.0 --port 5001
+"""
+
+import asyncio
+import os
+
+import redis.asyncio as aioredis
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from transaction_store import (
+    commit_transaction_async, fetch_transaction_page_async, parse_store_counters, is_valid_page_cursor,
+    INVALID_CURSOR_MESSAGE, STORE_COUNTERS
+)
+from frame_broadcaster import MJPEG_BOUNDARY
+from capture_session import save_capture, take_capture, restore_capture, normalize_terminal_id
+from unified_pos_web import (
+    pos_system, fraud_simulation_result, photo_fraud_simulation_result,
+    photo_stats_result, normalize_dashboard_transaction, dashboard_data_body,
+    test_page, queue_store_status, replication_status_body, replication_latency_body
+)
+from snapshot_cache import SharedSnapshot, conditional_response
+from latency_histogram import REPLICATION_LATENCY, REPLICATION_LAG, wall_clock_ms
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+
+# Upper bound on pooled connections per store
+MAX_CONNECTIONS = 200
+
+
+def create_store_client(port: int, decode_responses: bool = True):
+    """Async client backed by a bounded connection pool"""
+    pool = aioredis.ConnectionPool(host='localhost', port=port, decode_responses=decode_responses,
+                                   max_connections=MAX_CONNECTIONS)
+    return aioredis.Redis(connection_pool=pool)
+
+
+def get_page_limit(request: Request):
+    """Read the requested page size, clamped to a sane range"""
+    try:
+        return max(1, min(int(request.query_params.get('limit', 10)), 100))
+    except ValueError:
+        return 10
+
+
+def get_terminal_id(request: Request):
+    """Terminal the request came from, sent by the POS page as a header"""
+    return normalize_terminal_id(request.headers.get('X-Terminal-ID'))
+
+
+def create_app(pos=pos_system) -> FastAPI:
+    """Build the ASGI app around a POS instance"""
+    app = FastAPI(title="Unified Web POS")
+    stores = {}
+    # Newest-page dashboard snapshots by page size, shared by every polling dashboard
+    dashboard_snapshots = {}
+
+    def store_clients(store_id):
+        """Return the (source, target) async clients for a store"""
+        if store_id == "STORE_A":
+            return stores["STORE_A"], stores["STORE_B"]
+        return stores["STORE_B"], stores["STORE_A"]
+
+    async def get_store_page(store_id, cursor=None, limit=10):
+        """Fetch one page of a store's transactions from its time index"""
+        page = await fetch_transaction_page_async(stores[store_id], cursor=cursor, limit=limit)
+        page["transactions"] = [normalize_dashboard_transaction(txn, store_id) for txn in page["transactions"]]
+        return page
+
+    @app.on_event("startup")
+    async def connect_stores():
+        stores["STORE_A"] = create_store_client(6379)
+        stores["STORE_B"] = create_store_client(6380)
+        # Capture sessions hold raw JPEG bytes in the local store
+        stores["sessions"] = create_store_client(6379, decode_responses=False)
+
+    @app.on_event("shutdown")
+    async def close_stores():
+        for client in stores.values():
+            await client.connection_pool.disconnect()
+
+    @app.get('/')
+    async def index():
+        """Main POS interface"""
+        return FileResponse(os.path.join(TEMPLATE_DIR, 'unified_pos.html'))
+
+    @app.get('/dashboard')
+    async def simple_dashboard():
+        """Simple dashboard for viewing transactions"""
+        return FileResponse(os.path.join(TEMPLATE_DIR, 'simple_dashboard.html'))
+
+    @app.get('/test', response_class=HTMLResponse)
+    async def test_system():
+        """Test endpoint to verify system is working"""
+        try:
+            raw_a, raw_b = await asyncio.gather(
+                stores["STORE_A"].hgetall(STORE_COUNTERS), stores["STORE_B"].hgetall(STORE_COUNTERS)
+            )
+            return test_page(parse_store_counters(raw_a), parse_store_counters(raw_b))
+        except Exception as e:
+            return f"❌ Error: {e}"
+
+    @app.get('/api/products')
+    async def get_products():
+        """Get products list"""
+        return pos.products
+
+    @app.post('/api/start_camera')
+    async def start_camera():
+        """Start camera"""
+        try:
+            if await run_in_threadpool(pos.start_camera):
+                return {"success": True, "message": "Camera started"}
+            else:
+                return {"success": False, "message": "Camera not available"}
+        except Exception as e:
+            return {"success": False, "message": f"Camera error: {e}"}
+
+    @app.post('/api/stop_camera')
+    async def stop_camera():
+        """Stop camera"""
+        await run_in_threadpool(pos.stop_camera)
+        return {"success": True, "message": "Camera stopped"}
+
+    @app.get('/video_feed')
+    async def video_feed():
+        """Video streaming route"""
+        if pos.camera_active:
+            # Starlette iterates sync generators in the threadpool
+            return StreamingResponse(pos.generate_camera_frames(),
+                                     media_type=f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}')
+        else:
+            return HTMLResponse("Camera not active", status_code=404)
+
+    @app.get('/api/camera_stats')
+    async def camera_stats():
+        """Live preview frame rate, encode time and viewer count"""
+        return {"success": True, "camera": pos.get_camera_stats()}
+
+    @app.post('/api/capture_photo')
+    async def capture_photo(request: Request):
+        """Capture photo from camera into this terminal's capture session"""
+        photo_jpeg = await run_in_threadpool(pos.capture_photo_from_camera)
+        if photo_jpeg:
+            await save_capture(stores["sessions"], get_terminal_id(request), photo_jpeg)
+            return {
+                "success": True,
+                "message": "Photo captured successfully",
+                "photo_data": pos.capture_preview(photo_jpeg)
+            }
+        else:
+            return {"success": False, "message": "Failed to capture photo"}
+
+    @app.post('/api/process_transaction')
+    async def process_transaction(request: Request):
+        """Process a transaction, committing to both stores concurrently"""
+        terminal_id = get_terminal_id(request)
+        photo_jpeg, committing = None, False
+        try:
+            # Taken, not read: a concurrent checkout from this terminal cannot reuse it
+            photo_jpeg = await take_capture(stores["sessions"], terminal_id)
+
+            # Encoding the thumbnail is CPU-bound; keep it off the event loop
+            error, checkout = await run_in_threadpool(pos.prepare_checkout, await request.json(), photo_jpeg)
+            if error:
+                if photo_jpeg:
+                    await restore_capture(stores["sessions"], terminal_id, photo_jpeg)
+                return {"success": False, "message": error}
+
+            source_redis, target_redis = store_clients(checkout["store_id"])
+            committing = True
+
+            # Local commit and replication each stay a single MULTI/EXEC, issued together
+            local_commit_time, replication_time = await asyncio.gather(
+                commit_transaction_async(
+                    source_redis, checkout["transaction_id"], checkout["transaction_json"],
+                    checkout["stream_fields"], checkout["photo_jpeg"], checkout["photo_ref"], checkout["thumbnail"]
+                ),
+                commit_transaction_async(
+                    target_redis, checkout["transaction_id"], checkout["transaction_json"],
+                    checkout["replica_stream_fields"], checkout["photo_jpeg"], checkout["photo_ref"], checkout["thumbnail"]
+                )
+            )
+            visible_ms = wall_clock_ms()
+
+            return pos.checkout_response(checkout, local_commit_time, replication_time, visible_ms)
+
+        except Exception as e:
+            # Once the commits are issued the photo may already belong to the transaction
+            if photo_jpeg and not committing:
+                await restore_capture(stores["sessions"], terminal_id, photo_jpeg)
+            return {"success": False, "message": f"Transaction failed: {e}"}
+
+    @app.post('/api/simulate_fraud')
+    async def simulate_fraud():
+        """Simulate a fraudulent transaction with photo analysis"""
+        return await run_in_threadpool(fraud_simulation_result)
+
+    @app.post('/api/simulate_photo_fraud')
+    async def simulate_photo_fraud():
+        """Simulate fraud with different photo (hash mismatch)"""
+        return await run_in_threadpool(photo_fraud_simulation_result)
+
+    @app.get('/api/photo_stats')
+    async def photo_stats():
+        """Photo storage savings from content-addressed dedup, per store"""
+        return await run_in_threadpool(photo_stats_result)
+
+    @app.get('/api/replication_status')
+    async def get_replication_status():
+        """Get current replication status between stores"""
+        try:
+            status_a, status_b = await asyncio.gather(
+                queue_store_status(stores["STORE_A"].pipeline(transaction=False)).execute(),
+                queue_store_status(stores["STORE_B"].pipeline(transaction=False)).execute()
+            )
+            return replication_status_body(status_a, status_b)
+        except Exception as e:
+            return {"success": False, "message": f"Error getting replication status: {e}"}
+
+    @app.get('/api/replication_latency')
+    async def get_replication_latency():
+        """Replication latency percentiles per direction and data type, across all monitors"""
+        try:
+            raw_a, raw_b, lag_a, lag_b = await asyncio.gather(
+                stores["STORE_A"].hgetall(REPLICATION_LATENCY), stores["STORE_B"].hgetall(REPLICATION_LATENCY),
+                stores["STORE_A"].hgetall(REPLICATION_LAG), stores["STORE_B"].hgetall(REPLICATION_LAG)
+            )
+            return replication_latency_body(raw_a, raw_b, lag_a, lag_b)
+        except Exception as e:
+            return {"success": False, "message": f"Error getting replication latency: {e}"}
+
+    @app.get('/api/dashboard_data')
+    async def get_dashboard_data(request: Request):
+        """Get the newest page of transactions for each store"""
+        cursor_a, cursor_b = request.query_params.get('cursor_a'), request.query_params.get('cursor_b')
+        if not (is_valid_page_cursor(cursor_a) and is_valid_page_cursor(cursor_b)):
+            return JSONResponse({"success": False, "message": INVALID_CURSOR_MESSAGE}, status_code=400)
+
+        try:
+            limit = get_page_limit(request)
+
+            async def build():
+                page_a, page_b = await asyncio.gather(get_store_page("STORE_A", cursor_a, limit),
+                                                      get_store_page("STORE_B", cursor_b, limit))
+                return dashboard_data_body(page_a, page_b)
+
+            if cursor_a or cursor_b:
+                return await build()
+
+            # The newest pages are what every dashboard polls: build them once per interval
+            snapshot = await dashboard_snapshots.setdefault(limit, SharedSnapshot()).get_async(build)
+            status, body, headers = conditional_response(snapshot, request.headers.get('If-None-Match'))
+            return Response(body, status_code=status, headers=headers, media_type='application/json')
+
+        except Exception as e:
+            return {"success": False, "message": f"Error getting dashboard data: {e}"}
+
+    @app.get('/api/transactions/{store_id}')
+    async def get_transactions_page(store_id: str, request: Request):
+        """Cursor-paginated transaction listing for one store, newest first"""
+        if store_id not in ("STORE_A", "STORE_B"):
+            return JSONResponse({"success": False, "message": "Unknown store"}, status_code=404)
+
+        cursor = request.query_params.get('cursor')
+        if not is_valid_page_cursor(cursor):
+            return JSONResponse({"success": False, "message": INVALID_CURSOR_MESSAGE}, status_code=400)
+
+        try:
+            page = await get_store_page(store_id, cursor, get_page_limit(request))
+            return {"success": True, "store_id": store_id, **page}
+
+        except Exception as e:
+            return {"success": False, "message": f"Error getting transactions: {e}"}
+
+    return app
+
+
+app = create_app()
+
+if __name__ == "__main__":
+    import uvicorn
+
+    print("🚀 Starting Unified Web POS System (asyncio mode)...")
+    print("📱 Access at: http://localhost:5001")
+    print("⚡ Source and target store commits issued concurrently")
+    print("🔄 Real-time replication monitoring enabled")
+    uvicorn.run(app, host='0.0.0.0', port=5001)
@@ -21,19 +21,38 @@ import threading
 from datetime import datetime
 import os
 
+from transaction_store import (
+    commit_transaction, queue_transaction_commit, fetch_transaction_page,
+    get_store_counters, parse_store_counters, get_recent_customers, get_customer_purchases,
+    is_valid_page_cursor, INVALID_CURSOR_MESSAGE, STORE_COUNTERS, TRANSACTION_STREAM, COMMITTED_FIELD
+)
+from photo_store import photo_digest, get_photo_stats, binary_client
+from photo_thumbnails import make_thumbnail
+from face_tracker import FaceTracker
+from frame_broadcaster import FrameBroadcaster, MJPEG_BOUNDARY
+from capture_session import save_capture, take_capture, restore_capture, normalize_terminal_id
+from latency_histogram import latency_report, lag_report, wall_clock_ms, REPLICATION_LATENCY, REPLICATION_LAG
+from snapshot_cache import SharedSnapshot, conditional_response
+
 app = Flask(__name__)
 
+# Newest-page dashboard snapshots by page size, shared by every polling dashboard
+dashboard_snapshots = {}
+
 class UnifiedWebPOS:
     def __init__(self):
         # Redis connections
         self.redis_store_a = redis.Redis(host='localhost', port=6379, decode_responses=True)
         self.redis_store_b = redis.Redis(host='localhost', port=6380, decode_responses=True)
+
+        # Pending captures live in the local store, keyed by terminal, so any worker can use them
+        self.redis_sessions = binary_client(self.redis_store_a)
         
         # Camera
         self.camera = None
         self.camera_active = False
-        self.captured_photo = None
-        self.photo_base64 = None
+        self.broadcaster = None
+        self.face_tracker = None
         
         # Products catalog
         self.products = {
@@ -60,17 +79,137 @@ class UnifiedWebPOS:
             print(f"❌ Redis connection error: {e}")
             return False
     
+    def store_clients(self, store_id):
+        """Return the (source, target) Redis clients for a store"""
+        if store_id == "STORE_A":
+            return self.redis_store_a, self.redis_store_b
+        return self.redis_store_b, self.redis_store_a
+
+    def prepare_checkout(self, data, photo_jpeg):
+        """Validate a checkout request and build everything needed to commit it
+
+        Returns ``(error_message, None)`` or ``(None, checkout)``. Shared by the
+        Flask and asyncio serving modes so both write identical records.
+        """
+        customer_id = data.get('customer_id', '').strip()
+        product_sku = data.get('product_sku', '')
+        store_id = data.get('store_id', 'STORE_A')
+        transaction_type = data.get('transaction_type', 'PURCHASE')
+
+        if not customer_id or not product_sku:
+            return "Missing customer ID or product", None
+
+        if product_sku not in self.products:
+            return "Invalid product selected", None
+
+        # Create transaction
+        transaction_id = f"TXN_{store_id}_{uuid.uuid4().hex[:8].upper()}"
+        product = self.products[product_sku]
+
+        # Content hash doubles as the photo reference and the fraud-detection hash
+        photo_ref = photo_digest(photo_jpeg) if photo_jpeg else None
+        photo_hash = photo_ref[:16] if photo_ref else None
+
+        # Create detailed timestamp
+        now = datetime.now()
+        timestamp_iso = now.isoformat()
+        timestamp_readable = now.strftime("%Y-%m-%d %H:%M:%S")
+
+        transaction_data = {
+            "transaction_id": transaction_id,
+            "store_id": store_id,
+            "customer_id": customer_id,
+            "product_sku": product_sku,
+            "product_name": product["name"],
+            "price": product["price"],
+            "transaction_type": transaction_type,
+            "timestamp": timestamp_iso,
+            "timestamp_readable": timestamp_readable,
+            "has_photo": bool(photo_jpeg),
+            "photo_hash": photo_hash,
+            "photo_ref": photo_ref,
+            "is_fraudulent": False,
+            "processed_at": timestamp_readable
+        }
+
+        # Both copies carry the commit time, so lag is measured from it
+        committed_ms = wall_clock_ms()
+
+        # Serialize once for both stores
+        serialize_start = time.perf_counter()
+        transaction_json = json.dumps(transaction_data)
+        stream_fields = {
+            "transaction_id": transaction_id,
+            "store_id": store_id,
+            "customer_id": customer_id,
+            "amount": product["price"],
+            "type": transaction_type,
+            "has_photo": "true" if photo_jpeg else "false",
+            COMMITTED_FIELD: str(committed_ms)
+        }
+        if photo_ref:
+            stream_fields["photo_ref"] = photo_ref
+        serialize_time = (time.perf_counter() - serialize_start) * 1000
+
+        return None, {
+            "transaction_id": transaction_id,
+            "store_id": store_id,
+            "customer_id": customer_id,
+            "product": product,
+            "photo_jpeg": photo_jpeg,
+            "photo_ref": photo_ref,
+            # Encoded once here, cached on both stores with the photo
+            "thumbnail": make_thumbnail(photo_jpeg) if photo_jpeg else None,
+            "photo_hash": photo_hash,
+            "transaction_json": transaction_json,
+            "stream_fields": stream_fields,
+            "replica_stream_fields": dict(stream_fields, replicated="true"),
+            "committed_ms": committed_ms,
+            "serialize_ms": serialize_time
+        }
+
+    def checkout_response(self, checkout, local_commit_time, replication_time, visible_ms=None):
+        """JSON body returned for a committed checkout
+
+        ``replication_time`` is how long the target commit took;
+        ``visible_ms`` is when it returned, from which the end-to-end lag
+        since the checkout's commit time is reported.
+        """
+        store_id = checkout["store_id"]
+        replication_lag = max(0, (visible_ms or wall_clock_ms()) - checkout["committed_ms"])
+        photo_jpeg = checkout["photo_jpeg"]
+        photo_base64 = base64.b64encode(photo_jpeg).decode('utf-8') if photo_jpeg else None
+        return {
+            "success": True,
+            "message": "Transaction processed and replicated successfully",
+            "transaction_id": checkout["transaction_id"],
+            "details": {
+                "customer": checkout["customer_id"],
+                "product": checkout["product"]["name"],
+                "amount": checkout["product"]["price"],
+                "photo_verified": bool(photo_base64),
+                "photo_hash": checkout["photo_hash"],
+                "photo_data": photo_base64,
+                "replication_time_ms": round(replication_time, 2),
+                "replication_lag_ms": replication_lag,
+                "latency_ms": {
+                    "serialize": round(checkout["serialize_ms"], 3),
+                    "local_commit": round(local_commit_time, 2),
+                    "remote_commit": round(replication_time, 2),
+                    "end_to_end": replication_lag
+                },
+                "source_store": store_id,
+                "target_store": "STORE_B" if store_id == "STORE_A" else "STORE_A"
+            }
+        }
+
     def detect_faces(self, frame):
         """Detect faces in the frame and draw rectangles"""
         try:
-            # Load face cascade
-            face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            
-            # Convert to grayscale for detection
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            
-            # Detect faces
-            faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+            # Cascade is loaded once; detection runs every few frames, tracking in between
+            if self.face_tracker is None:
+                self.face_tracker = FaceTracker()
+            faces = self.face_tracker.update(frame)
             
             # Draw rectangles around faces
             for (x, y, w, h) in faces:
@@ -90,45 +229,73 @@ class UnifiedWebPOS:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
             return frame, 0
     
+    def start_camera(self):
+        """Open the camera and start broadcasting annotated frames"""
+        if self.camera_active:
+            return True
+
+        self.camera = cv2.VideoCapture(0)
+        if not self.camera.isOpened():
+            return False
+
+        self.camera_active = True
+        if self.face_tracker:
+            self.face_tracker.reset()
+        self.broadcaster = FrameBroadcaster(self.camera, annotate=self.detect_faces)
+        self.broadcaster.start()
+        return True
+
+    def stop_camera(self):
+        """Stop broadcasting and release the camera"""
+        self.camera_active = False
+        if self.broadcaster:
+            self.broadcaster.stop()
+            self.broadcaster = None
+        if self.camera:
+            self.camera.release()
+            self.camera = None
+
     def generate_camera_frames(self):
-        """Generate camera frames for streaming"""
-        while self.camera_active and self.camera and self.camera.isOpened():
-            ret, frame = self.camera.read()
-            if ret:
-                # Resize frame
-                frame = cv2.resize(frame, (640, 480))
-                
-                # Add face detection
-                frame_with_faces, face_count = self.detect_faces(frame)
-                
-                # Encode frame
-                _, buffer = cv2.imencode('.jpg', frame_with_faces)
-                frame_bytes = buffer.tobytes()
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            else:
-                break
+        """Generate camera frames for streaming, shared by all viewers"""
+        broadcaster = self.broadcaster
+        if broadcaster:
+            yield from broadcaster.mjpeg_stream()
+
+    def get_camera_stats(self):
+        """Frame rate and encode cost of the live preview"""
+        stats = self.broadcaster.get_stats() if self.broadcaster else \
+            {"running": False, "clients": 0, "frames_captured": 0, "fps": 0.0}
+        if self.face_tracker:
+            stats["face_tracking"] = self.face_tracker.get_stats()
+        return stats
     
     def capture_photo_from_camera(self):
-        """Capture a photo from the camera"""
+        """Capture a photo from the camera and return it as JPEG bytes"""
         if self.camera and self.camera.isOpened():
-            ret, frame = self.camera.read()
+            # The broadcaster owns camera reads while the preview runs
+            if self.broadcaster and self.broadcaster.running:
+                frame = self.broadcaster.latest_raw_frame()
+                ret = frame is not None
+            else:
+                ret, frame = self.camera.read()
             if ret:
                 # Resize for storage
-                self.captured_photo = cv2.resize(frame, (320, 240))
+                captured_photo = cv2.resize(frame, (320, 240))
 
-                # Convert to base64
-                _, buffer = cv2.imencode('.jpg', self.captured_photo)
-                self.photo_base64 = base64.b64encode(buffer).decode('utf-8')
+                # Keep raw JPEG bytes for storage, base64 only for the browser
+                _, buffer = cv2.imencode('.jpg', captured_photo)
 
                 # Save photo file for reference
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
                 filename = f"customer_photo_{timestamp}.jpg"
-                cv2.imwrite(filename, self.captured_photo)
+                cv2.imwrite(filename, captured_photo)
+
+                return buffer.tobytes()
+        return None
 
-                return True
-        return False
+    def capture_preview(self, photo_jpeg):
+        """Truncated base64 preview returned to the browser after a capture"""
+        return base64.b64encode(photo_jpeg[:75]).decode('utf-8') + "..."
 
     def generate_fake_fraud_photo(self):
         """Generate a fake photo for fraud simulation"""
@@ -144,9 +311,8 @@ class UnifiedWebPOS:
             cv2.putText(fake_image, "FAKE PHOTO", (60, 180),
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
-            # Convert to base64
             _, buffer = cv2.imencode('.jpg', fake_image)
-            return base64.b64encode(buffer).decode('utf-8')
+            return buffer.tobytes()
 
         except Exception as e:
             print(f"Error generating fake photo: {e}")
@@ -166,9 +332,8 @@ class UnifiedWebPOS:
             cv2.putText(fake_image, "WRONG PERSON", (30, 180),
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
 
-            # Convert to base64
             _, buffer = cv2.imencode('.jpg', fake_image)
-            return base64.b64encode(buffer).decode('utf-8')
+            return buffer.tobytes()
 
         except Exception as e:
             print(f"Error generating different fraud photo: {e}")
@@ -187,27 +352,25 @@ def simple_dashboard():
     """Simple dashboard for viewing transactions"""
     return render_template('simple_dashboard.html')
 
-@app.route('/test')
-def test_system():
-    """Test endpoint to verify system is working"""
-    try:
-        # Test Redis connection
-        store_a_ping = pos_system.redis_store_a.ping()
-        store_b_ping = pos_system.redis_store_b.ping()
-
-        # Count transactions
-        store_a_count = len(list(pos_system.redis_store_a.scan_iter(match="transaction:*")))
-        store_b_count = len(list(pos_system.redis_store_b.scan_iter(match="transaction:*")))
-
-        return f"""
+def test_page(counters_a, counters_b):
+    """System test page from each store's counters"""
+    return f"""
         <h1>System Test Results</h1>
-        <p>✅ Store A Redis: {'Connected' if store_a_ping else 'Failed'}</p>
-        <p>✅ Store B Redis: {'Connected' if store_b_ping else 'Failed'}</p>
-        <p>📊 Store A Transactions: {store_a_count}</p>
-        <p>📊 Store B Transactions: {store_b_count}</p>
+        <p>✅ Store A Redis: Connected</p>
+        <p>✅ Store B Redis: Connected</p>
+        <p>📊 Store A Transactions: {counters_a['transactions']}</p>
+        <p>📊 Store B Transactions: {counters_b['transactions']}</p>
         <p>🎯 System Status: All Good!</p>
         <a href="/">← Back to POS</a>
         """
+
+@app.route('/test')
+def test_system():
+    """Test endpoint to verify system is working"""
+    try:
+        # Reading each store's counters also proves the connection
+        return test_page(get_store_counters(pos_system.redis_store_a),
+                         get_store_counters(pos_system.redis_store_b))
     except Exception as e:
         return f"❌ Error: {e}"
 
@@ -220,9 +383,7 @@ def get_products():
 def start_camera():
     """Start camera"""
     try:
-        pos_system.camera = cv2.VideoCapture(0)
-        if pos_system.camera.isOpened():
-            pos_system.camera_active = True
+        if pos_system.start_camera():
             return jsonify({"success": True, "message": "Camera started"})
         else:
             return jsonify({"success": False, "message": "Camera not available"})
@@ -232,10 +393,7 @@ def start_camera():
 @app.route('/api/stop_camera', methods=['POST'])
 def stop_camera():
     """Stop camera"""
-    pos_system.camera_active = False
-    if pos_system.camera:
-        pos_system.camera.release()
-        pos_system.camera = None
+    pos_system.stop_camera()
     return jsonify({"success": True, "message": "Camera stopped"})
 
 @app.route('/video_feed')
@@ -243,18 +401,29 @@ def video_feed():
     """Video streaming route"""
     if pos_system.camera_active:
         return Response(pos_system.generate_camera_frames(),
-                       mimetype='multipart/x-mixed-replace; boundary=frame')
+                       mimetype=f'multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}')
     else:
         return "Camera not active", 404
 
+@app.route('/api/camera_stats')
+def camera_stats():
+    """Live preview frame rate, encode time and viewer count"""
+    return jsonify({"success": True, "camera": pos_system.get_camera_stats()})
+
+def get_terminal_id():
+    """Terminal the request came from, sent by the POS page as a header"""
+    return normalize_terminal_id(request.headers.get('X-Terminal-ID'))
+
 @app.route('/api/capture_photo', methods=['POST'])
 def capture_photo():
-    """Capture photo from camera"""
-    if pos_system.capture_photo_from_camera():
+    """Capture photo from camera into this terminal's capture session"""
+    photo_jpeg = pos_system.capture_photo_from_camera()
+    if photo_jpeg:
+        save_capture(pos_system.redis_sessions, get_terminal_id(), photo_jpeg)
         return jsonify({
             "success": True,
             "message": "Photo captured successfully",
-            "photo_data": pos_system.photo_base64[:100] + "..." if pos_system.photo_base64 else None
+            "photo_data": pos_system.capture_preview(photo_jpeg)
         })
     else:
         return jsonify({"success": False, "message": "Failed to capture photo"})
@@ -262,122 +431,64 @@ def capture_photo():
 @app.route('/api/process_transaction', methods=['POST'])
 def process_transaction():
     """Process a transaction with replication monitoring"""
+    terminal_id = get_terminal_id()
+    photo_jpeg, committed = None, False
     try:
-        data = request.json
+        # Taken, not read: a concurrent checkout from this terminal cannot reuse it
+        photo_jpeg = take_capture(pos_system.redis_sessions, terminal_id)
 
-        # Validate inputs
-        customer_id = data.get('customer_id', '').strip()
-        product_sku = data.get('product_sku', '')
-        store_id = data.get('store_id', 'STORE_A')
-        transaction_type = data.get('transaction_type', 'PURCHASE')
+        error, checkout = pos_system.prepare_checkout(request.json, photo_jpeg)
+        if error:
+            if photo_jpeg:
+                restore_capture(pos_system.redis_sessions, terminal_id, photo_jpeg)
+            return jsonify({"success": False, "message": error})
 
-        if not customer_id or not product_sku:
-            return jsonify({"success": False, "message": "Missing customer ID or product"})
+        source_redis, target_redis = pos_system.store_clients(checkout["store_id"])
 
-        if product_sku not in pos_system.products:
-            return jsonify({"success": False, "message": "Invalid product selected"})
+        # Commit transaction, photo and stream entry to the source store in one round trip
+        local_commit_time = commit_transaction(
+            source_redis, checkout["transaction_id"], checkout["transaction_json"],
+            checkout["stream_fields"], checkout["photo_jpeg"], checkout["photo_ref"], checkout["thumbnail"]
+        )
+        committed = True
 
-        # Create transaction
-        transaction_id = f"TXN_{store_id}_{uuid.uuid4().hex[:8].upper()}"
-        product = pos_system.products[product_sku]
+        # Replicate to other store, again as a single MULTI/EXEC
+        replication_time = commit_transaction(
+            target_redis, checkout["transaction_id"], checkout["transaction_json"],
+            checkout["replica_stream_fields"], checkout["photo_jpeg"], checkout["photo_ref"], checkout["thumbnail"]
+        )
+        visible_ms = wall_clock_ms()
 
-        # Generate photo hash for fraud detection
-        photo_hash = None
-        if pos_system.photo_base64:
-            import hashlib
-            photo_hash = hashlib.md5(pos_system.photo_base64.encode()).hexdigest()[:16]
-
-        # Create detailed timestamp
-        now = datetime.now()
-        timestamp_iso = now.isoformat()
-        timestamp_readable = now.strftime("%Y-%m-%d %H:%M:%S")
-
-        transaction_data = {
-            "transaction_id": transaction_id,
-            "store_id": store_id,
-            "customer_id": customer_id,
-            "product_sku": product_sku,
-            "product_name": product["name"],
-            "price": product["price"],
-            "transaction_type": transaction_type,
-            "timestamp": timestamp_iso,
-            "timestamp_readable": timestamp_readable,
-            "has_photo": bool(pos_system.photo_base64),
-            "photo_hash": photo_hash,
-            "is_fraudulent": False,
-            "processed_at": timestamp_readable
-        }
-
-        # Get Redis clients
-        source_redis = pos_system.redis_store_a if store_id == "STORE_A" else pos_system.redis_store_b
-        target_redis = pos_system.redis_store_b if store_id == "STORE_A" else pos_system.redis_store_a
-
-        # Store in source store
-        source_redis.set(f"transaction:{transaction_id}", json.dumps(transaction_data))
-
-        # Store photo if available
-        photo_data_for_response = None
-        if pos_system.photo_base64:
-            source_redis.set(f"photo:{transaction_id}", pos_system.photo_base64)
-            photo_data_for_response = pos_system.photo_base64
-
-        # Add to transaction stream
-        source_redis.xadd("transaction_stream", {
-            "transaction_id": transaction_id,
-            "store_id": store_id,
-            "customer_id": customer_id,
-            "amount": product["price"],
-            "type": transaction_type,
-            "has_photo": "true" if pos_system.photo_base64 else "false"
-        })
-
-        # Simulate replication with timing
-        import time
-        replication_start = time.perf_counter()
-
-        # Replicate to other store
-        target_redis.set(f"transaction:{transaction_id}", json.dumps(transaction_data))
-        if pos_system.photo_base64:
-            target_redis.set(f"photo:{transaction_id}", pos_system.photo_base64)
-
-        target_redis.xadd("transaction_stream", {
-            "transaction_id": transaction_id,
-            "store_id": store_id,
-            "customer_id": customer_id,
-            "amount": product["price"],
-            "type": transaction_type,
-            "has_photo": "true" if pos_system.photo_base64 else "false",
-            "replicated": "true"
-        })
-
-        replication_time = (time.perf_counter() - replication_start) * 1000  # Convert to ms
-
-        # Clear captured photo before response
-        pos_system.photo_base64 = None
-        pos_system.captured_photo = None
-
-        return jsonify({
-            "success": True,
-            "message": "Transaction processed and replicated successfully",
-            "transaction_id": transaction_id,
-            "details": {
-                "customer": customer_id,
-                "product": product["name"],
-                "amount": product["price"],
-                "photo_verified": bool(photo_data_for_response),
-                "photo_hash": photo_hash,
-                "photo_data": photo_data_for_response,
-                "replication_time_ms": round(replication_time, 2),
-                "source_store": store_id,
-                "target_store": "STORE_B" if store_id == "STORE_A" else "STORE_A"
-            }
-        })
+        return jsonify(pos_system.checkout_response(checkout, local_commit_time, replication_time, visible_ms))
 
     except Exception as e:
+        # The photo belongs to the transaction once committed locally
+        if photo_jpeg and not committed:
+            restore_capture(pos_system.redis_sessions, terminal_id, photo_jpeg)
         return jsonify({"success": False, "message": f"Transaction failed: {e}"})
 
-@app.route('/api/simulate_fraud', methods=['POST'])
-def simulate_fraud():
+def find_legitimate_purchases(predicate, limit=10, customers=10):
+    """Recent legitimate Store A purchases matching ``predicate``, newest customers first
+
+    Walks the per-customer purchase index instead of scanning the keyspace,
+    ``customers`` customers at a time, until ``limit`` purchases match or
+    every customer has been checked.
+    """
+    matches = []
+    offset = 0
+    while True:
+        page = get_recent_customers(pos_system.redis_store_a, customers, offset)
+        for customer_id in page:
+            for txn in get_customer_purchases(pos_system.redis_store_a, customer_id):
+                if txn.get('store_id') == "STORE_A" and predicate(txn):
+                    matches.append(txn)
+                    if len(matches) >= limit:
+                        return matches
+        if len(page) < customers:
+            return matches
+        offset += customers
+
+def fraud_simulation_result():
     """Simulate a fraudulent transaction with photo analysis"""
     try:
         transaction_id = f"TXN_FRAUD_{uuid.uuid4().hex[:8].upper()}"
@@ -386,22 +497,14 @@ def simulate_fraud():
 
         # Generate fake photo for fraud attempt (different from legitimate customer)
         fake_photo_data = pos_system.generate_fake_fraud_photo()
-        fake_photo_hash = None
-
-        if fake_photo_data:
-            import hashlib
-            fake_photo_hash = hashlib.md5(fake_photo_data.encode()).hexdigest()[:16]
+        fake_photo_ref = photo_digest(fake_photo_data) if fake_photo_data else None
+        fake_photo_hash = fake_photo_ref[:16] if fake_photo_ref else None
 
         # Check for existing legitimate transactions to compare against
         legitimate_transactions = []
         try:
-            # Look for recent legitimate transactions
-            for key in pos_system.redis_store_a.scan_iter(match="transaction:TXN_STORE_A_*"):
-                txn_data = pos_system.redis_store_a.get(key)
-                if txn_data:
-                    txn = json.loads(txn_data)
-                    if not txn.get('is_fraudulent', False) and txn.get('has_photo', False):
-                        legitimate_transactions.append(txn)
+            legitimate_transactions = find_legitimate_purchases(
+                lambda txn: txn.get('has_photo', False))
         except:
             pass
 
@@ -416,17 +519,11 @@ def simulate_fraud():
             "timestamp": datetime.now().isoformat(),
             "has_photo": bool(fake_photo_data),
             "photo_hash": fake_photo_hash,
+            "photo_ref": fake_photo_ref,
             "is_fraudulent": True,
             "fraud_indicators": ["suspicious_customer", "high_value_return", "photo_hash_mismatch"]
         }
 
-        # Store fraudulent transaction
-        pos_system.redis_store_b.set(f"transaction:{transaction_id}", json.dumps(transaction_data))
-
-        # Store fake photo if generated
-        if fake_photo_data:
-            pos_system.redis_store_b.set(f"photo:{transaction_id}", fake_photo_data)
-
         # Create fraud alert with detailed analysis
         fraud_score = 85
         risk_indicators = ["High-value return", "Known fraudster"]
@@ -454,10 +551,9 @@ def simulate_fraud():
             }
         }
 
-        pos_system.redis_store_b.set(f"fraud_alert:{transaction_id}", json.dumps(fraud_alert))
-
-        # Add to transaction stream
-        pos_system.redis_store_b.xadd("transaction_stream", {
+        # Store fraudulent transaction, fake photo, alert and stream entry in one MULTI/EXEC
+        pipe = pos_system.redis_store_b.pipeline(transaction=True)
+        queue_transaction_commit(pipe, transaction_id, json.dumps(transaction_data), {
             "transaction_id": transaction_id,
             "store_id": "STORE_B",
             "customer_id": "FRAUDSTER_001",
@@ -466,9 +562,11 @@ def simulate_fraud():
             "has_photo": "true" if fake_photo_data else "false",
             "fraud_detected": "true",
             "fraud_score": str(fraud_score)
-        })
+        }, fake_photo_data, fake_photo_ref)
+        pipe.set(f"fraud_alert:{transaction_id}", json.dumps(fraud_alert))
+        pipe.execute()
 
-        return jsonify({
+        return {
             "success": True,
             "message": "Fraud attempt detected and blocked",
             "fraud_details": {
@@ -478,16 +576,20 @@ def simulate_fraud():
                 "action": "TRANSACTION_BLOCKED",
                 "indicators": risk_indicators,
                 "photo_analysis": fraud_alert["photo_analysis"],
-                "fake_photo_data": fake_photo_data,
+                "fake_photo_data": base64.b64encode(fake_photo_data).decode('utf-8') if fake_photo_data else None,
                 "legitimate_comparison": legitimate_transactions[0] if legitimate_transactions else None
             }
-        })
+        }
 
     except Exception as e:
-        return jsonify({"success": False, "message": f"Fraud simulation failed: {e}"})
+        return {"success": False, "message": f"Fraud simulation failed: {e}"}
 
-@app.route('/api/simulate_photo_fraud', methods=['POST'])
-def simulate_photo_fraud():
+@app.route('/api/simulate_fraud', methods=['POST'])
+def simulate_fraud():
+    """Simulate a fraudulent transaction with photo analysis"""
+    return jsonify(fraud_simulation_result())
+
+def photo_fraud_simulation_result():
     """Simulate fraud with different photo (hash mismatch)"""
     try:
         transaction_id = f"TXN_PHOTO_FRAUD_{uuid.uuid4().hex[:8].upper()}"
@@ -496,24 +598,17 @@ def simulate_photo_fraud():
 
         # Generate a different fake photo for the fraudster
         different_fake_photo = pos_system.generate_different_fraud_photo()
-        different_photo_hash = None
-
-        if different_fake_photo:
-            import hashlib
-            different_photo_hash = hashlib.md5(different_fake_photo.encode()).hexdigest()[:16]
+        different_photo_ref = photo_digest(different_fake_photo) if different_fake_photo else None
+        different_photo_hash = different_photo_ref[:16] if different_photo_ref else None
 
         # Get a legitimate customer's photo hash for comparison
         legitimate_photo_hash = None
         legitimate_customer = None
         try:
-            for key in pos_system.redis_store_a.scan_iter(match="transaction:TXN_STORE_A_*"):
-                txn_data = pos_system.redis_store_a.get(key)
-                if txn_data:
-                    txn = json.loads(txn_data)
-                    if not txn.get('is_fraudulent', False) and txn.get('photo_hash'):
-                        legitimate_photo_hash = txn.get('photo_hash')
-                        legitimate_customer = txn.get('customer_id')
-                        break
+            matches = find_legitimate_purchases(lambda txn: bool(txn.get('photo_hash')), limit=1)
+            if matches:
+                legitimate_photo_hash = matches[0].get('photo_hash')
+                legitimate_customer = matches[0].get('customer_id')
         except:
             pass
 
@@ -528,17 +623,11 @@ def simulate_photo_fraud():
             "timestamp": datetime.now().isoformat(),
             "has_photo": True,
             "photo_hash": different_photo_hash,
+            "photo_ref": different_photo_ref,
             "is_fraudulent": True,
             "fraud_indicators": ["photo_hash_mismatch", "identity_theft", "high_value_return"]
         }
 
-        # Store fraudulent transaction
-        pos_system.redis_store_b.set(f"transaction:{transaction_id}", json.dumps(transaction_data))
-
-        # Store the different fake photo
-        if different_fake_photo:
-            pos_system.redis_store_b.set(f"photo:{transaction_id}", different_fake_photo)
-
         # Create detailed fraud alert
         fraud_alert = {
             "alert_id": f"PHOTO_FRAUD_{uuid.uuid4().hex[:8].upper()}",
@@ -560,9 +649,14 @@ def simulate_photo_fraud():
             }
         }
 
-        pos_system.redis_store_b.set(f"fraud_alert:{transaction_id}", json.dumps(fraud_alert))
+        # Store fraudulent transaction, the different fake photo and the alert together
+        pipe = pos_system.redis_store_b.pipeline(transaction=True)
+        queue_transaction_commit(pipe, transaction_id, json.dumps(transaction_data),
+                                 photo_jpeg=different_fake_photo, photo_ref=different_photo_ref)
+        pipe.set(f"fraud_alert:{transaction_id}", json.dumps(fraud_alert))
+        pipe.execute()
 
-        return jsonify({
+        return {
             "success": True,
             "message": "Photo fraud simulation completed",
             "fraud_details": {
@@ -573,285 +667,186 @@ def simulate_photo_fraud():
                 "action": "TRANSACTION_BLOCKED",
                 "indicators": fraud_alert["indicators"],
                 "photo_analysis": fraud_alert["photo_analysis"],
-                "fraudster_photo_data": different_fake_photo,
+                "fraudster_photo_data": base64.b64encode(different_fake_photo).decode('utf-8') if different_fake_photo else None,
                 "legitimate_customer": legitimate_customer
             }
-        })
+        }
 
     except Exception as e:
-        return jsonify({"success": False, "message": f"Photo fraud simulation failed: {e}"})
-
-@app.route('/api/replication_status')
-def get_replication_status():
-    """Get current replication status between stores"""
-    try:
-        # Get recent transactions from both stores
-        store_a_count = len(list(pos_system.redis_store_a.scan_iter(match="transaction:*")))
-        store_b_count = len(list(pos_system.redis_store_b.scan_iter(match="transaction:*")))
+        return {"success": False, "message": f"Photo fraud simulation failed: {e}"}
 
-        # Get recent stream entries
-        try:
-            stream_a = pos_system.redis_store_a.xrevrange("transaction_stream", count=5)
-            stream_b = pos_system.redis_store_b.xrevrange("transaction_stream", count=5)
-        except:
-            stream_a = []
-            stream_b = []
-
-        return jsonify({
-            "success": True,
-            "replication_status": {
-                "store_a_transactions": store_a_count,
-                "store_b_transactions": store_b_count,
-                "sync_status": "SYNCED" if store_a_count == store_b_count else "SYNCING",
-                "recent_stream_a": len(stream_a),
-                "recent_stream_b": len(stream_b)
-            }
-        })
-    except Exception as e:
-        return jsonify({"success": False, "message": f"Error getting replication status: {e}"})
+@app.route('/api/simulate_photo_fraud', methods=['POST'])
+def simulate_photo_fraud():
+    """Simulate fraud with different photo (hash mismatch)"""
+    return jsonify(photo_fraud_simulation_result())
 
-@app.route('/api/dashboard_data')
-def get_dashboard_data():
-    """Get transaction data for dashboard"""
+def photo_stats_result():
+    """Photo storage savings from content-addressed dedup, per store"""
     try:
-        # Get all transactions from both stores
-        store_a_transactions = []
-        store_b_transactions = []
-
-        # Get Store A transactions
-        for key in pos_system.redis_store_a.scan_iter(match="transaction:*"):
-            try:
-                txn_data = pos_system.redis_store_a.get(key)
-                if txn_data:
-                    txn = json.loads(txn_data)
-
-                    # Normalize transaction data format
-                    normalized_txn = {
-                        "transaction_id": txn.get("transaction_id", ""),
-                        "store_id": txn.get("store_id", "STORE_A"),
-                        "customer_id": txn.get("customer_id", ""),
-                        "product_name": txn.get("product_name") or txn.get("product", {}).get("name", "Unknown"),
-                        "price": txn.get("price") or txn.get("amount", 0),
-                        "transaction_type": txn.get("transaction_type", "PURCHASE"),
-                        "timestamp": txn.get("timestamp") or txn.get("datetime", ""),
-                        "has_photo": txn.get("has_photo", False),
-                        "photo_hash": txn.get("photo_hash", ""),
-                        "is_fraudulent": txn.get("is_fraudulent", False)
-                    }
-
-                    # Get photo if available
-                    photo_key = f"photo:{txn['transaction_id']}"
-                    photo_data = pos_system.redis_store_a.get(photo_key)
-                    if photo_data:
-                        normalized_txn['has_photo'] = True
-                        normalized_txn['photo_preview'] = "📷"  # Just show icon for dashboard
-
-                    store_a_transactions.append(normalized_txn)
-            except Exception as e:
-                print(f"Error processing Store A transaction {key}: {e}")
-
-        # Get Store B transactions
-        for key in pos_system.redis_store_b.scan_iter(match="transaction:*"):
-            try:
-                txn_data = pos_system.redis_store_b.get(key)
-                if txn_data:
-                    txn = json.loads(txn_data)
-
-                    # Normalize transaction data format
-                    normalized_txn = {
-                        "transaction_id": txn.get("transaction_id", ""),
-                        "store_id": txn.get("store_id", "STORE_B"),
-                        "customer_id": txn.get("customer_id", ""),
-                        "product_name": txn.get("product_name") or txn.get("product", {}).get("name", "Unknown"),
-                        "price": txn.get("price") or txn.get("amount", 0),
-                        "transaction_type": txn.get("transaction_type", "PURCHASE"),
-                        "timestamp": txn.get("timestamp") or txn.get("datetime", ""),
-                        "has_photo": txn.get("has_photo", False),
-                        "photo_hash": txn.get("photo_hash", ""),
-                        "is_fraudulent": txn.get("is_fraudulent", False)
-                    }
-
-                    # Get photo if available
-                    photo_key = f"photo:{txn['transaction_id']}"
-                    photo_data = pos_system.redis_store_b.get(photo_key)
-                    if photo_data:
-                        normalized_txn['has_photo'] = True
-                        normalized_txn['photo_preview'] = "📷"  # Just show icon for dashboard
-
-                    store_b_transactions.append(normalized_txn)
-            except Exception as e:
-                print(f"Error processing Store B transaction {key}: {e}")
-
-        # Sort by transaction_id (most recent first) to avoid timestamp issues
-        store_a_transactions.sort(key=lambda x: x.get('transaction_id', ''), reverse=True)
-        store_b_transactions.sort(key=lambda x: x.get('transaction_id', ''), reverse=True)
-
-        return jsonify({
+        return {
             "success": True,
-            "store_a_transactions": store_a_transactions[:10],  # Last 10
-            "store_b_transactions": store_b_transactions[:10],  # Last 10
-            "total_a": len(store_a_transactions),
-            "total_b": len(store_b_transactions)
-        })
-
+            "store_a": get_photo_stats(pos_system.redis_store_a),
+            "store_b": get_photo_stats(pos_system.redis_store_b)
+        }
     except Exception as e:
-        return jsonify({"success": False, "message": f"Error getting dashboard data: {e}"})
-
-if __name__ == "__main__":
-    print("🚀 Starting Unified Web POS System...")
-    print("📱 Access at: http://localhost:5001")
-    print("📷 Real camera capture enabled")
-    print("🔄 Real-time replication monitoring enabled")
-    print("🚨 Enhanced fraud detection with photo analysis")
-    app.run(host='0.0.0.0', port=5001, debug=True, threaded=True)
-
-@app.route('/api/process_transaction', methods=['POST'])
-def process_transaction():
-    """Process a transaction"""
-    try:
-        data = request.json
-
-        # Validate inputs
-        customer_id = data.get('customer_id', '').strip()
-        product_sku = data.get('product_sku', '')
-        store_id = data.get('store_id', 'STORE_A')
-        transaction_type = data.get('transaction_type', 'PURCHASE')
-
-        if not customer_id or not product_sku:
-            return jsonify({"success": False, "message": "Missing customer ID or product"})
-
-        if product_sku not in pos_system.products:
-            return jsonify({"success": False, "message": "Invalid product selected"})
-
-        # Check for photo if it's a purchase
-        if transaction_type == "PURCHASE" and not pos_system.photo_base64:
-            return jsonify({"success": False, "message": "Photo required for purchases"})
-
-        # Create transaction
-        transaction_id = f"TXN_{store_id}_{uuid.uuid4().hex[:8].upper()}"
-        product = pos_system.products[product_sku]
-
-        transaction_data = {
-            "transaction_id": transaction_id,
-            "store_id": store_id,
-            "customer_id": customer_id,
-            "product_sku": product_sku,
-            "product_name": product["name"],
-            "price": product["price"],
-            "transaction_type": transaction_type,
-            "timestamp": datetime.now().isoformat(),
-            "has_photo": bool(pos_system.photo_base64),
-            "is_fraudulent": False
+        return {"success": False, "message": f"Error getting photo stats: {e}"}
+
+@app.route('/api/photo_stats')
+def photo_stats():
+    """Photo storage savings from content-addressed dedup, per store"""
+    return jsonify(photo_stats_result())
+
+def queue_store_status(pipe):
+    """Queue reading a store's counters and newest stream entries"""
+    pipe.hgetall(STORE_COUNTERS)
+    pipe.xrevrange(TRANSACTION_STREAM, count=5)
+    return pipe
+
+def replication_status_body(status_a, status_b):
+    """Replication status from each store's ``queue_store_status`` results"""
+    counters_a, stream_a = parse_store_counters(status_a[0]), status_a[1]
+    counters_b, stream_b = parse_store_counters(status_b[0]), status_b[1]
+
+    return {
+        "success": True,
+        "replication_status": {
+            "store_a_transactions": counters_a["transactions"],
+            "store_b_transactions": counters_b["transactions"],
+            "sync_status": "SYNCED" if counters_a["transactions"] == counters_b["transactions"] else "SYNCING",
+            "recent_stream_a": len(stream_a),
+            "recent_stream_b": len(stream_b),
+            "store_a_counters": counters_a,
+            "store_b_counters": counters_b
         }
+    }
 
-        # Get Redis client for the store
-        redis_client = pos_system.redis_store_a if store_id == "STORE_A" else pos_system.redis_store_b
-
-        # Store transaction
-        redis_client.set(f"transaction:{transaction_id}", json.dumps(transaction_data))
-
-        # Store photo if available
-        if pos_system.photo_base64:
-            redis_client.set(f"photo:{transaction_id}", pos_system.photo_base64)
-
-        # Add to transaction stream
-        redis_client.xadd("transaction_stream", {
-            "transaction_id": transaction_id,
-            "store_id": store_id,
-            "customer_id": customer_id,
-            "amount": product["price"],
-            "type": transaction_type,
-            "has_photo": "true" if pos_system.photo_base64 else "false"
-        })
+def replication_status_result():
+    """Get current replication status between stores"""
+    try:
+        # One round trip per store, no keyspace scans
+        return replication_status_body(
+            queue_store_status(pos_system.redis_store_a.pipeline(transaction=False)).execute(),
+            queue_store_status(pos_system.redis_store_b.pipeline(transaction=False)).execute()
+        )
+    except Exception as e:
+        return {"success": False, "message": f"Error getting replication status: {e}"}
 
-        # Clear captured photo
-        pos_system.photo_base64 = None
-        pos_system.captured_photo = None
+@app.route('/api/replication_status')
+def get_replication_status():
+    """Get current replication status between stores"""
+    return jsonify(replication_status_result())
 
-        return jsonify({
-            "success": True,
-            "message": "Transaction processed successfully",
-            "transaction_id": transaction_id,
-            "details": {
-                "customer": customer_id,
-                "product": product["name"],
-                "amount": product["price"],
-                "photo_verified": bool(pos_system.photo_base64)
-            }
-        })
+def replication_latency_body(raw_a, raw_b, lag_a=None, lag_b=None):
+    """Merged monitor histograms and end-to-end lag from each store's hashes"""
+    return {"success": True, "latency": latency_report([raw_a, raw_b]), "lag": lag_report([lag_a, lag_b])}
 
+@app.route('/api/replication_latency')
+def get_replication_latency():
+    """Replication latency percentiles per direction and data type, across all monitors"""
+    try:
+        return jsonify(replication_latency_body(
+            pos_system.redis_store_a.hgetall(REPLICATION_LATENCY),
+            pos_system.redis_store_b.hgetall(REPLICATION_LATENCY),
+            pos_system.redis_store_a.hgetall(REPLICATION_LAG),
+            pos_system.redis_store_b.hgetall(REPLICATION_LAG)
+        ))
     except Exception as e:
-        return jsonify({"success": False, "message": f"Transaction failed: {e}"})
-
-@app.route('/api/simulate_fraud', methods=['POST'])
-def simulate_fraud():
-    """Simulate a fraudulent transaction"""
+        return jsonify({"success": False, "message": f"Error getting replication latency: {e}"})
+
+def normalize_dashboard_transaction(txn, default_store_id):
+    """Normalize the transaction formats written by the different POS scripts"""
+    normalized_txn = {
+        "transaction_id": txn.get("transaction_id", ""),
+        "store_id": txn.get("store_id", default_store_id),
+        "customer_id": txn.get("customer_id", ""),
+        "product_name": txn.get("product_name") or txn.get("product", {}).get("name", "Unknown"),
+        "price": txn.get("price") or txn.get("amount", 0),
+        "transaction_type": txn.get("transaction_type", "PURCHASE"),
+        "timestamp": txn.get("timestamp") or txn.get("datetime", ""),
+        "has_photo": txn.get("has_photo", False),
+        "photo_hash": txn.get("photo_hash", ""),
+        "is_fraudulent": txn.get("is_fraudulent", False)
+    }
+
+    if normalized_txn["has_photo"]:
+        normalized_txn['photo_preview'] = "📷"  # Just show icon for dashboard
+
+    return normalized_txn
+
+def get_store_page(store_id, cursor=None, limit=10):
+    """Fetch one page of a store's transactions from its time index"""
+    redis_client = pos_system.redis_store_a if store_id == "STORE_A" else pos_system.redis_store_b
+    page = fetch_transaction_page(redis_client, cursor=cursor, limit=limit)
+    page["transactions"] = [normalize_dashboard_transaction(txn, store_id) for txn in page["transactions"]]
+    return page
+
+def get_page_limit():
+    """Read the requested page size, clamped to a sane range"""
     try:
-        # Create fraudulent transaction (return without photo)
-        transaction_id = f"TXN_FRAUD_{uuid.uuid4().hex[:8].upper()}"
-
-        # Use high-value product
-        fraud_product_sku = "LAPTOP_001"  # Gaming Laptop
-        product = pos_system.products[fraud_product_sku]
+        return max(1, min(int(request.args.get('limit', 10)), 100))
+    except ValueError:
+        return 10
+
+def dashboard_data_body(page_a, page_b):
+    """Dashboard response for one page of each store"""
+    return {
+        "success": True,
+        "store_a_transactions": page_a["transactions"],
+        "store_b_transactions": page_b["transactions"],
+        "total_a": page_a["total"],
+        "total_b": page_b["total"],
+        "next_cursor_a": page_a["next_cursor"],
+        "next_cursor_b": page_b["next_cursor"]
+    }
+
+def dashboard_snapshot(limit):
+    """Shared snapshot for the newest page of ``limit`` transactions per store"""
+    return dashboard_snapshots.setdefault(limit, SharedSnapshot())
 
-        transaction_data = {
-            "transaction_id": transaction_id,
-            "store_id": "STORE_B",
-            "customer_id": "FRAUDSTER_001",
-            "product_sku": fraud_product_sku,
-            "product_name": product["name"],
-            "price": product["price"],
-            "transaction_type": "RETURN",
-            "timestamp": datetime.now().isoformat(),
-            "has_photo": False,
-            "is_fraudulent": True,
-            "fraud_indicators": ["no_photo", "high_value_return", "suspicious_customer"]
-        }
+@app.route('/api/dashboard_data')
+def get_dashboard_data():
+    """Get the newest page of transactions for each store"""
+    cursor_a, cursor_b = request.args.get('cursor_a'), request.args.get('cursor_b')
+    if not (is_valid_page_cursor(cursor_a) and is_valid_page_cursor(cursor_b)):
+        return jsonify({"success": False, "message": INVALID_CURSOR_MESSAGE}), 400
 
-        # Store in Redis Store B
-        pos_system.redis_store_b.set(f"transaction:{transaction_id}", json.dumps(transaction_data))
+    try:
+        limit = get_page_limit()
+        if cursor_a or cursor_b:
+            return jsonify(dashboard_data_body(get_store_page("STORE_A", cursor_a, limit),
+                                               get_store_page("STORE_B", cursor_b, limit)))
+
+        # The newest pages are what every dashboard polls: build them once per interval
+        snapshot = dashboard_snapshot(limit).get(
+            lambda: dashboard_data_body(get_store_page("STORE_A", None, limit),
+                                        get_store_page("STORE_B", None, limit)))
+        status, body, headers = conditional_response(snapshot, request.headers.get('If-None-Match'))
+        return Response(body, status=status, headers=headers, mimetype='application/json')
 
-        # Add fraud alert
-        fraud_alert = {
-            "alert_id": f"FRAUD_{uuid.uuid4().hex[:8].upper()}",
-            "transaction_id": transaction_id,
-            "fraud_score": 85,
-            "risk_level": "HIGH",
-            "indicators": ["Missing photo verification", "High-value return", "Known fraudster"],
-            "timestamp": datetime.now().isoformat(),
-            "action_taken": "TRANSACTION_BLOCKED"
-        }
+    except Exception as e:
+        return jsonify({"success": False, "message": f"Error getting dashboard data: {e}"})
 
-        pos_system.redis_store_b.set(f"fraud_alert:{transaction_id}", json.dumps(fraud_alert))
+@app.route('/api/transactions/<store_id>')
+def get_transactions_page(store_id):
+    """Cursor-paginated transaction listing for one store, newest first"""
+    if store_id not in ("STORE_A", "STORE_B"):
+        return jsonify({"success": False, "message": "Unknown store"}), 404
 
-        # Add to transaction stream
-        pos_system.redis_store_b.xadd("transaction_stream", {
-            "transaction_id": transaction_id,
-            "store_id": "STORE_B",
-            "customer_id": "FRAUDSTER_001",
-            "amount": product["price"],
-            "type": "RETURN",
-            "has_photo": "false",
-            "fraud_detected": "true"
-        })
+    cursor = request.args.get('cursor')
+    if not is_valid_page_cursor(cursor):
+        return jsonify({"success": False, "message": INVALID_CURSOR_MESSAGE}), 400
 
-        return jsonify({
-            "success": True,
-            "message": "Fraud simulation completed",
-            "fraud_details": {
-                "transaction_id": transaction_id,
-                "fraud_score": 85,
-                "risk_level": "HIGH",
-                "action": "TRANSACTION_BLOCKED"
-            }
-        })
+    try:
+        page = get_store_page(store_id, cursor, get_page_limit())
+        return jsonify({"success": True, "store_id": store_id, **page})
 
     except Exception as e:
-        return jsonify({"success": False, "message": f"Fraud simulation failed: {e}"})
+        return jsonify({"success": False, "message": f"Error getting transactions: {e}"})
 
 if __name__ == "__main__":
     print("🚀 Starting Unified Web POS System...")
     print("📱 Access at: http://localhost:5001")
     print("📷 Real camera capture enabled")
-    print("🚨 Fraud detection active")
+    print("🔄 Real-time replication monitoring enabled")
+    print("🚨 Enhanced fraud detection with photo analysis")
     app.run(host='0.0.0.0', port=5001, debug=True, threaded=True)